@@ -0,0 +1,273 @@
+"""
+Engine benchmarks — build_roster and reoptimize_from at increasing scale.
+
+Each scale is a synthetic airline from seed_synthetic.py, generated into a
+throwaway database created on a local Postgres server and dropped afterwards.
+The engines need the real schema (COPY, triggers, partitions), so there is no
+in-memory stand-in. Every run happens in a fresh process, so peak memory
+belongs to that run alone, and through a counting connection that records:
+- DB round trips, timed as read (SELECT/WITH) or write (everything else,
+  commits included);
+- compute, which is the wall time left after both;
+- throughput: pairings/s for build_roster, flights/s for reoptimize_from.
+
+Results are saved as JSON. With a baseline file present, any run over its
+THRESHOLDS makes the command exit 1:
+
+    python -m app.engine.benchmark                          # scales 1 5 10
+    python -m app.engine.benchmark --scales 1 10 100 --repeat 1
+    python -m app.engine.benchmark --save-baseline          # after an intended change
+
+The server comes from --dsn, BENCH_DATABASE_URL or DATABASE_URL; only the
+throwaway database is written to.
+"""
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import psycopg2
+from psycopg2.extensions import connection as _connection, cursor as _cursor, make_dsn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from app.utils.migrations import migrate
+
+ENGINES       = ('reoptimize_from', 'build_roster')   # reopt first: build_roster clears the history
+DEFAULT_SCALES = (1, 5, 10)
+REOPT_OFFSET_DAYS = 2      # reoptimize_from starts this many days out, as after a disruption
+RESULTS  = 'benchmark_results.json'
+BASELINE = 'benchmark_baseline.json'
+
+# metric: (relative, absolute) slack over the baseline before a run fails
+THRESHOLDS = {
+    'wall_s':      (0.25, 0.05),
+    'peak_rss_mb': (0.20, 10),
+    'round_trips': (0.10, 2),
+}
+
+
+class _Trips:
+    """Round trips and DB time for the run in this process."""
+    count   = 0
+    read_s  = 0.0
+    write_s = 0.0
+
+    @classmethod
+    def timed(cls, sql, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            secs = time.perf_counter() - t0
+            head = (sql.decode() if isinstance(sql, bytes) else str(sql)).lstrip()[:6].upper()
+            cls.count += 1
+            if head.startswith(('SELECT', 'WITH')):
+                cls.read_s += secs
+            else:
+                cls.write_s += secs
+
+
+class CountingCursor(_cursor):
+    def execute(self, sql, params=None):
+        return _Trips.timed(sql, super().execute, sql, params)
+
+    def executemany(self, sql, params_seq):
+        return _Trips.timed(sql, super().executemany, sql, params_seq)
+
+    def copy_expert(self, sql, file, size=8192):
+        return _Trips.timed(sql, super().copy_expert, sql, file, size)
+
+
+class CountingConnection(_connection):
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        return _Trips.timed('COMMIT', super().commit)
+
+    def rollback(self):
+        return _Trips.timed('ROLLBACK', super().rollback)
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux
+
+
+def measure(engine, dsn, params, seed, selection):
+    """Run ``engine`` once against ``dsn`` and return its metrics. Meant to
+    run in a fresh process (see run_suite)."""
+    from app.engine.optimizer import build_roster
+    from reopt_helper import reoptimize_from
+    from seed_synthetic import build_network, network_params
+
+    today = date.today()
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        if engine == 'build_roster':
+            _, pairings = build_network(**network_params(params), seed=seed)
+            work, unit = len(pairings) * params['days'], 'pairings'
+        else:
+            from_date = today + timedelta(days=REOPT_OFFSET_DAYS)
+            cur.execute("SELECT COUNT(*) FROM flight_schedule WHERE departure_date BETWEEN %s AND %s",
+                        (from_date, from_date + timedelta(days=30)))
+            work, unit = cur.fetchone()[0], 'flights'
+    conn.close()
+
+    def conn_func():
+        return psycopg2.connect(dsn, connection_factory=CountingConnection)
+
+    rss_before = _rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        if engine == 'build_roster':
+            assigned, _ = build_roster(today, today + timedelta(days=params['days'] - 1),
+                                       selection=selection, conn_func=conn_func, pairings=pairings)
+        else:
+            assigned = reoptimize_from(from_date, conn_func, selection=selection)
+        wall = time.perf_counter() - t0
+    return {
+        'engine':      engine,
+        'wall_s':      round(wall, 3),
+        'read_s':      round(_Trips.read_s, 3),
+        'write_s':     round(_Trips.write_s, 3),
+        'compute_s':   round(wall - _Trips.read_s - _Trips.write_s, 3),
+        unit:          work,
+        f'{unit}_per_s': round(work / wall, 1) if wall else None,
+        'assignments': assigned,
+        'round_trips': _Trips.count,
+        'peak_rss_mb': round(_rss_mb(), 1),
+        'rss_growth_mb': round(_rss_mb() - rss_before, 1),
+    }
+
+
+@contextlib.contextmanager
+def throwaway_database(dsn, tag='', keep=False):
+    """Create an empty database on ``dsn``'s server; yields its DSN."""
+    name  = f'crew_bench_{os.getpid()}{tag}'
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS {name}')
+        cur.execute(f'CREATE DATABASE {name}')
+    try:
+        yield make_dsn(dsn, dbname=name)
+    finally:
+        if not keep:
+            with admin.cursor() as cur:
+                cur.execute(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)')
+        admin.close()
+
+
+def run_suite(dsn, scales=DEFAULT_SCALES, months=1, days=30, seed=1, repeat=3,
+              selection='vector', keep=False, verbose=True):
+    """Benchmark both engines at every scale; returns one result per
+    (engine, scale), the fastest of ``repeat`` runs."""
+    from seed_synthetic import generate, scaled
+
+    spawn   = multiprocessing.get_context('spawn')
+    results = []
+    for i, scale in enumerate(scales):
+        params = scaled(scale, months=months, days=days)
+        with throwaway_database(dsn, f'_{i}', keep) as bench_dsn:
+            conn = psycopg2.connect(bench_dsn)
+            migrate(conn, verbose=False)
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                counts = generate(conn, params, seed, verbose=False)
+            conn.close()
+            if verbose:
+                print(f"Scale {scale:g}: {params['lcc'] + params['cc']} crew, {counts['flights_per_day']} "
+                      f"flights/day, {counts['pairings']} pairings — generated in "
+                      f"{time.perf_counter() - t0:.1f}s")
+            for engine in ENGINES:
+                runs = []
+                for _ in range(repeat):
+                    with spawn.Pool(1) as pool:
+                        runs.append(pool.apply(measure, (engine, bench_dsn, params, seed, selection)))
+                best = min(runs, key=lambda r: r['wall_s'])
+                best.update(scale=scale, crew=params['lcc'] + params['cc'], days=params['days'],
+                            history_months=months, scheduled_flights=counts['flight_schedule'])
+                results.append(best)
+                if verbose:
+                    print(_format(best))
+    return results
+
+
+def _format(r):
+    unit = 'pairings' if 'pairings' in r else 'flights'
+    return (f"   {r['engine']:<16} {r['wall_s']:>8.2f}s  (read {r['read_s']:.2f}s, "
+            f"compute {r['compute_s']:.2f}s, write {r['write_s']:.2f}s)  "
+            f"{r[f'{unit}_per_s']:>10,.0f} {unit}/s  {r['round_trips']:>6} trips  "
+            f"{r['peak_rss_mb']:>7.1f} MB peak")
+
+
+def regressions(results, baseline):
+    """Lines describing every metric over its threshold against ``baseline``."""
+    base = {(r['engine'], r['scale']): r for r in baseline.get('runs', [])}
+    found = []
+    for r in results:
+        b = base.get((r['engine'], r['scale']))
+        if b is None:
+            continue
+        for metric, (rel, slack) in THRESHOLDS.items():
+            limit = b[metric] * (1 + rel) + slack
+            if r[metric] > limit:
+                found.append(f"{r['engine']} @ scale {r['scale']:g}: {metric} {r[metric]} "
+                             f"> {limit:.2f} (baseline {b[metric]})")
+    return found
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Benchmark the roster engines on synthetic airlines.")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"),
+                        help="Postgres server to create the throwaway databases on")
+    parser.add_argument("--scales", type=float, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument("--months", type=int, default=1, help="duty history per dataset")
+    parser.add_argument("--days", type=int, default=30, help="days rostered")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per engine; the fastest counts")
+    parser.add_argument("--selection", choices=['vector', 'heap', 'sort'], default='vector')
+    parser.add_argument("--out", default=RESULTS)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--keep", action="store_true", help="keep the throwaway databases")
+    args = parser.parse_args()
+
+    results = run_suite(args.dsn, args.scales, args.months, args.days, args.seed,
+                        args.repeat, args.selection, args.keep)
+    report = {
+        'created':   datetime.now().isoformat(timespec='seconds'),
+        'host':      platform.node(),
+        'python':    platform.python_version(),
+        'selection': args.selection,
+        'seed':      args.seed,
+        'runs':      results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results -> {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved -> {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f))
+        if found:
+            print(f"❌ {len(found)} regression(s) against {args.baseline}:")
+            for line in found:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
+    else:
+        print(f"No baseline at {args.baseline} — run with --save-baseline to create one.")
@@ -0,0 +1,66 @@
+"""
+Candidate selection for the roster engines — cheapest crew first.
+
+Both pools hand out crew in ascending total_hours, ties broken by their
+position in the pool (the engines load crew ORDER BY id, so that is the
+crew_id order). `take()` returns the first `n` crew passing `can_work`;
+`restore()` must be called once the picked crew have been assigned so their
+new hours are picked up for the next pairing.
+"""
+import heapq
+
+
+class CrewHeap:
+    """Min-heap of crew keyed on (total_hours, pool position).
+
+    Only the entries popped by `take()` are re-keyed on `restore()`; the rest
+    of the heap is untouched, so each pairing costs O(k log n) for the k crew
+    examined instead of a full re-sort of the pool.
+    """
+
+    def __init__(self, states):
+        self.heap   = [(s.total_hours, i, s) for i, s in enumerate(states)]
+        self.popped = []
+        heapq.heapify(self.heap)
+
+    def take(self, n, can_work):
+        picked = []
+        while self.heap and len(picked) < n:
+            entry = heapq.heappop(self.heap)
+            self.popped.append(entry)
+            if can_work(entry[2]):
+                picked.append(entry[2])
+        return picked
+
+    def restore(self):
+        for _, i, s in self.popped:
+            heapq.heappush(self.heap, (s.total_hours, i, s))
+        self.popped = []
+
+
+class CrewSorted:
+    """Original behaviour: stable re-sort of the whole pool on every take."""
+
+    def __init__(self, states):
+        self.states = list(states)
+
+    def take(self, n, can_work):
+        picked = []
+        for s in sorted(self.states, key=lambda s: s.total_hours):
+            if len(picked) >= n:
+                break
+            if can_work(s):
+                picked.append(s)
+        return picked
+
+    def restore(self):
+        pass
+
+
+POOLS = {'heap': CrewHeap, 'sort': CrewSorted}
+
+
+def crew_pool(states, selection='heap'):
+    if selection not in POOLS:
+        raise ValueError(f"Unknown selection {selection!r} — expected one of {sorted(POOLS)}")
+    return POOLS[selection](states)
@@ -0,0 +1,248 @@
+"""
+FDTL compliance helpers shared by the roster engine and the re-optimizer.
+"""
+from datetime import datetime
+
+import numpy as np
+
+
+class RollingHours:
+    """Flying hours bucketed per calendar day, with prefix sums for windows.
+
+    Window queries (daily, 7-day, 28-day, calendar month) cost a couple of
+    array lookups plus a scan of the legs on the boundary day, instead of a
+    walk over the full duty history. Prefix sums are rebuilt lazily from the
+    lowest day touched since the last query, so the engines' date-ordered
+    assignment keeps that rebuild to the last bucket or two.
+    """
+
+    def __init__(self):
+        self.origin  = None    # calendar date of bucket 0
+        self.buckets = []      # total hours per day
+        self.legs    = []      # [(dep, hours)] per day, for partial-day windows
+        self.prefix  = [0.0]   # prefix[i] = sum(buckets[:i])
+        self.dirty   = None    # lowest bucket whose prefix is stale
+
+    def add(self, dep, hours):
+        d = dep.date()
+        if self.origin is None:
+            self.origin = d
+        elif d < self.origin:
+            shift = (self.origin - d).days
+            self.buckets[:0] = [0.0] * shift
+            self.legs[:0]    = [[] for _ in range(shift)]
+            self.origin      = d
+            self.dirty       = 0
+        i     = (d - self.origin).days
+        stale = min(i, len(self.buckets))
+        if i >= len(self.buckets):
+            grow = i + 1 - len(self.buckets)
+            self.buckets.extend([0.0] * grow)
+            self.legs.extend([] for _ in range(grow))
+        self.buckets[i] += hours
+        self.legs[i].append((dep, hours))
+        self.dirty = stale if self.dirty is None else min(self.dirty, stale)
+
+    def _sync(self):
+        if self.dirty is None:
+            return
+        del self.prefix[self.dirty + 1:]
+        acc = self.prefix[self.dirty]
+        for h in self.buckets[self.dirty:]:
+            acc += h
+            self.prefix.append(acc)
+        self.dirty = None
+
+    def on_date(self, d):
+        if self.origin is None:
+            return 0.0
+        i = (d - self.origin).days
+        return self.buckets[i] if 0 <= i < len(self.buckets) else 0.0
+
+    def since(self, ts):
+        """Hours on legs departing at or after ``ts``."""
+        if self.origin is None:
+            return 0.0
+        self._sync()
+        n = len(self.buckets)
+        i = (ts.date() - self.origin).days
+        if i >= n:
+            return 0.0
+        if i < 0:
+            return self.prefix[n]
+        tail = self.prefix[n] - self.prefix[i + 1]
+        return tail + sum(h for dep, h in self.legs[i] if dep >= ts)
+
+
+# ── Vectorized legality kernel ────────────────────────────────────────────────
+# Reason codes, in the order the checks are applied — the first failing check
+# is the one reported for each crew member.
+REASON_LEGAL   = 0
+REASON_LOCKED  = 1
+REASON_LEAVE   = 2
+REASON_REST    = 3
+REASON_CONSEC  = 4
+REASON_FDP     = 5
+REASON_DAILY   = 6
+REASON_WINDOW  = 7    # first window that fails adds its index: 7-day, 28-day, month...
+
+REASON_NAMES = {
+    REASON_LEGAL:  'LEGAL',
+    REASON_LOCKED: 'LOCKED_OVERRIDE',
+    REASON_LEAVE:  'ON_LEAVE',
+    REASON_REST:   'MIN_REST',
+    REASON_CONSEC: 'MAX_CONSEC_DAYS',
+    REASON_FDP:    'MAX_FDP',
+    REASON_DAILY:  'MAX_DAILY_HOURS',
+}
+
+# Earliest window start the engines ask about, relative to the first day being
+# rostered: 28-day window, or the calendar month start for a flight late in it.
+WINDOW_LOOKBACK_DAYS = 31
+
+
+class FdtlKernel:
+    """Crew FDTL state held as NumPy arrays, one row per crew member.
+
+    ``check()`` evaluates a pairing against the whole pool in a handful of
+    array operations and returns a legality mask plus a reason code per crew.
+    Day index 0 is ``origin``; legs before it are only reflected in the scalar
+    state (last duty, consecutive days, total hours), which is enough as long
+    as no window starts before ``origin``.
+    """
+
+    def __init__(self, n, origin, days):
+        self.n         = n
+        self.origin    = origin
+        self.origin_dt = datetime.combine(origin, datetime.min.time())
+        self.total     = np.zeros(n)
+        self.has_last  = np.zeros(n, dtype=bool)
+        self.last_day  = np.zeros(n, dtype=np.int64)
+        self.last_end  = np.zeros(n)                     # minutes since origin
+        self.consec    = np.zeros(n, dtype=np.int64)
+        self.hours     = np.zeros((n, days))             # per-day hours
+        self.leave     = np.zeros((n, days), dtype=bool)
+        self.nlegs     = np.zeros((n, days), dtype=np.int64)
+        self.leg_dep   = np.full((n, days, 4), np.inf)   # leg departures, minutes
+        self.leg_hours = np.zeros((n, days, 4))
+
+    def _day(self, d):
+        return (d - self.origin).days
+
+    def _minutes(self, ts):
+        return (ts - self.origin_dt).total_seconds() / 60
+
+    def _ensure_day(self, i):
+        days = self.hours.shape[1]
+        if i < days:
+            return
+        grow = i + 1 - days
+        self.hours     = np.pad(self.hours,  ((0, 0), (0, grow)))
+        self.leave     = np.pad(self.leave,  ((0, 0), (0, grow)))
+        self.nlegs     = np.pad(self.nlegs,  ((0, 0), (0, grow)))
+        self.leg_dep   = np.pad(self.leg_dep,   ((0, 0), (0, grow), (0, 0)), constant_values=np.inf)
+        self.leg_hours = np.pad(self.leg_hours, ((0, 0), (0, grow), (0, 0)))
+
+    def _add_leg(self, idx, dep, hours):
+        i = self._day(dep.date())
+        if i < 0:
+            return
+        self._ensure_day(i)
+        slot = self.nlegs[idx, i]
+        width = self.leg_dep.shape[2]
+        if np.any(slot >= width):
+            self.leg_dep   = np.pad(self.leg_dep,   ((0, 0), (0, 0), (0, width)), constant_values=np.inf)
+            self.leg_hours = np.pad(self.leg_hours, ((0, 0), (0, 0), (0, width)))
+        self.leg_dep[idx, i, slot]   = self._minutes(dep)
+        self.leg_hours[idx, i, slot] = hours
+        self.hours[idx, i]          += hours
+        self.nlegs[idx, i]          += 1
+
+    def load(self, i, total_hours, last_date, last_end, consec, legs):
+        """Seed row ``i`` from an already-hydrated crew state."""
+        self.total[i]  = total_hours
+        self.consec[i] = consec
+        if last_date is not None:
+            self.has_last[i] = True
+            self.last_day[i] = self._day(last_date)
+            self.last_end[i] = self._minutes(last_end)
+        for dep, _, hours in legs:
+            self._add_leg(np.array([i]), dep, hours)
+
+    def set_leave(self, i, dates):
+        for d in dates:
+            j = self._day(d)
+            if j >= 0:
+                self._ensure_day(j)
+                self.leave[i, j] = True
+
+    def window_hours(self, since):
+        """Hours on legs departing at or after ``since``, for every crew member."""
+        b = self._day(since.date())
+        days = self.hours.shape[1]
+        if b >= days:
+            return np.zeros(self.n)
+        if b < 0:
+            return self.hours.sum(axis=1)
+        partial = np.where(self.leg_dep[:, b, :] >= self._minutes(since),
+                           self.leg_hours[:, b, :], 0.0).sum(axis=1)
+        return partial + self.hours[:, b + 1:].sum(axis=1)
+
+    def check(self, legs, windows, max_daily, min_rest, max_consec,
+              max_fdp=None, excluded=()):
+        """Evaluate a duty of ``legs`` [(dep, arr)] against every crew member.
+
+        ``windows`` is a list of (since, limit) cumulative limits. Returns
+        (mask, reasons): a boolean legality array and an int8 reason code
+        array (REASON_LEGAL where the mask is True).
+        """
+        first_dep = legs[0][0]
+        last_arr  = legs[-1][1]
+        duty_day  = self._day(first_dep.date())
+        self._ensure_day(duty_day)
+        total_fh  = sum((arr - dep).total_seconds() / 3600 for dep, arr in legs)
+
+        new_day = self.has_last & (self.last_day != duty_day)
+        rest    = (self._minutes(first_dep) - self.last_end) / 60
+        fails = [
+            (REASON_LEAVE,  self.leave[:, duty_day] if duty_day >= 0 else np.zeros(self.n, dtype=bool)),
+            (REASON_REST,   new_day & (rest < min_rest)),
+            (REASON_CONSEC, new_day & (duty_day - self.last_day == 1) & (self.consec >= max_consec)),
+        ]
+        if max_fdp is not None:
+            fdp = (last_arr - first_dep).total_seconds() / 3600
+            fails.append((REASON_FDP, np.full(self.n, fdp > max_fdp)))
+        daily = self.hours[:, duty_day] if duty_day >= 0 else np.zeros(self.n)
+        fails.append((REASON_DAILY, daily + total_fh > max_daily))
+        for k, (since, limit) in enumerate(windows):
+            fails.append((REASON_WINDOW + k, self.window_hours(since) + total_fh > limit))
+
+        locked = np.zeros(self.n, dtype=bool)
+        locked[list(excluded)] = True
+        reasons = np.zeros(self.n, dtype=np.int8)
+        for code, failed in reversed([(REASON_LOCKED, locked)] + fails):
+            reasons[failed] = code
+        return reasons == REASON_LEGAL, reasons
+
+    def pick(self, n, mask):
+        """First ``n`` legal crew, cheapest total hours first, ties by row."""
+        order = np.argsort(self.total, kind='stable')
+        return [int(i) for i in order[mask[order]][:n]]
+
+    def assign(self, idx, legs):
+        """Book a duty of ``legs`` [(dep, arr)] for the crew rows in ``idx``."""
+        idx = np.asarray(idx, dtype=np.int64)
+        if idx.size == 0:
+            return
+        for dep, arr in legs:
+            hours = (arr - dep).total_seconds() / 3600
+            self._add_leg(idx, dep, hours)
+            self.total[idx] += hours
+        duty_day = self._day(legs[0][0].date())
+        gap = duty_day - self.last_day[idx]
+        self.consec[idx] = np.where(~self.has_last[idx], 1,
+                           np.where(gap == 1, self.consec[idx] + 1,
+                           np.where(gap != 0, 1, self.consec[idx])))
+        self.has_last[idx] = True
+        self.last_day[idx] = duty_day
+        self.last_end[idx] = self._minutes(legs[-1][1])
@@ -1,7 +1,12 @@
-import psycopg2
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, date
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from app.engine.compliance import RollingHours, FdtlKernel, WINDOW_LOOKBACK_DAYS
+from app.engine.candidates import crew_pool
+from app.utils.bulk_writer import BulkWriter
+from app.utils.db import get_connection
 
 load_dotenv()
 
@@ -10,6 +15,7 @@ MAX_DAILY_FLY_HOURS   = 8
 MIN_REST_HOURS        = 12
 MAX_WEEKLY_FLY_HOURS  = 40
 MAX_MONTHLY_FLY_HOURS = 100
+MAX_CONSEC_DAYS       = 6
 
 # Flight pairings — crew must work all legs together (KHI base)
 PAIRINGS = [
@@ -20,15 +26,12 @@ PAIRINGS = [
     ['XYZ501', 'XYZ502', 'XYZ503', 'XYZ504'],  # KHI→MUX→PEW→MUX→KHI 10:00-17:00
 ]
 
-def get_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
-
-
 class CrewState:
     def __init__(self, crew_id, name):
         self.crew_id        = crew_id
         self.name           = name
         self.duty_log       = []
+        self.hours          = RollingHours()
         self.last_duty_date = None
         self.last_day_end   = None
         self.total_sectors  = 0
@@ -36,10 +39,10 @@ class CrewState:
         self.consec_days    = 0
 
     def flying_hours_since(self, since):
-        return sum(h for s, e, h in self.duty_log if s >= since)
+        return self.hours.since(since)
 
     def flying_hours_on_date(self, d):
-        return sum(h for s, e, h in self.duty_log if s.date() == d)
+        return self.hours.on_date(d)
 
     def is_legal_pairing(self, legs):
         first_dep = legs[0][1]
@@ -51,7 +54,7 @@ class CrewState:
             rest = (first_dep - self.last_day_end).total_seconds() / 3600
             if rest < MIN_REST_HOURS:
                 return False
-            if (duty_date - self.last_duty_date).days == 1 and self.consec_days >= 6:
+            if (duty_date - self.last_duty_date).days == 1 and self.consec_days >= MAX_CONSEC_DAYS:
                 return False
 
         fdp = (last_arr - first_dep).total_seconds() / 3600
@@ -75,6 +78,7 @@ class CrewState:
         for _, dep, arr in legs:
             hours = (arr - dep).total_seconds() / 3600
             self.duty_log.append((dep, arr, hours))
+            self.hours.add(dep, hours)
             self.total_hours   += hours
             self.total_sectors += 1
         if self.last_duty_date is None:
@@ -87,19 +91,35 @@ class CrewState:
         self.last_day_end   = legs[-1][2]
 
 
-def build_roster(start_date, end_date):
-    conn = get_connection()
-    cur  = conn.cursor()
+def pairing_kernel(states, start_date, end_date, leave_map):
+    origin = start_date - timedelta(days=WINDOW_LOOKBACK_DAYS)
+    kernel = FdtlKernel(len(states), origin, (end_date - origin).days + 1)
+    for i, s in enumerate(states):
+        kernel.set_leave(i, leave_map.get(s.crew_id, ()))
+    return kernel
 
-    cur.execute("DELETE FROM duty_log")
-    cur.execute("DELETE FROM roster")
-    cur.execute("DELETE FROM legality_violations")
-    conn.commit()
+
+def check_pairing(kernel, legs):
+    """Kernel counterpart of CrewState.is_legal_pairing (plus leave) for every crew."""
+    times     = [(dep, arr) for _, dep, arr in legs]
+    first_dep = times[0][0]
+    return kernel.check(
+        times,
+        windows=[(first_dep - timedelta(days=7),  MAX_WEEKLY_FLY_HOURS),
+                 (first_dep - timedelta(days=28), MAX_MONTHLY_FLY_HOURS)],
+        max_daily=MAX_DAILY_FLY_HOURS, min_rest=MIN_REST_HOURS,
+        max_consec=MAX_CONSEC_DAYS, max_fdp=MAX_FDP_HOURS)
+
+
+def build_roster(start_date, end_date, selection='vector', conn_func=get_connection,
+                 pairings=PAIRINGS):
+    conn = conn_func()
+    cur  = conn.cursor()
 
     cur.execute("""
         SELECT id, flight_number, departure_time, arrival_time
         FROM flight_schedule
-        WHERE departure_time::date BETWEEN %s AND %s
+        WHERE departure_date BETWEEN %s AND %s
         ORDER BY departure_time
     """, (start_date, end_date))
     all_flights = cur.fetchall()
@@ -128,7 +148,7 @@ def build_roster(start_date, end_date):
     d = start_date
     all_pairings = []
     while d <= end_date:
-        for pairing_fns in PAIRINGS:
+        for pairing_fns in pairings:
             legs = []
             valid = True
             for fn in pairing_fns:
@@ -141,6 +161,13 @@ def build_roster(start_date, end_date):
                 all_pairings.append((d, pairing_fns, legs))
         d += timedelta(days=1)
 
+    if selection == 'vector':
+        lcc_kernel = pairing_kernel(lcc_states, start_date, end_date, leave_map)
+        cc_kernel  = pairing_kernel(cc_states,  start_date, end_date, leave_map)
+    else:
+        lcc_pool = crew_pool(lcc_states, selection)
+        cc_pool  = crew_pool(cc_states,  selection)
+
     total = len(all_pairings)
     for i, (duty_date, pairing_fns, legs) in enumerate(all_pairings):
 
@@ -149,14 +176,17 @@ def build_roster(start_date, end_date):
                 return False
             return state.is_legal_pairing(legs)
 
-        lcc_sorted = sorted(lcc_states, key=lambda s: s.total_hours)
-        cc_sorted  = sorted(cc_states,  key=lambda s: s.total_hours)
-
-        assigned_lcc = next((s for s in lcc_sorted if can_work(s)), None)
-        assigned_ccs = []
-        for s in cc_sorted:
-            if len(assigned_ccs) >= 3: break
-            if can_work(s): assigned_ccs.append(s)
+        if selection == 'vector':
+            lcc_idx = lcc_kernel.pick(1, check_pairing(lcc_kernel, legs)[0])
+            cc_idx  = cc_kernel.pick(3,  check_pairing(cc_kernel,  legs)[0])
+            times   = [(dep, arr) for _, dep, arr in legs]
+            lcc_kernel.assign(lcc_idx, times)
+            cc_kernel.assign(cc_idx, times)
+            assigned_lcc = lcc_states[lcc_idx[0]] if lcc_idx else None
+            assigned_ccs = [cc_states[j] for j in cc_idx]
+        else:
+            assigned_lcc = next(iter(lcc_pool.take(1, can_work)), None)
+            assigned_ccs = cc_pool.take(3, can_work)
 
         if not assigned_lcc:
             violation_rows.append((legs[0][0], None, 'NO_LEGAL_LCC',
@@ -171,53 +201,29 @@ def build_roster(start_date, end_date):
                 fh = (arr - dep).total_seconds() / 3600
                 roster_rows.append((fid, state.crew_id, duty_date))
                 duty_rows.append((state.crew_id, fid, dep, arr, fh))
+        if selection != 'vector':
+            lcc_pool.restore()
+            cc_pool.restore()
 
         if (i + 1) % 30 == 0:
             print(f"   {i+1}/{total} pairings processed...")
 
-    chunk = 50
+    # Replace and publish in one transaction — readers see the previous
+    # roster until the commit.
     print("   Saving roster...")
-    for j in range(0, len(roster_rows), chunk):
-        try:
-            cur.executemany(
-                "INSERT INTO roster (flight_id, crew_id, duty_date, is_manual_override) "
-                "VALUES (%s,%s,%s,FALSE) ON CONFLICT DO NOTHING",
-                roster_rows[j:j+chunk])
-            conn.commit()
-        except Exception:
-            conn = get_connection(); cur = conn.cursor()
-            cur.executemany(
-                "INSERT INTO roster (flight_id, crew_id, duty_date, is_manual_override) "
-                "VALUES (%s,%s,%s,FALSE) ON CONFLICT DO NOTHING",
-                roster_rows[j:j+chunk])
-            conn.commit()
-
-    print("   Saving duty log...")
-    for j in range(0, len(duty_rows), chunk):
-        try:
-            cur.executemany(
-                "INSERT INTO duty_log (crew_id, flight_id, duty_start, duty_end, total_duty_hours) "
-                "VALUES (%s,%s,%s,%s,%s)",
-                duty_rows[j:j+chunk])
-            conn.commit()
-        except Exception:
-            conn = get_connection(); cur = conn.cursor()
-            cur.executemany(
-                "INSERT INTO duty_log (crew_id, flight_id, duty_start, duty_end, total_duty_hours) "
-                "VALUES (%s,%s,%s,%s,%s)",
-                duty_rows[j:j+chunk])
-            conn.commit()
-
-    if violation_rows:
-        try:
-            cur.executemany(
-                "INSERT INTO legality_violations (flight_id, crew_id, violation_type, details) "
-                "VALUES (%s,%s,%s,%s)",
-                violation_rows)
-            conn.commit()
-        except: pass
-
     cur.close()
+    with BulkWriter(conn) as w:
+        w.lock()
+        w.execute("DELETE FROM duty_log")
+        w.execute("DELETE FROM roster")
+        w.execute("DELETE FROM legality_violations")
+        w.insert('roster', ('flight_id', 'crew_id', 'duty_date', 'is_manual_override'),
+                 roster_rows, on_conflict='ON CONFLICT DO NOTHING', template='(%s,%s,%s,FALSE)')
+        w.copy('duty_log', ('crew_id', 'flight_id', 'duty_start', 'duty_end', 'total_duty_hours'),
+               duty_rows)
+        w.copy('legality_violations', ('flight_id', 'crew_id', 'violation_type', 'details'),
+               violation_rows)
+
     conn.close()
     return len(roster_rows), len(violation_rows)
 
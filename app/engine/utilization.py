@@ -0,0 +1,111 @@
+"""
+Crew utilization over trailing windows, computed in a single SQL statement.
+
+For every active crew member and every requested window (days ending on
+``as_of``, inclusive) the query returns flying hours, sectors, early and
+night departures and manual overrides. Fleet fairness statistics for each
+window — mean, population stddev, Gini coefficient and max/min spread over
+the crew who flew in it — come back on every row as window aggregates.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+DEFAULT_WINDOWS = (7, 28, 365)
+
+EARLY_BEFORE_HOUR = 6      # departures before 06:00
+NIGHT_FROM_HOUR   = 20     # departures from 20:00
+OVER_FACTOR       = 1.2    # zones, relative to the window mean
+UNDER_FACTOR      = 0.8
+
+METRICS = ('hours', 'sectors', 'early', 'night', 'overrides')
+STATS   = ('flown', 'mean', 'std', 'gini', 'spread')
+
+
+def utilization_columns(windows):
+    return (['crew_id', 'full_name', 'role', 'employee_id']
+            + [f'{m}_{w}' for w in windows for m in METRICS]
+            + [f'{s}_{w}' for w in windows for s in STATS])
+
+
+def utilization_sql(as_of, windows=DEFAULT_WINDOWS, role=None):
+    """(sql, params) for the utilization query; columns per utilization_columns()."""
+    windows = sorted({int(w) for w in windows})
+    if not windows or windows[0] < 1:
+        raise ValueError(f"Windows must be positive day counts, got {windows!r}")
+
+    per_window, ranks, stats = [], [], []
+    params = []
+    for w in windows:
+        in_w = "d.day > %s"
+        per_window += [
+            f"COALESCE(SUM(d.hours)     FILTER (WHERE {in_w}), 0) AS hours_{w}",
+            f"COALESCE(SUM(d.sectors)   FILTER (WHERE {in_w}), 0) AS sectors_{w}",
+            f"COALESCE(SUM(d.early)     FILTER (WHERE {in_w}), 0) AS early_{w}",
+            f"COALESCE(SUM(d.night)     FILTER (WHERE {in_w}), 0) AS night_{w}",
+            f"COALESCE(SUM(d.overrides) FILTER (WHERE {in_w}), 0) AS overrides_{w}",
+        ]
+        params += [as_of - timedelta(days=w)] * 5
+        flew = f"sectors_{w} > 0"
+        ranks.append(f"ROW_NUMBER() OVER (PARTITION BY {flew} ORDER BY hours_{w}, crew_id) AS rank_{w}")
+        n, total = f"COUNT(*) FILTER (WHERE {flew}) OVER ()", f"SUM(hours_{w}) FILTER (WHERE {flew}) OVER ()"
+        stats += [
+            f"{n} AS flown_{w}",
+            f"AVG(hours_{w}) FILTER (WHERE {flew}) OVER () AS mean_{w}",
+            f"STDDEV_POP(hours_{w}) FILTER (WHERE {flew}) OVER () AS std_{w}",
+            # Gini over hours sorted ascending: 2·Σ(i·x_i) / (n·Σx) − (n+1)/n
+            f"2 * SUM(rank_{w} * hours_{w}) FILTER (WHERE {flew}) OVER () / NULLIF({n} * {total}, 0)"
+            f" - ({n} + 1.0) / NULLIF({n}, 0) AS gini_{w}",
+            f"MAX(hours_{w}) FILTER (WHERE {flew}) OVER ()"
+            f" - MIN(hours_{w}) FILTER (WHERE {flew}) OVER () AS spread_{w}",
+        ]
+
+    role_sql = ""
+    if role is not None:
+        role_sql = "AND cm.role = %s"
+
+    sql = f"""
+        WITH daily AS (
+            SELECT r.crew_id, fs.departure_date AS day,
+                   SUM(EXTRACT(EPOCH FROM (fs.arrival_time - fs.departure_time)) / 3600) AS hours,
+                   COUNT(*) AS sectors,
+                   COUNT(*) FILTER (WHERE EXTRACT(HOUR FROM fs.departure_time) < {EARLY_BEFORE_HOUR}) AS early,
+                   COUNT(*) FILTER (WHERE EXTRACT(HOUR FROM fs.departure_time) >= {NIGHT_FROM_HOUR}) AS night,
+                   COUNT(*) FILTER (WHERE r.is_manual_override) AS overrides
+            FROM roster r
+            JOIN flight_schedule fs ON fs.id = r.flight_id
+            WHERE fs.departure_date > %s AND fs.departure_date <= %s
+            GROUP BY r.crew_id, fs.departure_date
+        ),
+        per_crew AS (
+            SELECT cm.id AS crew_id, cm.full_name, cm.role, cm.employee_id,
+                   {', '.join(per_window)}
+            FROM crew_master cm
+            LEFT JOIN daily d ON d.crew_id = cm.id
+            WHERE cm.is_active = TRUE {role_sql}
+            GROUP BY cm.id, cm.full_name, cm.role, cm.employee_id
+        ),
+        ranked AS (
+            SELECT *, {', '.join(ranks)}
+            FROM per_crew
+        )
+        SELECT crew_id, full_name, role, employee_id,
+               {', '.join(f'{m}_{w}' for w in windows for m in METRICS)},
+               {', '.join(stats)}
+        FROM ranked
+        ORDER BY role, full_name
+    """
+    head = [as_of - timedelta(days=windows[-1]), as_of]
+    return sql, tuple(head + params + ([role] if role is not None else []))
+
+
+def classify_zones(hours, mean):
+    """Vectorized zone labels for hours against the window mean. Crew with
+    no hours in the window are Idle rather than Under: the mean and the
+    other fairness statistics only cover crew who flew."""
+    hours = np.asarray(hours, dtype=float)
+    mean  = np.asarray(mean, dtype=float)
+    has_mean = np.nan_to_num(mean) > 0
+    return np.select(
+        [hours <= 0, has_mean & (hours > mean * OVER_FACTOR), has_mean & (hours < mean * UNDER_FACTOR)],
+        ['⚪ Idle', '🔴 Over', '🟡 Under'], default='✅ Balanced')
@@ -1,9 +1,11 @@
 import streamlit as st
 from dotenv import load_dotenv
-import psycopg2
 import pandas as pd
 from datetime import date, timedelta
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.utils.query_cache import cached_query
 
 load_dotenv()
 
@@ -13,13 +15,6 @@ st.set_page_config(
     layout="wide"
 )
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
 # ── Sidebar ───────────────────────────────────────────────────────────────────
 st.sidebar.image("https://raw.githubusercontent.com/Najmi125/crew-roster/main/assets/cc.jpg", width=150)
 st.sidebar.title("✈️ XYZ Airlines")
@@ -275,33 +270,28 @@ st.markdown('<div class="section-header">◈ LIVE OPERATIONAL STATUS — TODAY &
 
 # ── DB ────────────────────────────────────────────────────────────────────────
 try:
-    conn = get_connection()
-    cur  = conn.cursor()
     today    = date.today()
     tomorrow = today + timedelta(days=1)
 
     # Qualification alerts
     try:
-        cur.execute("""
+        alerts = cached_query("""
             SELECT cm.full_name, cm.employee_id, cq.qualification_type, cq.expiry_date
             FROM crew_qualifications cq
             JOIN crew_master cm ON cm.id = cq.crew_id
             WHERE cq.expiry_date <= %s
             ORDER BY cq.expiry_date, cm.full_name
-        """, (today + timedelta(days=3),))
-        alerts = cur.fetchall()
+        """, (today + timedelta(days=3),), scopes=('crew',))
 
-        cur.execute("""
+        expiring_crew_ids = {row[0] for row in cached_query("""
             SELECT DISTINCT crew_id FROM crew_qualifications WHERE expiry_date <= %s
-        """, (today + timedelta(days=3),))
-        expiring_crew_ids = {row[0] for row in cur.fetchall()}
+        """, (today + timedelta(days=3),), scopes=('crew',))}
 
-        cur.execute("""
+        crew_qual_details = {}
+        for crew_id, qual_type, exp in cached_query("""
             SELECT crew_id, qualification_type, expiry_date
             FROM crew_qualifications WHERE expiry_date <= %s ORDER BY expiry_date
-        """, (today + timedelta(days=3),))
-        crew_qual_details = {}
-        for crew_id, qual_type, exp in cur.fetchall():
+        """, (today + timedelta(days=3),), scopes=('crew',)):
             crew_qual_details.setdefault(crew_id, []).append(f"{qual_type} {exp.strftime('%d %b')}")
 
         if alerts:
@@ -322,52 +312,57 @@ try:
         expiring_crew_ids = set()
         crew_qual_details = {}
 
-    # Today & Tomorrow roster
-    cur.execute("""
+    # Today & Tomorrow: every flight, its cancellation flag and its crew
+    # (crewless and cancelled flights come back with NULL crew columns)
+    rows = cached_query("""
         SELECT
-            fs.departure_time::date AS duty_date,
+            fs.departure_date AS duty_date,
+            fs.id AS flight_id,
             fs.flight_number,
             fs.origin || '→' || fs.destination AS route,
             TO_CHAR(fs.departure_time, 'HH24:MI') AS dep,
             TO_CHAR(fs.arrival_time,   'HH24:MI') AS arr,
             fs.aircraft_type,
+            EXISTS (SELECT 1 FROM legality_violations lv
+                    WHERE lv.flight_id = fs.id AND lv.violation_type = 'FLIGHT_CANCELLED') AS cancelled,
             cm.full_name,
             cm.role,
             cm.employee_id,
             cm.id AS crew_id,
             r.is_manual_override
-        FROM roster r
-        JOIN flight_schedule fs ON fs.id = r.flight_id
-        JOIN crew_master     cm ON cm.id = r.crew_id
-        WHERE fs.departure_time::date IN (%s, %s)
+        FROM flight_schedule fs
+        LEFT JOIN roster      r  ON r.flight_id = fs.id
+        LEFT JOIN crew_master cm ON cm.id = r.crew_id
+        WHERE fs.departure_date IN (%s, %s)
         ORDER BY fs.departure_time, cm.role DESC, cm.full_name
-    """, (today, tomorrow))
-    rows = cur.fetchall()
+    """, (today, tomorrow), scopes=('roster', 'schedule', 'crew'))
 
-    cols = ['duty_date','flight_number','route','dep','arr','aircraft_type',
+    cols = ['duty_date','flight_id','flight_number','route','dep','arr','aircraft_type','cancelled',
             'full_name','role','employee_id','crew_id','is_manual_override']
     df = pd.DataFrame(rows, columns=cols)
 
     if df.empty:
-        st.warning("No roster data found for today or tomorrow.")
+        st.warning("No flights scheduled for today or tomorrow.")
     else:
-        for duty_date in [today, tomorrow]:
+        for duty_date, day_df in df.groupby('duty_date', sort=True):
             label  = "TODAY" if duty_date == today else "TOMORROW"
-            day_df = df[df['duty_date'] == duty_date]
-            if day_df.empty:
-                continue
 
             st.subheader(f"📅 {label} — {duty_date.strftime('%A, %d %B %Y')}")
 
-            for flight_num in sorted(day_df['flight_number'].unique()):
-                fl_rows = day_df[day_df['flight_number'] == flight_num]
+            for (flight_num, _), fl_rows in day_df.groupby(['flight_number', 'flight_id'], sort=True):
                 fl_info = fl_rows.iloc[0]
+                crew    = fl_rows.dropna(subset=['crew_id'])
+                status  = "  |  ❌ CANCELLED" if fl_info['cancelled'] else ("  |  ⚠️ NO CREW" if crew.empty else "")
 
                 with st.expander(
                     f"✈️ {flight_num}  |  {fl_info['route']}  |  "
-                    f"{fl_info['dep']}→{fl_info['arr']}  |  {fl_info['aircraft_type']}"
+                    f"{fl_info['dep']}→{fl_info['arr']}  |  {fl_info['aircraft_type']}{status}"
                 ):
-                    for _, crew_row in fl_rows.iterrows():
+                    if fl_info['cancelled']:
+                        st.caption("Cancelled — no crew rostered.")
+                    elif crew.empty:
+                        st.caption("No crew rostered on this flight.")
+                    for _, crew_row in crew.iterrows():
                         role_icon    = "🟡" if crew_row['role'] == 'LCC' else "🔵"
                         override_tag = " ⚠️ *Manual Override*" if crew_row['is_manual_override'] else ""
                         qual_warn    = ""
@@ -381,8 +376,5 @@ try:
                         )
             st.markdown("---")
 
-    cur.close()
-    conn.close()
-
 except Exception as e:
     st.error(f"Database connection error: {e}")
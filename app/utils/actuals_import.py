@@ -0,0 +1,278 @@
+"""
+Batch ingest of actual block times — MVT movement messages or CSV — into
+flight_actuals and duty_log.
+
+Messages are parsed here and COPYed into a temp staging table; everything
+else is set-based SQL in one transaction per batch:
+
+  * each message is matched to its scheduled leg (flight number, flight date
+    and the departure station — or, for an arrival message, the arrival
+    station); unknown flights are rejected;
+  * per flight the latest block off and block on win — an AD (departure) and
+    an AA (arrival) message may come in separate files, and a half already in
+    flight_actuals completes the other;
+  * block off lands on the day nearest the scheduled departure and block on
+    on the first time after block off, so arrivals after midnight (and UTC
+    dates either side of local midnight) resolve correctly;
+  * flights still missing a half, or whose block time is implausible, are
+    rejected with the reason; the rest are upserted into flight_actuals and
+    their duty_log rows retimed, one statement each.
+
+    python -m app.utils.actuals_import feed/ [--utc-offset +0500] [--dry-run]
+
+MVT times are UTC; --utc-offset (default $MVT_UTC_OFFSET or +0000) converts
+them to the schedule's local time. CSV files are local time, with a header:
+
+    flight_number,date,origin,block_off,block_on,notes
+    XYZ301,2026-10-18,KHI,08:05,11:10,ATC hold
+"""
+import csv
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from app.utils.bulk_writer import BulkWriter
+
+UTC_OFFSET = os.getenv("MVT_UTC_OFFSET", "+0000")
+MAX_BLOCK_FACTOR = 2      # reject block times over twice the scheduled block
+
+# Staged message, numbered in arrival order (seq). It names the leg by origin
+# or by destination. block_off/block_on are minutes from day_start (00:00
+# local on the flight date, or 00:00 UTC shifted to local); either may be
+# missing.
+MESSAGE_COLUMNS = ('seq', 'source', 'flight_number', 'origin', 'destination', 'day_start',
+                   'block_off', 'block_on', 'notes', 'entered_by')
+
+CSV_REQUIRED = {'flight_number', 'date', 'origin'}
+
+_MVT_FLIGHT = re.compile(r'^([A-Z0-9]{2}[A-Z]?)(\d{1,4})([A-Z]?)/(\d{2})(?:\.[A-Z0-9-]*)?\.([A-Z]{3})\b')
+_MVT_TIMES  = re.compile(r'^(AD|AA)(\d{4}|\d{6})(?:/(\d{4}|\d{6}))?\b')
+
+
+def _minutes(hhmm):
+    hhmm = hhmm.strip().replace(':', '')
+    if len(hhmm) != 4 or not hhmm.isdigit() or int(hhmm[:2]) > 23 or int(hhmm[2:]) > 59:
+        raise ValueError(f"bad time {hhmm!r}")
+    return int(hhmm[:2]) * 60 + int(hhmm[2:])
+
+
+def utc_offset_minutes(s):
+    """'+0500' -> 300."""
+    s = s.strip()
+    sign = -1 if s.startswith('-') else 1
+    return sign * _minutes(s.lstrip('+-'))
+
+
+def _flight_date(day, ref):
+    """Latest date with this day of month on or before the day after ``ref``."""
+    d = ref + timedelta(days=1)
+    for _ in range(3):
+        try:
+            candidate = d.replace(day=day)
+        except ValueError:
+            candidate = None
+        if candidate is not None and candidate <= ref + timedelta(days=1):
+            return candidate
+        d = d.replace(day=1) - timedelta(days=1)
+    raise ValueError(f"bad day of month {day}")
+
+
+def read_mvt(lines, source='', ref=None, utc_offset=UTC_OFFSET):
+    """Yield staged messages from MVT text (one or more messages).
+
+    Uses the flight line (designator/day.registration.station — the
+    departure station on an AD message, the arrival station on an AA), AD
+    off-block and AA on-block times; DL delay and SI lines become the notes.
+    """
+    ref    = ref or date.today()
+    offset = timedelta(minutes=utc_offset_minutes(utc_offset))
+    msg = None
+
+    def finish():
+        if msg and (msg['off'] is not None or msg['on'] is not None):
+            arrival = msg['off'] is None
+            yield (f"{source}:{msg['line']}", msg['flight'],
+                   None if arrival else msg['station'], msg['station'] if arrival else None, msg['day_start'],
+                   msg['off'], msg['on'], ' '.join(msg['notes']) or None, 'MVT')
+
+    for n, line in enumerate(lines, 1):
+        line = line.strip().upper()
+        try:
+            if line.startswith('MVT'):
+                yield from finish()
+                msg = None
+            elif (m := _MVT_FLIGHT.match(line)):
+                yield from finish()
+                airline, number, suffix, day, station = m.groups()
+                msg = {'line': n, 'flight': f"{airline}{int(number)}{suffix}", 'station': station,
+                       'day_start': datetime.combine(_flight_date(int(day), ref), time()) + offset,
+                       'off': None, 'on': None, 'notes': []}
+            elif msg and (m := _MVT_TIMES.match(line)):
+                kind, first, second = m.groups()
+                if kind == 'AD':
+                    msg['off'] = _minutes(first[-4:])
+                else:
+                    msg['on'] = _minutes((second or first)[-4:])
+            elif msg and line.startswith(('DL', 'SI')):
+                msg['notes'].append(line)
+        except ValueError as e:
+            raise ValueError(f"{source} line {n}: {e}") from None
+    yield from finish()
+
+
+def read_csv(lines, source=''):
+    """Yield staged messages from the CSV variant (local times; either block
+    time may be blank)."""
+    reader = csv.DictReader(lines)
+    missing = CSV_REQUIRED - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"{source}: CSV is missing column(s): {', '.join(sorted(missing))}")
+    for row in reader:
+        n = reader.line_num
+        try:
+            off = (row.get('block_off') or '').strip()
+            on  = (row.get('block_on') or '').strip()
+            if not (off or on):
+                raise ValueError("no block off or block on time")
+            yield (f"{source}:{n}", row['flight_number'].strip().upper(), row['origin'].strip().upper(), None,
+                   date.fromisoformat(row['date'].strip()),
+                   _minutes(off) if off else None, _minutes(on) if on else None,
+                   (row.get('notes') or '').strip() or None, 'CSV')
+        except ValueError as e:
+            raise ValueError(f"{source} line {n}: {e}") from None
+
+
+def read_path(path, ref=None, utc_offset=UTC_OFFSET):
+    """Yield staged messages from a file, or from every file in a directory
+    (in name order). *.csv files are CSV, anything else MVT."""
+    path  = Path(path)
+    files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+    for p in files:
+        with open(p, newline='', encoding='utf-8') as f:
+            if p.suffix.lower() == '.csv':
+                yield from read_csv(f, p.name)
+            else:
+                yield from read_mvt(f, p.name, ref, utc_offset)
+
+
+def import_actuals(conn, messages, dry_run=False, verbose=True):
+    """Apply staged ``messages``. Returns (counts, rejected) where rejected
+    is [(source, flight_number, reason)]."""
+    messages = [(seq, *m) for seq, m in enumerate(messages, 1)]
+    if not messages:
+        raise ValueError("No block times found")
+
+    with BulkWriter(conn, verbose=verbose, dry_run=dry_run) as w:
+        w.execute("""
+            CREATE TEMP TABLE actuals_import (
+                seq INT, source TEXT, flight_number VARCHAR(20), origin VARCHAR(10), destination VARCHAR(10),
+                day_start TIMESTAMP,
+                block_off INT, block_on INT, notes TEXT, entered_by VARCHAR(100)
+            ) ON COMMIT DROP
+        """)
+        w.copy('actuals_import', MESSAGE_COLUMNS, messages)
+
+        w.execute("""
+            CREATE TEMP TABLE actuals_matched ON COMMIT DROP AS
+            SELECT s.*, fs.id AS flight_id, fs.departure_time, fs.arrival_time
+            FROM actuals_import s
+            LEFT JOIN flight_schedule fs
+                   ON fs.flight_number = s.flight_number
+                  AND (fs.origin = s.origin OR fs.destination = s.destination)
+                  AND fs.departure_time >= s.day_start AND fs.departure_time < s.day_start + INTERVAL '1 day'
+        """)
+        w.cur.execute("""
+            SELECT source, flight_number, 'no scheduled ' || flight_number
+                   || COALESCE(' from ' || origin, ' to ' || destination) || ' on ' || day_start::date
+            FROM actuals_matched WHERE flight_id IS NULL ORDER BY seq
+        """)
+        rejected = w.cur.fetchall()
+
+        # Latest message wins per half; block off moves by whole days to the
+        # nearest scheduled departure, block on to the first time after it.
+        w.execute(f"""
+            CREATE TEMP TABLE actuals_batch ON COMMIT DROP AS
+            WITH latest AS (
+                SELECT flight_id, flight_number, departure_time, arrival_time,
+                       (array_agg(day_start + block_off * INTERVAL '1 minute' ORDER BY seq DESC)
+                            FILTER (WHERE block_off IS NOT NULL))[1] AS off_at,
+                       (array_agg(day_start + block_on * INTERVAL '1 minute' ORDER BY seq DESC)
+                            FILTER (WHERE block_on IS NOT NULL))[1] AS on_at,
+                       (array_agg(notes ORDER BY seq DESC) FILTER (WHERE notes IS NOT NULL))[1] AS notes,
+                       (array_agg(entered_by ORDER BY seq DESC))[1] AS entered_by,
+                       string_agg(source, ', ' ORDER BY seq) AS sources
+                FROM actuals_matched WHERE flight_id IS NOT NULL
+                GROUP BY flight_id, flight_number, departure_time, arrival_time
+            ), resolved AS (
+                SELECT l.*, COALESCE(
+                           l.off_at + ROUND(EXTRACT(EPOCH FROM (l.departure_time - l.off_at)) / 86400) * INTERVAL '1 day',
+                           fa.actual_block_off) AS block_off,
+                       fa.actual_block_on AS stored_on
+                FROM latest l
+                LEFT JOIN flight_actuals fa ON fa.flight_id = l.flight_id
+            ), complete AS (
+                SELECT r.*, COALESCE(
+                           r.on_at + (FLOOR(EXTRACT(EPOCH FROM (r.block_off - r.on_at)) / 86400) + 1) * INTERVAL '1 day',
+                           r.stored_on) AS block_on
+                FROM resolved r
+            )
+            SELECT flight_id, flight_number, sources, notes, entered_by, block_off, block_on,
+                   CASE
+                       WHEN block_off IS NULL THEN 'no block off yet'
+                       WHEN block_on IS NULL THEN 'no block on yet'
+                       WHEN block_on <= block_off THEN 'block on is not after block off'
+                       WHEN block_on - block_off > {MAX_BLOCK_FACTOR} * (arrival_time - departure_time)
+                           THEN 'block time ' || to_char(block_on - block_off, 'HH24:MI')
+                                || ' is over {MAX_BLOCK_FACTOR}x the scheduled '
+                                || to_char(arrival_time - departure_time, 'HH24:MI')
+                   END AS problem
+            FROM complete
+        """)
+        w.cur.execute("SELECT sources, flight_number, problem FROM actuals_batch WHERE problem IS NOT NULL ORDER BY sources")
+        rejected += w.cur.fetchall()
+
+        upserted = w.execute("""
+            INSERT INTO flight_actuals (flight_id, actual_block_off, actual_block_on, entered_by, notes)
+            SELECT flight_id, block_off, block_on, entered_by, notes
+            FROM actuals_batch WHERE problem IS NULL
+            ON CONFLICT (flight_id) DO UPDATE
+            SET actual_block_off = EXCLUDED.actual_block_off,
+                actual_block_on  = EXCLUDED.actual_block_on,
+                entered_by       = EXCLUDED.entered_by,
+                notes            = COALESCE(EXCLUDED.notes, flight_actuals.notes),
+                entered_at       = NOW()
+        """, table='flight_actuals (upsert)')
+        w.execute("""
+            UPDATE duty_log dl
+            SET duty_start = b.block_off, duty_end = b.block_on,
+                total_duty_hours = EXTRACT(EPOCH FROM (b.block_on - b.block_off)) / 3600
+            FROM actuals_batch b
+            WHERE dl.flight_id = b.flight_id AND b.problem IS NULL
+        """, table='duty_log (actuals)')
+
+    return {'messages': len(messages), 'flights': upserted, 'rejected': len(rejected)}, rejected
+
+
+if __name__ == "__main__":
+    import argparse
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Ingest MVT or CSV block times into flight_actuals.")
+    parser.add_argument("path", help="a message file, or a directory of them")
+    parser.add_argument("--utc-offset", default=UTC_OFFSET, help="local time minus UTC for MVT times, e.g. +0500")
+    parser.add_argument("--ref-date", type=date.fromisoformat,
+                        help="date MVT day-of-month fields are resolved against (default today)")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes, then roll back")
+    args = parser.parse_args()
+    messages = list(read_path(args.path, args.ref_date, args.utc_offset))
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    counts, rejected = import_actuals(conn, messages, dry_run=args.dry_run)
+    conn.close()
+    for source, fn, reason in rejected[:20]:
+        print(f"   ✗ {source} {fn}: {reason}")
+    if len(rejected) > 20:
+        print(f"   … and {len(rejected) - 20} more")
+    print(f"{'🔎 Dry run' if args.dry_run else '✅ Imported'} "
+          + ", ".join(f"{n} {k}" for k, n in counts.items()))
@@ -0,0 +1,144 @@
+"""
+Bulk writes for the roster engines and seed scripts.
+
+Plain appends stream through COPY FROM STDIN; inserts that need ON CONFLICT
+go through execute_values. Everything written inside one `with BulkWriter(conn)`
+block is a single transaction — committed once on exit, rolled back on error
+(or always, with dry_run=True: the report then previews what would change).
+
+The engines also clear the rows they replace inside that block, so a rebuild
+is published atomically: until the commit, every reader keeps seeing the last
+committed roster (MVCC — plain SELECTs never wait on the writer).
+"""
+import time
+import zlib
+from datetime import date, datetime
+
+from psycopg2.extras import execute_values
+
+
+# Serializes roster publishers (build_roster, reoptimize_from) without
+# blocking readers.
+ROSTER_LOCK = zlib.crc32(b'roster-publish')
+
+
+def _copy_value(v):
+    if v is None:
+        return '\\N'
+    if isinstance(v, bool):
+        return 't' if v else 'f'
+    if isinstance(v, (datetime, date)):
+        return v.isoformat(' ') if isinstance(v, datetime) else v.isoformat()
+    return (str(v).replace('\\', '\\\\').replace('\t', '\\t')
+                  .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class _RowStream:
+    """File-like view of rows in COPY text format, encoded lazily as read."""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buf  = ''
+        self.count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buf) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.buf += '\t'.join(_copy_value(v) for v in row) + '\n'
+            self.count += 1
+        if size < 0:
+            out, self.buf = self.buf, ''
+        else:
+            out, self.buf = self.buf[:size], self.buf[size:]
+        return out
+
+
+class BulkWriter:
+    """Single-transaction bulk writer; reports rows/sec per table on commit."""
+
+    def __init__(self, conn, verbose=True, dry_run=False):
+        self.conn    = conn
+        self.verbose = verbose
+        self.dry_run = dry_run
+        self.stats   = []     # (table, rows, seconds)
+        self.cur     = None
+
+    def __enter__(self):
+        self.cur     = self.conn.cursor()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and not self.dry_run:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        if exc_type is None and self.verbose:
+            self.report()
+        self.cur.close()
+        return False
+
+    def lock(self, key=ROSTER_LOCK):
+        """Take a transaction-scoped advisory lock, released on commit/rollback."""
+        self.cur.execute("SELECT pg_advisory_xact_lock(%s)", (key,))
+
+    def execute(self, sql, params=None, table=None):
+        """Run one statement and return its rowcount; with ``table``, it is
+        timed and reported under that name."""
+        def run():
+            self.cur.execute(sql, params)
+            return self.cur.rowcount
+        return run() if table is None else self._timed(table, run)
+
+    def _timed(self, table, fn):
+        t0 = time.perf_counter()
+        n  = fn()
+        self.stats.append((table, n, time.perf_counter() - t0))
+        return n
+
+    def copy(self, table, columns, rows):
+        """COPY rows into table(columns). Returns the number of rows sent."""
+        def run():
+            stream = _RowStream(rows)
+            self.cur.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream)
+            return stream.count
+        return self._timed(table, run)
+
+    def insert(self, table, columns, rows, on_conflict='', template=None, page_size=1000):
+        """Multi-row INSERT via execute_values, for when ON CONFLICT is needed."""
+        rows = list(rows)
+        def run():
+            if rows:
+                execute_values(
+                    self.cur,
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s {on_conflict}",
+                    rows, template=template, page_size=page_size)
+            return len(rows)
+        return self._timed(table, run)
+
+    def delete(self, table, columns, keys, where=None):
+        """Set-based DELETE of the rows whose ``columns`` match any of ``keys``."""
+        keys = list(keys)
+        def run():
+            if keys:
+                match = ' AND '.join(f't.{c} = k.{c}' for c in columns)
+                if where:
+                    match += f' AND {where}'
+                execute_values(
+                    self.cur,
+                    f"DELETE FROM {table} t USING (VALUES %s) AS k ({', '.join(columns)}) WHERE {match}",
+                    keys, page_size=1000)
+            return len(keys)
+        return self._timed(f'{table} (delete)', run)
+
+    def report(self):
+        for table, n, secs in self.stats:
+            rate = n / secs if secs > 0 else 0
+            print(f"   {table}: {n} rows in {secs:.2f}s ({rate:,.0f} rows/s)")
+        total = sum(n for _, n, _ in self.stats)
+        secs  = time.perf_counter() - self.started
+        done  = "Dry run, rolled back" if self.dry_run else "Committed"
+        print(f"   {done} {total} rows in {secs:.2f}s ({total / secs if secs > 0 else 0:,.0f} rows/s)")
@@ -0,0 +1,345 @@
+"""
+Bulk crew data import — crew_master, crew_qualifications and crew_leave from
+CSV or Excel.
+
+Rows are validated here (bad rows are rejected with their line and reason)
+and COPYed into a temp staging table; the merge is set-based SQL in one
+transaction: changed rows are updated, new rows inserted, and the last row
+wins when a file repeats a key. Unknown employee IDs are rejected. Leave
+ranges are expanded to days server-side, and any rostered duty that falls
+on a leave day is removed — roster and duty_log — in a single statement.
+With dry_run the whole merge runs and is rolled back, so the counts are an
+exact preview.
+
+    python -m app.utils.crew_import crew onboarding.xlsx --dry-run
+    python -m app.utils.crew_import qualifications recurrent_2026.csv
+    python -m app.utils.crew_import leave leave_plan.xlsx --reoptimize
+
+Columns (header row, any case; the Crew Data CSV export also reads back):
+    crew            employee_id, full_name, role (LCC/CC), [whatsapp_number], [is_active]
+    qualifications  employee_id, qualification_type, expiry_date, [last_renewed], [notes]
+                    — or one column per qualification type holding its expiry
+    leave           employee_id, from_date, [to_date], leave_type, [notes]
+"""
+from datetime import date, datetime
+
+import pandas as pd
+
+from app.utils.bulk_writer import BulkWriter
+
+QUAL_TYPES  = ['Medical', 'SEP', 'CRM', 'DG']
+ROLES       = ('LCC', 'CC')
+MAX_LEAVE_DAYS = 366
+
+# Header spellings accepted besides the column names themselves
+_ALIASES = {
+    'id': 'employee_id', 'employee': 'employee_id', 'name': 'full_name', 'whatsapp': 'whatsapp_number',
+    'status': 'is_active', 'active': 'is_active', 'qualification': 'qualification_type',
+    'expiry': 'expiry_date', 'from': 'from_date', 'to': 'to_date', 'type': 'leave_type',
+}
+_TRUE  = {'true', 't', 'yes', 'y', '1', 'active'}
+_FALSE = {'false', 'f', 'no', 'n', '0', 'inactive'}
+_DATE_FORMATS = ('%d/%m/%Y', '%d-%b-%Y', '%d %b %Y', '%d-%m-%Y')
+
+KINDS = {
+    'crew':           ('line', 'employee_id', 'full_name', 'role', 'whatsapp_number', 'is_active'),
+    'qualifications': ('line', 'employee_id', 'qualification_type', 'expiry_date', 'last_renewed', 'notes'),
+    'leave':          ('line', 'employee_id', 'from_date', 'to_date', 'leave_type', 'notes'),
+}
+
+# Staging tables, one per kind (<kind>_import)
+_STAGING = {
+    'crew': """
+        CREATE TEMP TABLE crew_import (
+            line INT, employee_id VARCHAR(20), full_name VARCHAR(100), role VARCHAR(10),
+            whatsapp_number VARCHAR(20), is_active BOOLEAN
+        ) ON COMMIT DROP
+    """,
+    'qualifications': """
+        CREATE TEMP TABLE qualifications_import (
+            line INT, employee_id VARCHAR(20), qualification_type VARCHAR(20), expiry_date DATE,
+            last_renewed DATE, notes TEXT
+        ) ON COMMIT DROP
+    """,
+    'leave': """
+        CREATE TEMP TABLE leave_import (
+            line INT, employee_id VARCHAR(20), from_date DATE, to_date DATE,
+            leave_type VARCHAR(50), notes TEXT
+        ) ON COMMIT DROP
+    """,
+}
+
+
+def _column(name):
+    name = str(name).strip().lower().replace(' ', '_')
+    return _ALIASES.get(name, name)
+
+
+def read_table(f, name):
+    """[(line, {column: text})] from a CSV or Excel file (first sheet)."""
+    if name.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(f, dtype=str)
+    else:
+        df = pd.read_csv(f, dtype=str, keep_default_na=False)
+    df = df.fillna('')
+    df.columns = [_column(c) for c in df.columns]
+    return [(i + 2, {k: str(v).strip() for k, v in row.items()})
+            for i, row in enumerate(df.to_dict('records'))]
+
+
+def _date(s, field):
+    if not s:
+        raise ValueError(f"{field} is required")
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"bad {field} {s!r}")
+
+
+def _required(row, field):
+    value = row.get(field, '')
+    if not value:
+        raise ValueError(f"{field} is required")
+    return value
+
+
+def _crew(line, row):
+    role = _required(row, 'role').upper()
+    if role not in ROLES:
+        raise ValueError(f"role must be one of {', '.join(ROLES)}, not {role!r}")
+    active = row.get('is_active', '').lower()
+    if active and active not in _TRUE | _FALSE:
+        raise ValueError(f"bad is_active {row['is_active']!r}")
+    yield (line, _required(row, 'employee_id'), _required(row, 'full_name'), role,
+           row.get('whatsapp_number') or None, (active in _TRUE) if active else None)
+
+
+def _qualifications(line, row):
+    employee_id = _required(row, 'employee_id')
+    if 'qualification_type' in row:
+        qt = {q.lower(): q for q in QUAL_TYPES}.get(_required(row, 'qualification_type').lower())
+        if qt is None:
+            raise ValueError(f"qualification_type must be one of {', '.join(QUAL_TYPES)}")
+        renewed = row.get('last_renewed')
+        yield (line, employee_id, qt, _date(row.get('expiry_date', ''), 'expiry_date'),
+               _date(renewed, 'last_renewed') if renewed else None, row.get('notes') or None)
+        return
+    # Wide layout: one expiry column per qualification type
+    found = False
+    for qt in QUAL_TYPES:
+        value = row.get(qt.lower(), '')
+        if value and value.upper() != 'N/A':
+            found = True
+            yield (line, employee_id, qt, _date(value, qt), None, None)
+    if not found:
+        raise ValueError("no qualification_type column and no expiry under " + '/'.join(QUAL_TYPES))
+
+
+def _leave(line, row):
+    from_date = _date(row.get('from_date', ''), 'from_date')
+    to_date   = _date(row['to_date'], 'to_date') if row.get('to_date') else from_date
+    if to_date < from_date:
+        raise ValueError(f"to_date {to_date} is before from_date {from_date}")
+    if (to_date - from_date).days >= MAX_LEAVE_DAYS:
+        raise ValueError(f"leave over {MAX_LEAVE_DAYS} days")
+    yield (line, _required(row, 'employee_id'), from_date, to_date,
+           _required(row, 'leave_type'), row.get('notes') or None)
+
+
+_PARSERS = {'crew': _crew, 'qualifications': _qualifications, 'leave': _leave}
+
+
+def parse(kind, records):
+    """Validate read_table() records. Returns (rows, rejected) where rejected
+    is [(line, employee_id, reason)]."""
+    rows, rejected = [], []
+    for line, row in records:
+        try:
+            rows += list(_PARSERS[kind](line, row))
+        except ValueError as e:
+            rejected.append((line, row.get('employee_id', ''), str(e)))
+    return rows, rejected
+
+
+def remove_duties_on_leave(cur, from_date, to_date, crew_ids=None):
+    """Drop roster assignments — and their duty_log rows — that fall on a
+    leave day between the dates, in one statement. Returns (removed, first
+    duty date removed, crew ids affected)."""
+    cur.execute("""
+        WITH removed AS (
+            DELETE FROM roster r USING crew_leave cl
+            WHERE cl.crew_id = r.crew_id AND cl.leave_date = r.duty_date
+              AND r.duty_date BETWEEN %s AND %s
+              AND (%s::int[] IS NULL OR r.crew_id = ANY(%s::int[]))
+            RETURNING r.crew_id, r.flight_id, r.duty_date
+        ), duties AS (
+            DELETE FROM duty_log dl USING removed
+            WHERE dl.crew_id = removed.crew_id AND dl.flight_id = removed.flight_id
+        )
+        SELECT COUNT(*), MIN(duty_date), COALESCE(array_agg(DISTINCT crew_id), '{}') FROM removed
+    """, (from_date, to_date, crew_ids, crew_ids))
+    return cur.fetchone()
+
+
+def _merge_crew(w):
+    w.execute("""
+        CREATE TEMP TABLE crew_import_latest ON COMMIT DROP AS
+        SELECT DISTINCT ON (employee_id) * FROM crew_import ORDER BY employee_id, line DESC
+    """)
+    updated = w.execute("""
+        UPDATE crew_master cm
+        SET full_name = s.full_name, role = s.role,
+            whatsapp_number = COALESCE(s.whatsapp_number, cm.whatsapp_number),
+            is_active = COALESCE(s.is_active, cm.is_active)
+        FROM crew_import_latest s
+        WHERE cm.employee_id = s.employee_id
+          AND (cm.full_name, cm.role, cm.whatsapp_number, cm.is_active)
+              IS DISTINCT FROM (s.full_name, s.role, COALESCE(s.whatsapp_number, cm.whatsapp_number),
+                                COALESCE(s.is_active, cm.is_active))
+    """, table='crew_master (update)')
+    inserted = w.execute("""
+        INSERT INTO crew_master (employee_id, full_name, role, whatsapp_number, is_active)
+        SELECT employee_id, full_name, role, whatsapp_number, COALESCE(is_active, TRUE)
+        FROM crew_import_latest s
+        WHERE NOT EXISTS (SELECT 1 FROM crew_master cm WHERE cm.employee_id = s.employee_id)
+        ORDER BY line
+        ON CONFLICT (employee_id) DO NOTHING
+    """, table='crew_master (insert)')
+    w.cur.execute("SELECT COUNT(*) FROM crew_import_latest")
+    return {'inserted': inserted, 'updated': updated, 'unchanged': w.cur.fetchone()[0] - inserted - updated}, None
+
+
+def _merge_qualifications(w):
+    w.execute("""
+        CREATE TEMP TABLE qualifications_import_latest ON COMMIT DROP AS
+        SELECT DISTINCT ON (cm.id, s.qualification_type) cm.id AS crew_id, s.*
+        FROM qualifications_import s JOIN crew_master cm ON cm.employee_id = s.employee_id
+        ORDER BY cm.id, s.qualification_type, s.line DESC
+    """)
+    updated = w.execute("""
+        UPDATE crew_qualifications cq
+        SET expiry_date = s.expiry_date,
+            last_renewed = COALESCE(s.last_renewed, cq.last_renewed),
+            notes = COALESCE(s.notes, cq.notes)
+        FROM qualifications_import_latest s
+        WHERE cq.crew_id = s.crew_id AND cq.qualification_type = s.qualification_type
+          AND (cq.expiry_date, cq.last_renewed, cq.notes)
+              IS DISTINCT FROM (s.expiry_date, COALESCE(s.last_renewed, cq.last_renewed), COALESCE(s.notes, cq.notes))
+    """, table='crew_qualifications (update)')
+    inserted = w.execute("""
+        INSERT INTO crew_qualifications (crew_id, qualification_type, expiry_date, last_renewed, notes)
+        SELECT crew_id, qualification_type, expiry_date, last_renewed, notes
+        FROM qualifications_import_latest s
+        WHERE NOT EXISTS (SELECT 1 FROM crew_qualifications cq
+                          WHERE cq.crew_id = s.crew_id AND cq.qualification_type = s.qualification_type)
+        ON CONFLICT (crew_id, qualification_type) DO NOTHING
+    """, table='crew_qualifications (insert)')
+    w.cur.execute("SELECT COUNT(*) FROM qualifications_import_latest")
+    return {'inserted': inserted, 'updated': updated, 'unchanged': w.cur.fetchone()[0] - inserted - updated}, None
+
+
+def _merge_leave(w):
+    # One row per crew and day; a later line wins where ranges overlap
+    w.execute("""
+        CREATE TEMP TABLE leave_import_days ON COMMIT DROP AS
+        SELECT DISTINCT ON (cm.id, d) cm.id AS crew_id, d::date AS leave_date, s.leave_type, s.notes
+        FROM leave_import s
+        JOIN crew_master cm ON cm.employee_id = s.employee_id
+        CROSS JOIN LATERAL generate_series(s.from_date, s.to_date, INTERVAL '1 day') d
+        ORDER BY cm.id, d, s.line DESC
+    """, table='leave_import_days')
+    updated = w.execute("""
+        UPDATE crew_leave cl
+        SET leave_type = s.leave_type, notes = COALESCE(s.notes, cl.notes)
+        FROM leave_import_days s
+        WHERE cl.crew_id = s.crew_id AND cl.leave_date = s.leave_date
+          AND (cl.leave_type, cl.notes) IS DISTINCT FROM (s.leave_type, COALESCE(s.notes, cl.notes))
+    """, table='crew_leave (update)')
+    inserted = w.execute("""
+        INSERT INTO crew_leave (crew_id, leave_date, leave_type, notes)
+        SELECT crew_id, leave_date, leave_type, notes
+        FROM leave_import_days s
+        WHERE NOT EXISTS (SELECT 1 FROM crew_leave cl WHERE cl.crew_id = s.crew_id AND cl.leave_date = s.leave_date)
+        ON CONFLICT (crew_id, leave_date) DO NOTHING
+    """, table='crew_leave (insert)')
+    w.cur.execute("SELECT COUNT(*), MIN(leave_date), MAX(leave_date), array_agg(DISTINCT crew_id) FROM leave_import_days")
+    days, first, last, crew_ids = w.cur.fetchone()
+    counts = {'inserted': inserted, 'updated': updated, 'unchanged': days - inserted - updated, 'duties_removed': 0}
+    if not days:
+        return counts, None
+    removed, from_date, crew_ids = remove_duties_on_leave(w.cur, first, last, crew_ids)
+    counts['duties_removed'] = removed
+    return counts, (from_date, crew_ids) if removed else None
+
+
+_MERGES = {'crew': _merge_crew, 'qualifications': _merge_qualifications, 'leave': _merge_leave}
+
+
+def import_rows(conn, kind, rows, dry_run=False, verbose=True):
+    """Merge parsed ``rows`` of ``kind``. Returns (counts, rejected, repair):
+    rejected is [(line, employee_id, reason)] for unknown employees, and
+    repair is (from_date, crew_ids) to hand to reoptimize_from when leave
+    removed rostered duties, else None."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown import {kind!r} — expected one of {sorted(KINDS)}")
+    columns = KINDS[kind]
+    staging = f"{kind}_import"
+    with BulkWriter(conn, verbose=verbose, dry_run=dry_run) as w:
+        w.execute(_STAGING[kind])
+        w.copy(staging, columns, rows)
+        rejected = []
+        if kind != 'crew':
+            w.cur.execute(f"""
+                SELECT line, employee_id, 'unknown employee_id ' || employee_id FROM {staging} s
+                WHERE NOT EXISTS (SELECT 1 FROM crew_master cm WHERE cm.employee_id = s.employee_id)
+                ORDER BY line
+            """)
+            rejected = w.cur.fetchall()
+        counts, repair = _MERGES[kind](w)
+    counts['rejected'] = len(rejected)
+    return counts, rejected, repair
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Bulk-import crew, qualifications or leave from CSV/Excel.")
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("file")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes, then roll back")
+    parser.add_argument("--reoptimize", action="store_true",
+                        help="refill duties removed for leave with reoptimize_from")
+    args = parser.parse_args()
+    with open(args.file, 'rb') as f:
+        rows, rejected = parse(args.kind, read_table(f, args.file))
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    counts, unknown, repair = import_rows(conn, args.kind, rows, dry_run=args.dry_run)
+    conn.close()
+    rejected += unknown
+    for line, emp, reason in sorted(rejected)[:20]:
+        print(f"   ✗ line {line} {emp}: {reason}")
+    if len(rejected) > 20:
+        print(f"   … and {len(rejected) - 20} more")
+    counts['rejected'] = len(rejected)
+    print(f"{'🔎 Dry run' if args.dry_run else '✅ Imported'} {args.kind}: "
+          + ", ".join(f"{n} {k.replace('_', ' ')}" for k, n in counts.items()))
+    if repair and args.reoptimize and not args.dry_run:
+        from reopt_helper import reoptimize_from
+        repaired = reoptimize_from(repair[0], lambda: psycopg2.connect(os.getenv("DATABASE_URL")),
+                                   affected_crew=repair[1])
+        print(f"   {repaired} assignment(s) repaired")
+    elif repair and args.dry_run:
+        print(f"   Rostered duties would be removed from {repair[0]}"
+              + (" and repaired with reoptimize_from" if args.reoptimize else ""))
+    elif repair:
+        print(f"   Rostered duties were removed from {repair[0]}"
+              " — run with --reoptimize or rebuild the roster")
@@ -0,0 +1,123 @@
+"""
+Shared database access — one connection pool per process.
+
+Pages and engines call `get_connection()` exactly as before; the connection
+comes from a ThreadedConnectionPool (held in st.cache_resource under
+Streamlit) and `conn.close()` hands it back instead of closing the socket.
+New code should prefer `with connection() as conn:`.
+"""
+import os
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.extensions import connection as _connection
+from psycopg2.pool import ThreadedConnectionPool
+
+try:
+    import streamlit as st
+except ImportError:
+    st = None
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", 2))     # idle connections kept open
+POOL_MAX = int(os.getenv("DB_POOL_MAX", 12))
+PING_AFTER = 30                                 # seconds idle before a checkout is re-validated
+
+
+def database_url():
+    try:
+        return st.secrets["DATABASE_URL"]
+    except Exception:
+        return os.getenv("DATABASE_URL")
+
+
+class PooledConnection(_connection):
+    """psycopg2 connection whose close() returns it to the pool it came from."""
+
+    pool = None          # set while checked out
+    lease = None         # token unique to the current checkout
+    released_at = None
+
+    def close(self):
+        pool = self.pool
+        if pool is None:
+            return super().close()
+        self.pool = self.lease = None
+        self.released_at = time.monotonic()
+        pool.putconn(self, close=bool(self.closed))
+
+
+class ConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that tracks checked-out connections weakly.
+
+    A page that raises before reaching conn.close() drops its last reference
+    to the connection; it is then closed by psycopg2 and its slot freed,
+    instead of leaking until the pool is exhausted.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._used = weakref.WeakValueDictionary(self._used)
+
+
+def _new_pool():
+    return ConnectionPool(POOL_MIN, POOL_MAX, database_url(),
+                          connection_factory=PooledConnection)
+
+
+_pool = None
+
+if st is not None:
+    _cached_pool = st.cache_resource(show_spinner=False)(_new_pool)
+
+
+def get_pool():
+    global _pool
+    if st is not None and st.runtime.exists():
+        return _cached_pool()
+    if _pool is None:
+        _pool = _new_pool()
+    return _pool
+
+
+def _healthy(conn):
+    if conn.closed:
+        return False
+    if conn.released_at is None or time.monotonic() - conn.released_at < PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def get_connection():
+    """Check out a live pooled connection; close() returns it."""
+    pool = get_pool()
+    for _ in range(POOL_MAX + 1):
+        conn = pool.getconn()
+        if _healthy(conn):
+            conn.pool, conn.lease = pool, object()
+            return conn
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("no healthy database connection available")
+
+
+@contextmanager
+def connection():
+    """Pooled connection for the block; rolled back if the block raises."""
+    conn  = get_connection()
+    lease = conn.lease
+    try:
+        yield conn
+    except Exception:
+        if conn.lease is lease and not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if conn.lease is lease:     # not already returned inside the block
+            conn.close()
@@ -0,0 +1,182 @@
+"""
+Streaming exports — CSV or Parquet straight from a server-side cursor.
+
+Rows come off a named psycopg2 cursor BATCH_ROWS at a time and are written
+out batch by batch into a spooled temp file, so a year of roster or duty_log
+never sits in Python as lists, DataFrames or one big string. Pages pass
+`deferred(...)` to st.download_button, which only runs the export when the
+button is clicked. For payroll and CAA submissions, write straight to disk:
+
+    python -m app.utils.export duty_log 2026-01-01 2026-12-31 --format parquet
+"""
+import csv
+import io
+import tempfile
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.utils.db import connection
+
+BATCH_ROWS  = 5000
+SPOOL_BYTES = 32 * 1024 * 1024    # larger exports spill to a temp file on disk
+
+FORMATS = {
+    'csv':     ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Postgres type OID -> (arrow type, value converter); anything else is text.
+_ARROW_TYPES = {
+    16:   (pa.bool_(),         None),
+    20:   (pa.int64(),         None),
+    21:   (pa.int64(),         None),
+    23:   (pa.int64(),         None),
+    700:  (pa.float64(),       float),
+    701:  (pa.float64(),       float),
+    1700: (pa.float64(),       float),     # numeric
+    1082: (pa.date32(),        None),
+    1114: (pa.timestamp('us'), None),
+}
+_TEXT = (pa.string(), str)
+
+# Long-range datasets for the CLI and the pages' range exports. Each takes
+# (from_date, to_date) and returns rows in a stable order.
+DATASETS = {
+    'roster': """
+        SELECT fs.departure_date AS date, fs.flight_number AS flight, fs.origin, fs.destination,
+               fs.departure_time AS departure, fs.arrival_time AS arrival,
+               cm.employee_id, cm.full_name AS crew, cm.role,
+               r.is_manual_override AS override, r.override_reason, r.override_by
+        FROM roster r
+        JOIN flight_schedule fs ON fs.id = r.flight_id
+        JOIN crew_master     cm ON cm.id = r.crew_id
+        WHERE fs.departure_date BETWEEN %s AND %s
+        ORDER BY fs.departure_time, fs.flight_number, cm.role DESC, cm.full_name
+    """,
+    'duty_log': """
+        SELECT dl.duty_start_date AS date, cm.employee_id, cm.full_name AS crew, cm.role,
+               COALESCE(dl.flight_number, fs.flight_number) AS flight,
+               COALESCE(dl.origin, fs.origin) AS origin, COALESCE(dl.destination, fs.destination) AS destination,
+               dl.duty_start, dl.duty_end, dl.total_duty_hours AS hours
+        FROM duty_log dl
+        JOIN crew_master          cm ON cm.id = dl.crew_id
+        LEFT JOIN flight_schedule fs ON fs.id = dl.flight_id
+        WHERE dl.duty_start >= %s AND dl.duty_start < %s::date + 1
+        ORDER BY dl.duty_start, cm.employee_id
+    """,
+    'actuals': """
+        SELECT fs.departure_date AS date, fs.flight_number AS flight, fs.origin, fs.destination,
+               fs.departure_time AS sched_dep, fs.arrival_time AS sched_arr,
+               fa.actual_block_off, fa.actual_block_on,
+               ROUND(EXTRACT(EPOCH FROM (fa.actual_block_on - fa.actual_block_off)) / 3600, 2) AS block_hours,
+               fa.entered_by, fa.notes
+        FROM flight_schedule fs
+        LEFT JOIN flight_actuals fa ON fa.flight_id = fs.id
+        WHERE fs.departure_date BETWEEN %s AND %s
+        ORDER BY fs.departure_time, fs.flight_number
+    """,
+}
+
+
+def stream_batches(sql, params=None, batch_rows=BATCH_ROWS):
+    """Yield (cursor description, rows) batches of ``sql`` from a server-side cursor."""
+    with connection() as conn:
+        with conn.cursor(name=f'export_{uuid.uuid4().hex}') as cur:
+            cur.itersize = batch_rows
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield cur.description, rows
+        conn.rollback()
+
+
+def write_csv(out, sql, params=None, header=None):
+    """Stream ``sql`` into the binary file ``out`` as UTF-8 CSV. Returns rows written."""
+    text   = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text)
+    n = 0
+    for desc, rows in stream_batches(sql, params):
+        if n == 0:
+            writer.writerow(header or [d.name for d in desc])
+        writer.writerows(rows)
+        n += len(rows)
+    if n == 0 and header:
+        writer.writerow(header)
+    text.detach()
+    return n
+
+
+def write_parquet(out, sql, params=None, header=None):
+    """Stream ``sql`` into the binary file ``out`` as Parquet, one row group
+    per batch. Returns rows written."""
+    writer = None
+    n = 0
+    for desc, rows in stream_batches(sql, params):
+        if writer is None:
+            names  = header or [d.name for d in desc]
+            types  = [_ARROW_TYPES.get(d.type_code, _TEXT) for d in desc]
+            schema = pa.schema([(name, t) for name, (t, _) in zip(names, types)])
+            writer = pq.ParquetWriter(out, schema, compression='zstd')
+        columns = []
+        for i, (t, conv) in enumerate(types):
+            values = [r[i] for r in rows]
+            if conv is not None:
+                values = [None if v is None else conv(v) for v in values]
+            columns.append(pa.array(values, type=t))
+        writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        n += len(rows)
+    if writer is None:
+        pq.write_table(pa.table({name: pa.array([], pa.string()) for name in header or []}), out)
+    else:
+        writer.close()
+    return n
+
+
+_WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+
+def export(sql, params=None, fmt='csv', header=None):
+    """Run the export into a rewound spooled temp file."""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r} — expected one of {sorted(_WRITERS)}")
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    _WRITERS[fmt](out, sql, params, header)
+    out.seek(0)
+    return out
+
+
+def deferred(sql, params=None, fmt='csv', header=None):
+    """Zero-argument callable for st.download_button(data=...)."""
+    return lambda: export(sql, params, fmt, header)
+
+
+def download_buttons(container, name, sql, params=None, header=None,
+                     formats=('csv', 'parquet'), label="Download"):
+    """One download button per format in ``container``; each export runs on click."""
+    for col, fmt in zip(container.columns(len(formats)), formats):
+        mime, ext = FORMATS[fmt]
+        col.download_button(f"⬇️ {label} {fmt.upper() if fmt == 'csv' else fmt.title()}",
+                            deferred(sql, params, fmt, header), file_name=f"{name}.{ext}",
+                            mime=mime, key=f"{name}_{fmt}", on_click="ignore")
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import date
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Stream a dataset to CSV or Parquet.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("from_date", type=date.fromisoformat)
+    parser.add_argument("to_date", type=date.fromisoformat)
+    parser.add_argument("--format", choices=sorted(FORMATS), default='csv')
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    path = args.out or f"{args.dataset}_{args.from_date}_{args.to_date}.{FORMATS[args.format][1]}"
+    with open(path, 'wb') as f:
+        rows = _WRITERS[args.format](f, DATASETS[args.dataset], (args.from_date, args.to_date))
+    print(f"✅ {rows} rows -> {path}")
@@ -0,0 +1,479 @@
+"""
+Versioned schema migrations — the single owner of all DDL.
+
+Run: python setup_db.py  (also applied once per app process by streamlit_app.py)
+Each migration runs once, in its own transaction, and is recorded in
+schema_migrations. Add new schema changes at the end of MIGRATIONS; never
+edit one that has shipped.
+"""
+import zlib
+
+MIGRATIONS = [
+    (1, 'base schema', """
+        CREATE TABLE IF NOT EXISTS crew_master (
+            id SERIAL PRIMARY KEY,
+            employee_id VARCHAR(20) UNIQUE NOT NULL,
+            full_name VARCHAR(100) NOT NULL,
+            role VARCHAR(10) NOT NULL CHECK (role IN ('LCC', 'CC')),
+            whatsapp_number VARCHAR(20),
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS flight_schedule (
+            id SERIAL PRIMARY KEY,
+            flight_number VARCHAR(20) NOT NULL,
+            origin VARCHAR(10) NOT NULL,
+            destination VARCHAR(10) NOT NULL,
+            departure_time TIMESTAMP NOT NULL,
+            arrival_time TIMESTAMP NOT NULL,
+            aircraft_type VARCHAR(20),
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS roster (
+            id SERIAL PRIMARY KEY,
+            flight_id INTEGER REFERENCES flight_schedule(id),
+            crew_id INTEGER REFERENCES crew_master(id),
+            duty_date DATE NOT NULL,
+            is_manual_override BOOLEAN DEFAULT FALSE,
+            override_reason TEXT,
+            override_by VARCHAR(100),
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS duty_log (
+            id SERIAL PRIMARY KEY,
+            crew_id INTEGER REFERENCES crew_master(id),
+            duty_start TIMESTAMP NOT NULL,
+            duty_end TIMESTAMP NOT NULL,
+            flight_id INTEGER REFERENCES flight_schedule(id),
+            total_duty_hours NUMERIC(5,2),
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS legality_violations (
+            id SERIAL PRIMARY KEY,
+            crew_id INTEGER REFERENCES crew_master(id),
+            flight_id INTEGER REFERENCES flight_schedule(id),
+            violation_type VARCHAR(100),
+            details TEXT,
+            flagged_at TIMESTAMP DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS audit_trail (
+            id SERIAL PRIMARY KEY,
+            action VARCHAR(100) NOT NULL,
+            performed_by VARCHAR(100),
+            target_table VARCHAR(50),
+            target_id INTEGER,
+            old_value TEXT,
+            new_value TEXT,
+            timestamp TIMESTAMP DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS notification_log (
+            id SERIAL PRIMARY KEY,
+            crew_id INTEGER REFERENCES crew_master(id),
+            message_text TEXT,
+            whatsapp_message_id VARCHAR(100),
+            status VARCHAR(20) DEFAULT 'sent',
+            sent_at TIMESTAMP DEFAULT NOW()
+        );
+    """),
+    # Was migrate_roster.py
+    (2, 'roster.is_manual_override', """
+        ALTER TABLE roster ADD COLUMN IF NOT EXISTS is_manual_override BOOLEAN DEFAULT FALSE;
+    """),
+    # Was an ALTER in seed_february.py; origin/destination are read by the
+    # Individual Crew View for history rows that have no flight_id.
+    (3, 'duty_log flight details', """
+        ALTER TABLE duty_log ADD COLUMN IF NOT EXISTS flight_number VARCHAR(20);
+        ALTER TABLE duty_log ADD COLUMN IF NOT EXISTS origin VARCHAR(10);
+        ALTER TABLE duty_log ADD COLUMN IF NOT EXISTS destination VARCHAR(10);
+    """),
+    # Were created on every render of pages 5 and 8 (crew_qualifications by hand)
+    (4, 'qualifications, leave and actuals', """
+        CREATE TABLE IF NOT EXISTS crew_qualifications (
+            id SERIAL PRIMARY KEY,
+            crew_id INTEGER NOT NULL REFERENCES crew_master(id),
+            qualification_type VARCHAR(20) NOT NULL,
+            expiry_date DATE NOT NULL,
+            last_renewed DATE,
+            notes TEXT,
+            UNIQUE(crew_id, qualification_type)
+        );
+        CREATE TABLE IF NOT EXISTS crew_leave (
+            id SERIAL PRIMARY KEY,
+            crew_id INTEGER NOT NULL,
+            leave_date DATE NOT NULL,
+            leave_type VARCHAR(50) NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE(crew_id, leave_date)
+        );
+        CREATE TABLE IF NOT EXISTS flight_actuals (
+            id               SERIAL PRIMARY KEY,
+            flight_id        INTEGER NOT NULL,
+            actual_block_off TIMESTAMP NOT NULL,
+            actual_block_on  TIMESTAMP NOT NULL,
+            entered_by       VARCHAR(100) DEFAULT 'OCC',
+            entered_at       TIMESTAMP DEFAULT NOW(),
+            notes            TEXT,
+            UNIQUE(flight_id)
+        );
+    """),
+    # Hot-path indexes, and a real key behind roster's ON CONFLICT DO NOTHING.
+    # Duplicates are collapsed first, keeping the override row, then the oldest.
+    # The unique index leads with flight_id, so it also serves roster(flight_id).
+    (5, 'hot-path indexes and roster uniqueness', """
+        DELETE FROM roster r USING roster d
+         WHERE d.flight_id = r.flight_id AND d.crew_id = r.crew_id AND d.id <> r.id
+           AND (COALESCE(d.is_manual_override, FALSE), -d.id)
+             > (COALESCE(r.is_manual_override, FALSE), -r.id);
+        CREATE UNIQUE INDEX IF NOT EXISTS roster_flight_crew_key ON roster (flight_id, crew_id);
+        CREATE INDEX IF NOT EXISTS roster_crew_date_idx ON roster (crew_id, duty_date);
+        CREATE INDEX IF NOT EXISTS flight_schedule_departure_idx ON flight_schedule (departure_time);
+        CREATE INDEX IF NOT EXISTS duty_log_crew_start_idx ON duty_log (crew_id, duty_start);
+        CREATE INDEX IF NOT EXISTS legality_violations_flagged_type_idx ON legality_violations (flagged_at, violation_type);
+        CREATE INDEX IF NOT EXISTS crew_leave_date_idx ON crew_leave (leave_date);
+    """),
+    # Stored calendar dates, so day filters are plain index range scans instead
+    # of a ::date cast over every row.
+    (6, 'departure_date and duty_start_date', """
+        ALTER TABLE flight_schedule ADD COLUMN IF NOT EXISTS departure_date DATE
+            GENERATED ALWAYS AS (departure_time::date) STORED;
+        ALTER TABLE duty_log ADD COLUMN IF NOT EXISTS duty_start_date DATE
+            GENERATED ALWAYS AS (duty_start::date) STORED;
+        CREATE INDEX IF NOT EXISTS flight_schedule_departure_date_idx ON flight_schedule (departure_date, flight_number);
+        CREATE INDEX IF NOT EXISTS duty_log_crew_start_date_idx ON duty_log (crew_id, duty_start_date);
+    """),
+    # Per-scope data versions for the page query cache (app/utils/query_cache.py).
+    # Statement triggers bump them inside the writing transaction, so every
+    # write path — engines, pages, scripts — invalidates the cache on commit.
+    (7, 'data versions', """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope   VARCHAR(20) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO data_versions (scope)
+        VALUES ('roster'), ('schedule'), ('crew'), ('actuals')
+        ON CONFLICT DO NOTHING;
+
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE scope = TG_ARGV[0];
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER roster_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON roster FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('roster');
+        CREATE TRIGGER duty_log_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON duty_log FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('roster');
+        CREATE TRIGGER legality_violations_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON legality_violations FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('roster');
+        CREATE TRIGGER flight_schedule_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON flight_schedule FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('schedule');
+        CREATE TRIGGER crew_master_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON crew_master FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('crew');
+        CREATE TRIGGER crew_leave_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON crew_leave FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('crew');
+        CREATE TRIGGER crew_qualifications_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON crew_qualifications FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('crew');
+        CREATE TRIGGER flight_actuals_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON flight_actuals FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('actuals');
+    """),
+    # Per crew, per duty day rollup of duty_log, so FDTL windows read at most a
+    # few dozen small rows per crew member. Statement triggers re-aggregate only
+    # the (crew, day) keys a write touched, whatever the writer — engine COPYs,
+    # Daily Operations changes, and actuals saves/clears on the OCC page.
+    (8, 'crew_daily_hours rollup', """
+        CREATE TABLE IF NOT EXISTS crew_daily_hours (
+            crew_id      INTEGER NOT NULL,
+            day          DATE NOT NULL,
+            block_hours  NUMERIC(6,2) NOT NULL,
+            sectors      INTEGER NOT NULL,
+            first_report TIMESTAMP NOT NULL,
+            last_release TIMESTAMP NOT NULL,
+            PRIMARY KEY (crew_id, day)
+        );
+
+        CREATE OR REPLACE FUNCTION rollup_crew_daily_hours(crew_ids INTEGER[], days DATE[]) RETURNS void AS $$
+            WITH k AS (
+                SELECT DISTINCT crew_id, day FROM unnest(crew_ids, days) AS k (crew_id, day)
+                WHERE crew_id IS NOT NULL
+            ), agg AS (
+                SELECT d.crew_id, d.duty_start_date AS day, SUM(d.total_duty_hours) AS block_hours,
+                       COUNT(*) AS sectors, MIN(d.duty_start) AS first_report, MAX(d.duty_end) AS last_release
+                FROM duty_log d
+                JOIN k ON k.crew_id = d.crew_id AND k.day = d.duty_start_date
+                GROUP BY d.crew_id, d.duty_start_date
+            ), gone AS (
+                DELETE FROM crew_daily_hours c USING k
+                WHERE c.crew_id = k.crew_id AND c.day = k.day
+                  AND NOT EXISTS (SELECT 1 FROM agg WHERE agg.crew_id = k.crew_id AND agg.day = k.day)
+            )
+            INSERT INTO crew_daily_hours (crew_id, day, block_hours, sectors, first_report, last_release)
+            SELECT crew_id, day, COALESCE(block_hours, 0), sectors, first_report, last_release FROM agg
+            ON CONFLICT (crew_id, day) DO UPDATE
+               SET block_hours  = EXCLUDED.block_hours,
+                   sectors      = EXCLUDED.sectors,
+                   first_report = EXCLUDED.first_report,
+                   last_release = EXCLUDED.last_release;
+        $$ LANGUAGE sql;
+
+        CREATE OR REPLACE FUNCTION duty_log_rollup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                TRUNCATE crew_daily_hours;
+            ELSIF TG_OP = 'INSERT' THEN
+                PERFORM rollup_crew_daily_hours(array_agg(crew_id), array_agg(duty_start_date)) FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM rollup_crew_daily_hours(array_agg(crew_id), array_agg(duty_start_date)) FROM old_rows;
+            ELSE
+                PERFORM rollup_crew_daily_hours(array_agg(crew_id), array_agg(duty_start_date))
+                FROM (SELECT crew_id, duty_start_date FROM old_rows
+                      UNION SELECT crew_id, duty_start_date FROM new_rows) u;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER duty_log_rollup_insert AFTER INSERT ON duty_log
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+        CREATE TRIGGER duty_log_rollup_update AFTER UPDATE ON duty_log
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+        CREATE TRIGGER duty_log_rollup_delete AFTER DELETE ON duty_log
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+        CREATE TRIGGER duty_log_rollup_truncate AFTER TRUNCATE ON duty_log
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+
+        INSERT INTO crew_daily_hours (crew_id, day, block_hours, sectors, first_report, last_release)
+        SELECT crew_id, duty_start_date, COALESCE(SUM(total_duty_hours), 0), COUNT(*), MIN(duty_start), MAX(duty_end)
+        FROM duty_log
+        WHERE crew_id IS NOT NULL
+        GROUP BY crew_id, duty_start_date
+        ON CONFLICT DO NOTHING;
+    """),
+    # Monthly range partitions for the append-mostly logs, so date filters
+    # prune to a partition or two and retention is a DETACH instead of a bulk
+    # DELETE (app/utils/partitions.py). Each table keeps a DEFAULT partition
+    # as a catch-all; create_month_partition() moves any rows it caught into
+    # the new month. The primary keys gain the partition column, as Postgres
+    # requires. crew_daily_hours is not touched by detaching old duty_log
+    # months, so lifetime hours survive archival.
+    (9, 'monthly partitions for duty_log, legality_violations and audit_trail', """
+        CREATE OR REPLACE FUNCTION create_month_partition(parent REGCLASS, month DATE) RETURNS BOOLEAN AS $$
+        DECLARE
+            lo    DATE := date_trunc('month', month)::date;
+            hi    DATE := (date_trunc('month', month) + INTERVAL '1 month')::date;
+            part  TEXT := format('%s_p%s', parent, to_char(lo, 'YYYYMM'));
+            deflt TEXT := format('%s_default', parent);
+            key   TEXT;
+            cols  TEXT;
+            moved BIGINT := 0;
+        BEGIN
+            IF to_regclass(part) IS NOT NULL THEN
+                RETURN FALSE;
+            END IF;
+            SELECT a.attname INTO key
+              FROM pg_partitioned_table p
+              JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+             WHERE p.partrelid = parent;
+
+            IF to_regclass(deflt) IS NOT NULL THEN
+                EXECUTE format('CREATE TEMP TABLE partition_moving ON COMMIT DROP AS
+                                SELECT * FROM %I WHERE %I >= %L AND %I < %L', deflt, key, lo, key, hi);
+                GET DIAGNOSTICS moved = ROW_COUNT;
+                IF moved > 0 THEN
+                    EXECUTE format('DELETE FROM %I WHERE %I >= %L AND %I < %L', deflt, key, lo, key, hi);
+                END IF;
+            END IF;
+
+            EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)', part, parent, lo, hi);
+
+            IF moved > 0 THEN
+                SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO cols
+                  FROM pg_attribute
+                 WHERE attrelid = parent AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+                EXECUTE format('INSERT INTO %s (%s) SELECT %s FROM partition_moving', parent, cols, cols);
+            END IF;
+            DROP TABLE IF EXISTS partition_moving;
+            RETURN TRUE;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION ensure_month_partitions(parent REGCLASS, from_day DATE, to_day DATE) RETURNS INTEGER AS $$
+            SELECT COUNT(*) FILTER (WHERE create_month_partition(parent, m::date))::int
+            FROM generate_series(date_trunc('month', from_day), date_trunc('month', to_day), INTERVAL '1 month') AS m;
+        $$ LANGUAGE sql;
+
+        -- duty_log
+        ALTER TABLE duty_log RENAME TO duty_log_unpartitioned;
+        ALTER SEQUENCE duty_log_id_seq OWNED BY NONE;
+        CREATE TABLE duty_log (
+            id INTEGER NOT NULL DEFAULT nextval('duty_log_id_seq'),
+            crew_id INTEGER,
+            duty_start TIMESTAMP NOT NULL,
+            duty_end TIMESTAMP NOT NULL,
+            flight_id INTEGER,
+            total_duty_hours NUMERIC(5,2),
+            created_at TIMESTAMP DEFAULT NOW(),
+            flight_number VARCHAR(20),
+            origin VARCHAR(10),
+            destination VARCHAR(10),
+            duty_start_date DATE GENERATED ALWAYS AS (duty_start::date) STORED
+        ) PARTITION BY RANGE (duty_start);
+        ALTER SEQUENCE duty_log_id_seq OWNED BY duty_log.id;
+        CREATE TABLE duty_log_default PARTITION OF duty_log DEFAULT;
+        SELECT ensure_month_partitions('duty_log',
+            LEAST(CURRENT_DATE, (SELECT MIN(duty_start)::date FROM duty_log_unpartitioned)),
+            GREATEST(CURRENT_DATE + 92, (SELECT MAX(duty_start)::date FROM duty_log_unpartitioned)));
+        INSERT INTO duty_log (id, crew_id, duty_start, duty_end, flight_id, total_duty_hours,
+                              created_at, flight_number, origin, destination)
+        SELECT id, crew_id, duty_start, duty_end, flight_id, total_duty_hours,
+               created_at, flight_number, origin, destination
+        FROM duty_log_unpartitioned;
+        DROP TABLE duty_log_unpartitioned;
+        ALTER TABLE duty_log ADD PRIMARY KEY (id, duty_start);
+        ALTER TABLE duty_log ADD FOREIGN KEY (crew_id) REFERENCES crew_master(id),
+                        ADD FOREIGN KEY (flight_id) REFERENCES flight_schedule(id);
+        CREATE INDEX duty_log_crew_start_idx ON duty_log (crew_id, duty_start);
+        CREATE INDEX duty_log_crew_start_date_idx ON duty_log (crew_id, duty_start_date);
+        CREATE TRIGGER duty_log_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON duty_log FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('roster');
+        CREATE TRIGGER duty_log_rollup_insert AFTER INSERT ON duty_log
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+        CREATE TRIGGER duty_log_rollup_update AFTER UPDATE ON duty_log
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+        CREATE TRIGGER duty_log_rollup_delete AFTER DELETE ON duty_log
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+        CREATE TRIGGER duty_log_rollup_truncate AFTER TRUNCATE ON duty_log
+            FOR EACH STATEMENT EXECUTE FUNCTION duty_log_rollup();
+
+        -- legality_violations
+        ALTER TABLE legality_violations RENAME TO legality_violations_unpartitioned;
+        ALTER SEQUENCE legality_violations_id_seq OWNED BY NONE;
+        CREATE TABLE legality_violations (
+            id INTEGER NOT NULL DEFAULT nextval('legality_violations_id_seq'),
+            crew_id INTEGER,
+            flight_id INTEGER,
+            violation_type VARCHAR(100),
+            details TEXT,
+            flagged_at TIMESTAMP NOT NULL DEFAULT NOW()
+        ) PARTITION BY RANGE (flagged_at);
+        ALTER SEQUENCE legality_violations_id_seq OWNED BY legality_violations.id;
+        CREATE TABLE legality_violations_default PARTITION OF legality_violations DEFAULT;
+        SELECT ensure_month_partitions('legality_violations',
+            LEAST(CURRENT_DATE, (SELECT MIN(flagged_at)::date FROM legality_violations_unpartitioned)),
+            GREATEST(CURRENT_DATE + 92, (SELECT MAX(flagged_at)::date FROM legality_violations_unpartitioned)));
+        INSERT INTO legality_violations (id, crew_id, flight_id, violation_type, details, flagged_at)
+        SELECT id, crew_id, flight_id, violation_type, details, COALESCE(flagged_at, NOW())
+        FROM legality_violations_unpartitioned;
+        DROP TABLE legality_violations_unpartitioned;
+        ALTER TABLE legality_violations ADD PRIMARY KEY (id, flagged_at);
+        ALTER TABLE legality_violations ADD FOREIGN KEY (crew_id) REFERENCES crew_master(id),
+                        ADD FOREIGN KEY (flight_id) REFERENCES flight_schedule(id);
+        CREATE INDEX legality_violations_flagged_type_idx ON legality_violations (flagged_at, violation_type);
+        CREATE TRIGGER legality_violations_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+            ON legality_violations FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('roster');
+
+        -- audit_trail
+        ALTER TABLE audit_trail RENAME TO audit_trail_unpartitioned;
+        ALTER SEQUENCE audit_trail_id_seq OWNED BY NONE;
+        CREATE TABLE audit_trail (
+            id INTEGER NOT NULL DEFAULT nextval('audit_trail_id_seq'),
+            action VARCHAR(100) NOT NULL,
+            performed_by VARCHAR(100),
+            target_table VARCHAR(50),
+            target_id INTEGER,
+            old_value TEXT,
+            new_value TEXT,
+            timestamp TIMESTAMP NOT NULL DEFAULT NOW()
+        ) PARTITION BY RANGE (timestamp);
+        ALTER SEQUENCE audit_trail_id_seq OWNED BY audit_trail.id;
+        CREATE TABLE audit_trail_default PARTITION OF audit_trail DEFAULT;
+        SELECT ensure_month_partitions('audit_trail',
+            LEAST(CURRENT_DATE, (SELECT MIN(timestamp)::date FROM audit_trail_unpartitioned)),
+            GREATEST(CURRENT_DATE + 92, (SELECT MAX(timestamp)::date FROM audit_trail_unpartitioned)));
+        INSERT INTO audit_trail (id, action, performed_by, target_table, target_id, old_value, new_value, timestamp)
+        SELECT id, action, performed_by, target_table, target_id, old_value, new_value, COALESCE(timestamp, NOW())
+        FROM audit_trail_unpartitioned;
+        DROP TABLE audit_trail_unpartitioned;
+        ALTER TABLE audit_trail ADD PRIMARY KEY (id, timestamp);
+        CREATE INDEX audit_trail_timestamp_idx ON audit_trail (timestamp);
+    """),
+    # Legality & Audit Log: keyset order (newest first, id as tie-break) for
+    # each section, its filters, and full-text indexes over violation details
+    # and override reasons. The expressions must match the page's queries
+    # exactly ('simple' config: no stemming, so flight numbers match as typed).
+    (10, 'audit log keyset and search indexes', """
+        CREATE INDEX IF NOT EXISTS roster_override_created_idx ON roster (created_at, id) WHERE is_manual_override;
+        CREATE INDEX IF NOT EXISTS roster_override_reason_fts_idx ON roster
+            USING gin (to_tsvector('simple', COALESCE(override_reason, ''))) WHERE is_manual_override;
+        CREATE INDEX IF NOT EXISTS legality_violations_flagged_id_idx ON legality_violations (flagged_at, id);
+        CREATE INDEX IF NOT EXISTS legality_violations_crew_flagged_idx ON legality_violations (crew_id, flagged_at);
+        CREATE INDEX IF NOT EXISTS legality_violations_details_fts_idx ON legality_violations
+            USING gin (to_tsvector('simple', COALESCE(details, '')));
+        DROP INDEX IF EXISTS audit_trail_timestamp_idx;
+        CREATE INDEX IF NOT EXISTS audit_trail_timestamp_id_idx ON audit_trail (timestamp, id);
+        CREATE INDEX IF NOT EXISTS audit_trail_performed_by_idx ON audit_trail (performed_by, timestamp);
+    """),
+    # Schedule imports delete and retime flights in bulk: the foreign-key
+    # checks and duty_log joins on flight_id otherwise scan every partition
+    # once per flight.
+    (11, 'flight_id indexes for schedule imports', """
+        CREATE INDEX IF NOT EXISTS duty_log_flight_idx ON duty_log (flight_id);
+        CREATE INDEX IF NOT EXISTS legality_violations_flight_idx ON legality_violations (flight_id);
+    """),
+]
+
+# Serializes concurrent runners (several app processes starting at once).
+MIGRATION_LOCK = zlib.crc32(b'schema-migrations')
+
+
+def migrate(conn, verbose=True):
+    """Apply every pending migration. Returns the versions applied."""
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK,))
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version    INTEGER PRIMARY KEY,
+                name       TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {r[0] for r in cur.fetchall()}
+        conn.commit()
+        applied = []
+        for version, name, sql in MIGRATIONS:
+            if version in done:
+                continue
+            cur.execute(sql)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            applied.append(version)
+            if verbose:
+                print(f"   Applied migration {version:04d} — {name}")
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK,))
+        conn.commit()
+        cur.close()
+
+
+if __name__ == "__main__":
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    applied = migrate(conn)
+    conn.close()
+    print(f"✅ Schema up to date ({len(applied)} migration(s) applied)")
@@ -0,0 +1,130 @@
+"""
+Monthly partition upkeep for duty_log, legality_violations and audit_trail.
+
+`ensure_partitions(conn)` creates the coming months' partitions (run on app
+start, by the seed scripts before loading history, and by the archive job).
+`archive_partitions(conn, archive_dir)` detaches every month older than the
+retention window, writes it to <archive_dir>/<table>/<partition>.csv.gz and
+drops it — no bulk DELETE, and the live tables never lock for long.
+
+Run monthly (e.g. from cron):  python -m app.utils.partitions [--dry-run]
+"""
+import gzip
+import os
+import re
+from datetime import date
+
+# Partitioned table -> partition key (kept in step with migration 0009)
+PARTITIONED = {
+    'duty_log':            'duty_start',
+    'legality_violations': 'flagged_at',
+    'audit_trail':         'timestamp',
+}
+
+MONTHS_AHEAD = 3
+# Months kept online, counting the current one. FDTL records must stay
+# available for inspection for 24 months; the audit trail is kept longer.
+RETENTION_MONTHS = {
+    'duty_log':            int(os.getenv("RETAIN_DUTY_LOG_MONTHS", 24)),
+    'legality_violations': int(os.getenv("RETAIN_VIOLATIONS_MONTHS", 24)),
+    'audit_trail':         int(os.getenv("RETAIN_AUDIT_MONTHS", 60)),
+}
+ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "archive")
+
+_MONTH_PART = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def _add_months(d, n):
+    m = d.year * 12 + d.month - 1 + n
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def ensure_partitions(conn, since=None, months_ahead=MONTHS_AHEAD):
+    """Create missing month partitions from ``since`` (default: this month)
+    through ``months_ahead`` months out, plus a partition for every month
+    with rows in the DEFAULT partition (they are moved into it). Returns the
+    number created."""
+    today = date.today()
+    since = since or today
+    until = _add_months(today, months_ahead)
+    created = 0
+    with conn.cursor() as cur:
+        for table, key in PARTITIONED.items():
+            cur.execute("SELECT ensure_month_partitions(%s, %s, %s)", (table, since, until))
+            created += cur.fetchone()[0]
+            cur.execute(f"SELECT MIN({key})::date, MAX({key})::date FROM {table}_default")
+            lo, hi = cur.fetchone()
+            if lo is not None:
+                cur.execute("SELECT ensure_month_partitions(%s, %s, %s)", (table, lo, hi))
+                created += cur.fetchone()[0]
+    conn.commit()
+    return created
+
+
+def month_partitions(conn, table):
+    """[(partition, first day of its month)] attached to ``table``, oldest first."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+        """, (table,))
+        parts = []
+        for (name,) in cur.fetchall():
+            m = _MONTH_PART.search(name)
+            if m:
+                parts.append((name, date(int(m[1]), int(m[2]), 1)))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def archive_partitions(conn, archive_dir=ARCHIVE_DIR, retention=None, dry_run=False, verbose=True):
+    """Detach, export and drop partitions older than the retention window.
+
+    Returns [(table, partition, rows)]. Each partition is detached in its own
+    transaction, then streamed to a gzip CSV (with header) and dropped only
+    once the file is complete — a failed export leaves the detached table in
+    place to retry by hand.
+    """
+    retention = {**RETENTION_MONTHS, **(retention or {})}
+    this_month = date.today().replace(day=1)
+    archived = []
+    for table in PARTITIONED:
+        cutoff = _add_months(this_month, 1 - retention[table])
+        for part, month in month_partitions(conn, table):
+            if month >= cutoff:
+                break
+            if dry_run:
+                archived.append((table, part, None))
+                if verbose:
+                    print(f"   Would archive {part} (before {cutoff})")
+                continue
+            with conn.cursor() as cur:
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {part}")
+                conn.commit()
+                path = os.path.join(archive_dir, table, f"{part}.csv.gz")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+                    cur.copy_expert(f"COPY {part} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+                rows = cur.rowcount
+                cur.execute(f"DROP TABLE {part}")
+                conn.commit()
+            archived.append((table, part, rows))
+            if verbose:
+                print(f"   Archived {part}: {rows} rows -> {path}")
+    return archived
+
+
+if __name__ == "__main__":
+    import argparse
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Create upcoming partitions and archive expired ones.")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    created  = ensure_partitions(conn)
+    archived = archive_partitions(conn, args.archive_dir, dry_run=args.dry_run)
+    conn.close()
+    print(f"✅ {created} partition(s) created, {len(archived)} archived")
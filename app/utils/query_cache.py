@@ -0,0 +1,42 @@
+"""
+Cached reads for the Streamlit pages.
+
+`cached_query(sql, params, scopes)` runs a SELECT once and serves the rows
+from memory on later reruns. The cache key includes the current version of
+every data scope the query reads; migration 0007's triggers bump a scope on
+any write to its tables, so only queries over changed data are re-run.
+"""
+import streamlit as st
+
+from app.utils.db import connection
+
+# Scope -> tables whose writes bump it (kept in step with migration 0007)
+SCOPES = {
+    'roster':   ('roster', 'duty_log', 'legality_violations'),
+    'schedule': ('flight_schedule',),
+    'crew':     ('crew_master', 'crew_leave', 'crew_qualifications'),
+    'actuals':  ('flight_actuals',),
+}
+
+
+def data_versions(scopes):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT scope, version FROM data_versions WHERE scope = ANY(%s) ORDER BY scope",
+                    (list(scopes),))
+        return tuple(cur.fetchall())
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _run(sql, params, versions):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def cached_query(sql, params=None, scopes=tuple(SCOPES)):
+    """Rows of ``sql``, re-queried only after a write to one of ``scopes``."""
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f"Unknown data scope(s) {sorted(unknown)} — expected one of {sorted(SCOPES)}")
+    params = tuple(params) if params is not None else None
+    return _run(sql, params, data_versions(scopes))
@@ -0,0 +1,298 @@
+"""
+Seasonal schedule import — IATA SSIM (chapter 7) or CSV into flight_schedule.
+
+Leg records are parsed here and COPYed into a temp staging table; periods of
+operation and days of week are expanded server-side, and the dated flights
+are merged into flight_schedule set-based, keyed on (flight_number, origin,
+departure_date):
+
+  * flights not yet scheduled are inserted;
+  * flights whose destination, times or aircraft changed are updated, and
+    their duty_log rows retimed — rostered retimes are flagged FLIGHT_RETIMED;
+  * flights inside the file's season that the file no longer has are
+    cancelled as on the Daily Operations board: the flight stays, its roster
+    and duty_log rows are removed and it is flagged FLIGHT_CANCELLED (skip
+    with --keep-missing, e.g. for a partial file).
+
+Only flights departing on or after ``since`` (default today) are touched, so
+flown history is never rewritten. Everything runs in one transaction.
+
+    python -m app.utils.schedule_import S26.ssim [--since 2026-03-29] [--dry-run]
+    python -m app.utils.schedule_import extra.csv --keep-missing
+
+CSV files need a header row; to_date (default from_date), days (default
+daily, e.g. 1234567 or 1.3.5..) and aircraft_type are optional:
+
+    flight_number,origin,destination,from_date,to_date,days,departure,arrival,aircraft_type
+    XYZ301,KHI,ISB,2026-03-29,2026-10-24,1234567,08:00,11:00,A320
+"""
+import csv
+from datetime import date, datetime
+
+from app.utils.bulk_writer import BulkWriter
+
+# SSIM carries IATA aircraft codes; flight_schedule uses the names crewing knows.
+AIRCRAFT_TYPES = {
+    '319': 'A319', '320': 'A320', '321': 'A321',
+    '32N': 'A320neo', '32Q': 'A321neo', 'AT7': 'ATR72', '738': 'B737-800',
+}
+
+# Staged leg record. dep/arr are minutes from 00:00 local on the flight date,
+# so day variations and UTC offsets are already folded in.
+LEG_COLUMNS = ('line', 'flight_number', 'origin', 'destination', 'period_from', 'period_to',
+               'days', 'frequency', 'dep', 'arr', 'aircraft_type')
+
+CSV_REQUIRED = {'flight_number', 'origin', 'destination', 'from_date', 'departure', 'arrival'}
+
+
+def _ssim_date(s):
+    return datetime.strptime(s, '%d%b%y').date()
+
+
+def _minutes(hhmm):
+    hhmm = hhmm.strip().replace(':', '')
+    if len(hhmm) != 4 or not hhmm.isdigit() or int(hhmm[:2]) > 24 or int(hhmm[2:]) > 59:
+        raise ValueError(f"bad time {hhmm!r}")
+    return int(hhmm[:2]) * 60 + int(hhmm[2:])
+
+
+def _utc_offset(s):
+    """'+0500' -> 300 minutes; blank -> 0."""
+    s = s.strip()
+    if not s:
+        return 0
+    sign = -1 if s[0] == '-' else 1
+    return sign * _minutes(s[1:])
+
+
+def _day_variation(c):
+    return -1 if c == 'A' else int(c) if c.strip() else 0
+
+
+def _days(s):
+    days = ''.join(sorted({c for c in s if c in '1234567'}))
+    if not days:
+        raise ValueError(f"no days of operation in {s!r}")
+    return days
+
+
+def _leg(line, flight_number, origin, destination, period_from, period_to,
+         days, frequency, dep, arr, aircraft_type):
+    if not (flight_number and origin and destination):
+        raise ValueError("flight number, origin and destination are required")
+    if period_to < period_from:
+        raise ValueError(f"period ends {period_to} before it starts {period_from}")
+    if arr <= dep:
+        raise ValueError("arrival is not after departure")
+    return (line, flight_number, origin, destination, period_from, period_to,
+            days, frequency, dep, arr, aircraft_type or None)
+
+
+def read_ssim(lines):
+    """Yield staged legs from SSIM type 3 (flight leg) records.
+
+    Type 2 sets the time mode: UTC times are shifted to local with each
+    station's UTC variation. An open-ended period (00XXX00) runs to the end
+    of the season in the type 2 record.
+    """
+    utc, season_end = False, None
+    for n, rec in enumerate(lines, 1):
+        rec = rec.rstrip('\r\n').ljust(200)
+        try:
+            if rec[0] == '2':
+                utc = rec[1] == 'U'
+                season_end = _ssim_date(rec[21:28]) if rec[21:28].strip() else None
+            elif rec[0] == '3':
+                period_to = rec[21:28]
+                if period_to.startswith('00'):
+                    if season_end is None:
+                        raise ValueError("open-ended period but no season end in the type 2 record")
+                    period_to = season_end
+                else:
+                    period_to = _ssim_date(period_to)
+                dep = _day_variation(rec[192]) * 1440 + _minutes(rec[43:47])
+                arr = _day_variation(rec[193]) * 1440 + _minutes(rec[57:61])
+                if utc:
+                    dep += _utc_offset(rec[47:52])
+                    arr += _utc_offset(rec[65:70])
+                aircraft = rec[72:75].strip()
+                yield _leg(n, f"{rec[2:5].strip()}{int(rec[5:9])}{rec[1].strip()}",
+                           rec[36:39].strip(), rec[54:57].strip(),
+                           _ssim_date(rec[14:21]), period_to, _days(rec[28:35]),
+                           int(rec[35]) if rec[35].isdigit() else 1,
+                           dep, arr, AIRCRAFT_TYPES.get(aircraft, aircraft))
+        except ValueError as e:
+            raise ValueError(f"line {n}: {e}") from None
+
+
+def read_csv(lines):
+    """Yield staged legs from the CSV variant (local times; an arrival at or
+    before departure lands the next day)."""
+    reader = csv.DictReader(lines)
+    missing = CSV_REQUIRED - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(sorted(missing))}")
+    for row in reader:
+        n = reader.line_num
+        try:
+            period_from = date.fromisoformat(row['from_date'].strip())
+            period_to   = date.fromisoformat(row['to_date'].strip()) if (row.get('to_date') or '').strip() else period_from
+            dep, arr = _minutes(row['departure']), _minutes(row['arrival'])
+            if arr <= dep:
+                arr += 1440
+            yield _leg(n, row['flight_number'].strip().upper(),
+                       row['origin'].strip().upper(), row['destination'].strip().upper(),
+                       period_from, period_to, _days(row.get('days') or '1234567'), 1,
+                       dep, arr, (row.get('aircraft_type') or '').strip())
+        except ValueError as e:
+            raise ValueError(f"line {n}: {e}") from None
+
+
+READERS = {'ssim': read_ssim, 'csv': read_csv}
+
+
+def import_schedule(conn, legs, since=None, cancel_missing=True, dry_run=False, verbose=True):
+    """Merge staged ``legs`` into flight_schedule. Returns counts of
+    inserted / updated / unchanged / cancelled flights."""
+    legs = list(legs)
+    if not legs:
+        raise ValueError("No flight leg records found")
+    since  = since or date.today()
+    season = (max(since, min(l[4] for l in legs)), max(l[5] for l in legs))
+
+    with BulkWriter(conn, verbose=verbose, dry_run=dry_run) as w:
+        w.execute("""
+            CREATE TEMP TABLE schedule_import_legs (
+                line INT, flight_number VARCHAR(20), origin VARCHAR(10), destination VARCHAR(10),
+                period_from DATE, period_to DATE, days VARCHAR(7), frequency SMALLINT,
+                dep INT, arr INT, aircraft_type VARCHAR(20)
+            ) ON COMMIT DROP
+        """)
+        w.copy('schedule_import_legs', LEG_COLUMNS, legs)
+
+        # One row per dated flight; frequency 2 = every other week from period start
+        w.execute("""
+            CREATE TEMP TABLE schedule_import ON COMMIT DROP AS
+            SELECT line, flight_number, origin, destination, aircraft_type, departure_time, arrival_time,
+                   departure_time::date AS departure_date
+            FROM (
+                SELECT l.*, d::date + l.dep * INTERVAL '1 minute' AS departure_time,
+                            d::date + l.arr * INTERVAL '1 minute' AS arrival_time
+                FROM schedule_import_legs l
+                CROSS JOIN LATERAL generate_series(l.period_from, l.period_to, INTERVAL '1 day') d
+                WHERE strpos(l.days, EXTRACT(ISODOW FROM d)::text) > 0
+                  AND (d::date - l.period_from) / 7 %% l.frequency = 0
+            ) expanded
+            WHERE departure_time >= %s
+        """, (since,), table='schedule_import (expanded)')
+        w.execute("ANALYZE schedule_import")
+
+        w.cur.execute("""
+            SELECT flight_number, origin, departure_date, string_agg(line::text, ', ' ORDER BY line)
+            FROM schedule_import
+            GROUP BY flight_number, origin, departure_date
+            HAVING COUNT(*) > 1
+            ORDER BY departure_date LIMIT 5
+        """)
+        overlaps = w.cur.fetchall()
+        if overlaps:
+            raise ValueError("Overlapping periods for the same flight: " + "; ".join(
+                f"{fn} {orig} {d} (lines {lines})" for fn, orig, d, lines in overlaps))
+
+        match = """fs.flight_number = si.flight_number AND fs.origin = si.origin
+                   AND fs.departure_date = si.departure_date"""
+
+        w.execute(f"""
+            CREATE TEMP TABLE schedule_import_changed ON COMMIT DROP AS
+            SELECT fs.id, si.flight_number, si.departure_date, si.destination, si.aircraft_type,
+                   si.departure_time, si.arrival_time,
+                   (fs.departure_time, fs.arrival_time) IS DISTINCT FROM (si.departure_time, si.arrival_time) AS retimed
+            FROM schedule_import si
+            JOIN flight_schedule fs ON {match}
+            WHERE (fs.destination, fs.departure_time, fs.arrival_time, fs.aircraft_type)
+                  IS DISTINCT FROM (si.destination, si.departure_time, si.arrival_time, si.aircraft_type)
+        """)
+        updated = w.execute("""
+            UPDATE flight_schedule fs
+            SET destination = c.destination, departure_time = c.departure_time,
+                arrival_time = c.arrival_time, aircraft_type = c.aircraft_type
+            FROM schedule_import_changed c
+            WHERE fs.id = c.id
+        """, table='flight_schedule (update)')
+        w.execute("""
+            UPDATE duty_log dl
+            SET duty_start = c.departure_time, duty_end = c.arrival_time,
+                total_duty_hours = EXTRACT(EPOCH FROM (c.arrival_time - c.departure_time)) / 3600
+            FROM schedule_import_changed c
+            WHERE dl.flight_id = c.id AND c.retimed
+        """, table='duty_log (retime)')
+        w.execute("""
+            INSERT INTO legality_violations (flight_id, crew_id, violation_type, details)
+            SELECT c.id, NULL, 'FLIGHT_RETIMED',
+                   'Schedule import retimed ' || c.flight_number || ' on ' || c.departure_date
+                   || ': dep ' || to_char(c.departure_time, 'HH24:MI') || ' arr ' || to_char(c.arrival_time, 'HH24:MI')
+            FROM schedule_import_changed c
+            WHERE c.retimed AND EXISTS (SELECT 1 FROM roster r WHERE r.flight_id = c.id)
+        """, table='legality_violations (retimed)')
+
+        cancelled = 0
+        if cancel_missing:
+            w.execute(f"""
+                CREATE TEMP TABLE schedule_import_cancelled ON COMMIT DROP AS
+                SELECT fs.id, fs.flight_number, fs.departure_date
+                FROM flight_schedule fs
+                WHERE fs.departure_date BETWEEN %s AND %s AND fs.departure_time >= %s
+                  AND NOT EXISTS (SELECT 1 FROM schedule_import si WHERE {match})
+                  AND NOT EXISTS (SELECT 1 FROM legality_violations lv
+                                  WHERE lv.flight_id = fs.id AND lv.violation_type = 'FLIGHT_CANCELLED')
+            """, (*season, since))
+            # Same convention as the Daily Operations cancel panel: the flight
+            # row stays, loses its crew and carries a crewless FLIGHT_CANCELLED.
+            for table in ('roster', 'duty_log'):
+                w.execute(f"DELETE FROM {table} t USING schedule_import_cancelled c WHERE t.flight_id = c.id",
+                          table=f'{table} (cancelled)')
+            cancelled = w.execute("""
+                INSERT INTO legality_violations (flight_id, crew_id, violation_type, details)
+                SELECT c.id, NULL, 'FLIGHT_CANCELLED',
+                       'Schedule import cancelled ' || c.flight_number || ' on ' || c.departure_date
+                FROM schedule_import_cancelled c
+            """, table='legality_violations (cancelled)')
+
+        inserted = w.execute(f"""
+            INSERT INTO flight_schedule (flight_number, origin, destination, departure_time, arrival_time, aircraft_type)
+            SELECT si.flight_number, si.origin, si.destination, si.departure_time, si.arrival_time, si.aircraft_type
+            FROM schedule_import si
+            WHERE NOT EXISTS (SELECT 1 FROM flight_schedule fs WHERE {match})
+            ORDER BY si.departure_time, si.flight_number
+        """, table='flight_schedule (insert)')
+
+        w.cur.execute("SELECT COUNT(*) FROM schedule_import")
+        unchanged = w.cur.fetchone()[0] - inserted - updated
+
+    return {'inserted': inserted, 'updated': updated, 'unchanged': unchanged, 'cancelled': cancelled}
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Import a seasonal schedule (SSIM or CSV) into flight_schedule.")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=sorted(READERS),
+                        help="default: csv for *.csv files, otherwise ssim")
+    parser.add_argument("--since", type=date.fromisoformat, help="first departure date to touch (default today)")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="do not cancel scheduled flights that are missing from the file")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes, then roll back")
+    args = parser.parse_args()
+    fmt = args.format or ('csv' if args.file.lower().endswith('.csv') else 'ssim')
+    with open(args.file, newline='', encoding='utf-8') as f:
+        legs = list(READERS[fmt](f))
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    counts = import_schedule(conn, legs, since=args.since, cancel_missing=not args.keep_missing,
+                             dry_run=args.dry_run)
+    conn.close()
+    print(f"{'🔎 Dry run' if args.dry_run else '✅ Imported'} {len(legs)} leg record(s): "
+          + ", ".join(f"{n} {k}" for k, n in counts.items()))
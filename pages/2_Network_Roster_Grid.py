@@ -1,23 +1,19 @@
 import streamlit as st
-import psycopg2
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
 from dotenv import load_dotenv
-from collections import defaultdict, OrderedDict
-import io
+from collections import OrderedDict
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.utils.export import DATASETS, download_buttons
+from app.utils.query_cache import cached_query
 
 load_dotenv()
 
 st.set_page_config(page_title="Network Roster Grid", page_icon="📊", layout="wide")
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
 st.markdown("""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@700&family=Exo+2:wght@300;400;600&family=Share+Tech+Mono&display=swap');
@@ -41,16 +37,14 @@ st.markdown("""
   .crew-exp  { color:#cc0000 !important; text-decoration:underline dotted; font-weight:700; }
   .ovr  { color:#8b0000 !important; }
   .empty-cell { color:#ccc; font-size:0.55rem; }
-  .cell-wrapper { position:relative; display:inline-block; width:100%; }
-  .hover-popup { display:none; position:absolute; top:0; left:105%; z-index:9999; min-width:200px; background:#fff; border:1px solid #1a1a2e; border-radius:8px; padding:0.7rem; box-shadow:0 4px 20px rgba(0,0,0,0.2); font-family:'Exo 2',sans-serif; font-size:0.75rem; text-align:left; pointer-events:none; }
-  .hover-popup .pop-flight { font-family:'Orbitron',monospace; font-size:0.65rem; font-weight:700; color:#1a1a2e; border-bottom:1px solid #eee; padding-bottom:0.3rem; margin-bottom:0.4rem; }
-  .hover-popup .pop-crew { padding:2px 0; color:#333; }
-  .hover-popup .pop-lcc  { color:#b35900; font-weight:700; }
-  .hover-popup .pop-cc   { color:#155724; }
-  .hover-popup .pop-ovr  { color:#cc0000; font-size:0.65rem; }
-  .hover-popup .pop-warn { color:#856404; font-size:0.62rem; font-style:italic; }
-  .hover-popup .pop-exp  { color:#cc0000; font-size:0.62rem; font-style:italic; }
-  .cell-wrapper:hover .hover-popup { display:block; }
+  .cell-detail { background:#fff; border:1px solid #1a1a2e; border-radius:8px; padding:0.7rem; box-shadow:0 2px 12px rgba(0,0,0,0.08); font-family:'Exo 2',sans-serif; font-size:0.75rem; max-width:420px; }
+  .cell-detail .pop-flight { font-family:'Orbitron',monospace; font-size:0.65rem; font-weight:700; color:#1a1a2e; border-bottom:1px solid #eee; padding-bottom:0.3rem; margin-bottom:0.4rem; }
+  .cell-detail .pop-crew { padding:2px 0; color:#333; }
+  .cell-detail .pop-lcc  { color:#b35900; font-weight:700; }
+  .cell-detail .pop-cc   { color:#155724; }
+  .cell-detail .pop-ovr  { color:#cc0000; font-size:0.65rem; }
+  .cell-detail .pop-warn { color:#856404; font-size:0.62rem; font-style:italic; }
+  .cell-detail .pop-exp  { color:#cc0000; font-size:0.62rem; font-style:italic; }
   .legend { font-family:'Share Tech Mono',monospace; font-size:0.65rem; color:#888; margin-top:0.6rem; }
   .print-btn { display:inline-block; background:#1a1a2e; color:#fff; border:none; border-radius:5px; padding:6px 16px; font-size:0.75rem; cursor:pointer; font-family:'Share Tech Mono',monospace; letter-spacing:0.08em; margin-bottom:1rem; }
   .print-btn:hover { background:#2d2d4e; }
@@ -60,37 +54,124 @@ st.markdown("""
 
 # ── Header ────────────────────────────────────────────────────────────────────
 st.markdown('<div class="page-title">📊 Network Roster Grid</div>', unsafe_allow_html=True)
-st.markdown('<div class="page-sub">MASTER CONTROL VIEW — 30-DAY ROLLING SCHEDULE — ALL FLIGHTS × ALL CREW</div>', unsafe_allow_html=True)
+st.markdown('<div class="page-sub">MASTER CONTROL VIEW — ROLLING SCHEDULE — ALL FLIGHTS × ALL CREW</div>', unsafe_allow_html=True)
+
+# Only one window of the grid is rendered per rerun; the date range itself is
+# limited to a year so the flight list stays a single indexed range scan.
+MAX_RANGE_DAYS = 366
 
 # ── Date Range (compact, inline, below title) ─────────────────────────────────
-col1, col2, col3 = st.columns([1, 1, 4])
+col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 2])
 with col1:
     start_date = st.date_input("From", value=date.today(), label_visibility="collapsed",
                                help="Start date")
     st.caption("From")
 with col2:
-    max_to = start_date + timedelta(days=30)
-    end_date = st.date_input("To", value=min(start_date + timedelta(days=29), max_to),
+    max_to = start_date + timedelta(days=MAX_RANGE_DAYS - 1)
+    end_date = st.date_input("To", value=start_date + timedelta(days=29),
                              min_value=start_date, max_value=max_to,
-                             label_visibility="collapsed", help="Max 30 days")
-    st.caption(f"To (max {max_to.strftime('%d %b')})")
+                             label_visibility="collapsed", help="End date")
+    st.caption(f"To (max {max_to.strftime('%d %b %Y')})")
+with col3:
+    days_per_view = st.selectbox("Days per view", [7, 14, 31], index=1, label_visibility="collapsed")
+    st.caption("Days per view")
+with col4:
+    flights_per_page = st.selectbox("Flights per page", [10, 25, 50, 100], index=1, label_visibility="collapsed")
+    st.caption("Flights per page")
 csv_placeholder = st.empty()
 
+
+ROSTER_COLS = ['flight_number', 'duty_date', 'full_name', 'role', 'crew_id', 'is_manual_override']
+EMPTY_TD    = '<td><span class="empty-cell">—</span></td>'
+
+
+def roster_frame(day_from, day_to):
+    rows = cached_query("""
+        SELECT fs.flight_number, fs.departure_date AS duty_date,
+               cm.full_name, cm.role, cm.id AS crew_id, r.is_manual_override
+        FROM roster r
+        JOIN flight_schedule fs ON fs.id = r.flight_id
+        JOIN crew_master     cm ON cm.id = r.crew_id
+        WHERE fs.departure_date BETWEEN %s AND %s
+        ORDER BY fs.flight_number, fs.departure_date, cm.role DESC, cm.full_name
+    """, (day_from, day_to), scopes=('roster', 'schedule', 'crew'))
+    return pd.DataFrame(rows, columns=ROSTER_COLS)
+
+
+def crew_columns(df):
+    """Per-crew display columns: name span, detail line and CSV flag."""
+    df = df.copy()
+    override = df['is_manual_override'].fillna(False).astype(bool)
+    expired  = df['crew_id'].isin(expired_crew_ids)
+    expiring = df['crew_id'].isin(expiring_crew_ids) & ~expired
+    qual     = (df['crew_id'].map(expired_text).where(expired, df['crew_id'].map(expiring_text))
+                .fillna(''))
+
+    parts = df['full_name'].str.strip().str.split()
+    short = ((parts.str[0].str[0] + '.' + parts.str[-1]).where(parts.str.len() >= 2, df['full_name'].str[:7])
+             .astype(str))
+    role_css = np.where(df['role'] == 'LCC', 'lcc', 'cc')
+    css = (pd.Series(role_css, index=df.index)
+           + np.where(override, ' ovr', '')
+           + np.where(expired, ' crew-exp', np.where(expiring, ' crew-warn', '')))
+    marker = (pd.Series(np.where(override, ' ⚠', ''), index=df.index)
+              + np.where(expired, ' 🔴', np.where(expiring, ' 🟡', '')))
+    df['span'] = '<span class="crew-name ' + css + '">' + short + marker + '</span>'
+
+    qual_flag = pd.Series(np.where(expired, 'QUAL EXPIRED:', np.where(expiring, 'QUAL EXPIRING:', '')),
+                          index=df.index) + qual
+    df['flag'] = (pd.Series(np.where(override, 'OVERRIDE', ''), index=df.index)
+                  + np.where(override & (expired | expiring), ' | ', '')
+                  + qual_flag.where(expired | expiring, ''))
+    df['csv_name'] = df['role'] + ':' + df['full_name']
+    df['detail'] = ('<div class="pop-crew"><span class="pop-' + role_css + '">[' + df['role'] + '] '
+                    + df['full_name'] + '</span>'
+                    + np.where(override, '<div class="pop-ovr">⚠️ Manual Override</div>', '')
+                    + np.where(expired, '<div class="pop-exp">🔴 EXPIRED: ' + qual + '</div>',
+                      np.where(expiring, '<div class="pop-warn">🟡 Expiring: ' + qual + '</div>', ''))
+                    + '</div>')
+    df['expired'], df['expiring'] = expired, expiring
+    return df
+
+
+def grid_frames(df, flights, days):
+    """Pivot crew rows into flight × day frames of table cells and CSV text."""
+    if df.empty:
+        return (pd.DataFrame(EMPTY_TD, index=flights, columns=days),
+                pd.DataFrame('', index=flights, columns=days))
+    keys  = ['flight_number', 'duty_date']
+    cells = df.groupby(keys, sort=False).agg(
+        html=('span', ''.join), names=('csv_name', ' | '.join),
+        exp=('expired', 'any'), warn=('expiring', 'any'))
+    flagged = df[df['flag'] != '']
+    cells['flags'] = flagged.groupby(keys, sort=False)['flag'].agg(' | '.join)
+    cells['flags'] = cells['flags'].fillna('')
+
+    # Cell background: red > yellow > white
+    cls = np.where(cells['exp'], 'exp', np.where(cells['warn'], 'warn', ''))
+    cells['td']  = '<td class="' + cls + '"><div class="crew-cell">' + cells['html'] + '</div></td>'
+    cells['csv'] = cells['names'] + np.where(cells['flags'] != '', ' [' + cells['flags'] + ']', '')
+    cells = cells.reset_index()
+
+    def pivot(col, fill):
+        return (cells.pivot(index='flight_number', columns='duty_date', values=col)
+                     .reindex(index=flights, columns=days).fillna(fill))
+    return pivot('td', EMPTY_TD), pivot('csv', '')
+
+
 try:
-    conn = get_connection()
-    cur  = conn.cursor()
     today = date.today()
 
     # Expiring (within 3 days) and expired crew
     try:
-        cur.execute("""
+        quals = cached_query("""
             SELECT crew_id, qualification_type, expiry_date
             FROM crew_qualifications WHERE expiry_date <= %s ORDER BY expiry_date
-        """, (today + timedelta(days=3),))
+        """, (today + timedelta(days=3),), scopes=('crew',))
         expiring_crew_ids = set()   # within 3 days — yellow warning
         expired_crew_ids  = set()   # already expired — red
         crew_qual_details = {}
-        for crew_id, qt, exp in cur.fetchall():
+        for crew_id, qt, exp in quals:
             days_left = (exp - today).days
             if days_left < 0:
                 expired_crew_ids.add(crew_id)
@@ -103,113 +184,54 @@ try:
         expiring_crew_ids = set()
         expired_crew_ids  = set()
         crew_qual_details = {}
+    expired_text  = {cid: " | ".join(f"{qt} EXP {exp.strftime('%d %b')}" for qt, exp, dl in q if dl < 0)
+                     for cid, q in crew_qual_details.items()}
+    expiring_text = {cid: " | ".join(f"{qt} {exp.strftime('%d %b')} ({dl}d)" for qt, exp, dl in q if dl >= 0)
+                     for cid, q in crew_qual_details.items()}
 
     days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
 
-    cur.execute("""
+    # Row labels for every rostered flight in the range (route/time of its first sector)
+    flight_rows = cached_query("""
         SELECT fs.flight_number,
-               fs.origin || '→' || fs.destination AS route,
-               TO_CHAR(fs.departure_time, 'HH24:MI') AS dep,
-               fs.departure_time::date AS duty_date,
-               cm.full_name, cm.role, cm.id AS crew_id,
-               r.is_manual_override
-        FROM roster r
-        JOIN flight_schedule fs ON fs.id = r.flight_id
-        JOIN crew_master     cm ON cm.id = r.crew_id
-        WHERE fs.departure_time::date BETWEEN %s AND %s
-        ORDER BY fs.flight_number, fs.departure_time::date, cm.role DESC, cm.full_name
-    """, (start_date, end_date))
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    data         = defaultdict(lambda: defaultdict(list))
-    flight_routes = OrderedDict()
+               (ARRAY_AGG(fs.origin || '→' || fs.destination ORDER BY fs.departure_time))[1],
+               (ARRAY_AGG(TO_CHAR(fs.departure_time, 'HH24:MI') ORDER BY fs.departure_time))[1]
+        FROM flight_schedule fs
+        WHERE fs.departure_date BETWEEN %s AND %s
+          AND EXISTS (SELECT 1 FROM roster r WHERE r.flight_id = fs.id)
+        GROUP BY fs.flight_number
+        ORDER BY fs.flight_number
+    """, (start_date, end_date), scopes=('roster', 'schedule'))
+    flight_routes = OrderedDict((f, f"{f}  {route}  {dep}") for f, route, dep in flight_rows)
+    flights_list  = list(flight_routes.keys())
 
-    for flight, route, dep, duty_date, name, role, crew_id, override in rows:
-        data[flight][duty_date].append((name, role, crew_id, override))
-        if flight not in flight_routes:
-            flight_routes[flight] = f"{flight}  {route}  {dep}"
+    # ── Window: one page of flights × one span of days ────────────────────────
+    flight_pages = max(1, -(-len(flights_list) // flights_per_page))
+    day_windows  = max(1, -(-len(days) // days_per_view))
+    with col5:
+        pc1, pc2 = st.columns(2)
+        with pc1:
+            flight_page = st.number_input("Flight page", 1, flight_pages, 1, label_visibility="collapsed")
+            st.caption(f"Flight page (of {flight_pages})")
+        with pc2:
+            day_window = st.number_input("Day window", 1, day_windows, 1, label_visibility="collapsed")
+            st.caption(f"Day window (of {day_windows})")
 
-    flights_list = sorted(flight_routes.keys())
+    page_flights = flights_list[(flight_page - 1) * flights_per_page:flight_page * flights_per_page]
+    page_days    = days[(day_window - 1) * days_per_view:day_window * days_per_view]
 
-    def abbrev(name):
-        parts = name.strip().split()
-        if len(parts) >= 2:
-            return f"{parts[0][0]}.{parts[-1]}"
-        return name[:7]
+    # Only the visible window's rows are formatted and pivoted on a rerun
+    roster_df = roster_frame(start_date, end_date)
+    crew_df   = crew_columns(roster_df[roster_df['flight_number'].isin(page_flights)
+                                       & roster_df['duty_date'].isin(page_days)])
+    window    = grid_frames(crew_df, page_flights, page_days)[0]
 
     # ── Build HTML table ──────────────────────────────────────────────────────
-    header = '<th class="flight-col">FLIGHT</th>'
-    for d in days:
-        header += f'<th>{d.strftime("%d")}<br>{d.strftime("%a").upper()}</th>'
-
-    rows_html = ""
-    csv_rows  = []
-
-    for flight in flights_list:
-        label   = flight_routes[flight]
-        row     = f'<td class="flight-id">{label}</td>'
-        csv_row = [flight]
-
-        for d in days:
-            crew_list = data[flight].get(d, [])
-
-            if not crew_list:
-                row += '<td><span class="empty-cell">—</span></td>'
-                csv_row.append("")
-                continue
-
-            # Determine cell background: red > yellow > white
-            cell_has_expired  = any(cid in expired_crew_ids  for _, _, cid, _ in crew_list)
-            cell_has_expiring = any(cid in expiring_crew_ids for _, _, cid, _ in crew_list)
-            cell_class = "exp" if cell_has_expired else ("warn" if cell_has_expiring else "")
-
-            popup     = f'<div class="pop-flight">{label} · {d.strftime("%d %b")}</div>'
-            cell_html = '<div class="crew-cell">'
-            csv_names = []
-            csv_flags = []
-
-            for name, role, crew_id, override in crew_list:
-                short    = abbrev(name)
-                name_css = "lcc" if role == "LCC" else "cc"
-                extra    = ""
-                pop_extra = ""
-
-                if override:
-                    name_css += " ovr"
-                    extra     = " ⚠"
-                    pop_extra += '<div class="pop-ovr">⚠️ Manual Override</div>'
-                    csv_flags.append("OVERRIDE")
-
-                if crew_id in expired_crew_ids:
-                    name_css += " crew-exp"
-                    quals = " | ".join(f"{qt} EXP {exp.strftime('%d %b')}"
-                                       for qt, exp, _ in crew_qual_details.get(crew_id, []) if (exp - today).days < 0)
-                    extra    += " 🔴"
-                    pop_extra += f'<div class="pop-exp">🔴 EXPIRED: {quals}</div>'
-                    csv_flags.append(f"QUAL EXPIRED:{quals}")
-                elif crew_id in expiring_crew_ids:
-                    name_css += " crew-warn"
-                    quals = " | ".join(f"{qt} {exp.strftime('%d %b')} ({dl}d)"
-                                       for qt, exp, dl in crew_qual_details.get(crew_id, []) if dl >= 0)
-                    extra    += " 🟡"
-                    pop_extra += f'<div class="pop-warn">🟡 Expiring: {quals}</div>'
-                    csv_flags.append(f"QUAL EXPIRING:{quals}")
-
-                cell_html += f'<span class="crew-name {name_css}">{short}{extra}</span>'
-                popup     += f'<div class="pop-crew"><span class="pop-{"lcc" if role=="LCC" else "cc"}">[{role}] {name}</span>{pop_extra}</div>'
-                csv_names.append(f"{role}:{name}")
-
-            cell_html += '</div>'
-            full_cell  = f'<div class="cell-wrapper">{cell_html}<div class="hover-popup">{popup}</div></div>'
-            row       += f'<td class="{cell_class}">{full_cell}</td>'
-
-            flags_str = " | ".join(csv_flags) if csv_flags else "LEGAL"
-            csv_row.append(" | ".join(csv_names) + (f" [{flags_str}]" if csv_flags else ""))
-
-        rows_html += f'<tr>{row}</tr>'
-        csv_rows.append(csv_row)
+    header = '<th class="flight-col">FLIGHT</th>' + "".join(
+        f'<th>{d.strftime("%d")}<br>{d.strftime("%a").upper()}</th>' for d in page_days)
+    labels    = pd.Series([flight_routes[f] for f in page_flights], index=window.index, dtype=object)
+    rows_html = ("<tr><td class=\"flight-id\">" + labels + "</td>"
+                 + window.agg("".join, axis=1) + "</tr>").str.cat() if page_flights else ""
 
     table_html = f"""
     <div class="grid-wrapper">
@@ -224,22 +246,45 @@ try:
       <span style="background:#fff8e1;padding:1px 4px;border:1px solid #ffc107">■</span> Qual expiring (≤3 days) &nbsp;
       <span style="background:#fff0f0;padding:1px 4px;border:1px solid #f5c6cb">■</span> Qual expired &nbsp;
       <span style="color:#8b0000">⚠</span> Manual Override &nbsp;
-      · Hover cell for full crew details
+      · Flights {(flight_page - 1) * flights_per_page + 1 if page_flights else 0}–{(flight_page - 1) * flights_per_page + len(page_flights)} of {len(flights_list)}
+      · {page_days[0].strftime("%d %b")} – {page_days[-1].strftime("%d %b")}
     </div>
     """
     st.markdown(table_html, unsafe_allow_html=True)
 
-    # ── CSV Download ──────────────────────────────────────────────────────────
-    day_headers = [d.strftime("%d-%b") for d in days]
-    csv_df  = pd.DataFrame(csv_rows, columns=["Flight"] + day_headers)
-    csv_buf = io.StringIO()
-    csv_df.to_csv(csv_buf, index=False)
-    csv_placeholder.download_button(
+    # ── Cell detail (on demand) ───────────────────────────────────────────────
+    if page_flights:
+        dc1, dc2, dc3 = st.columns([1, 1, 3])
+        with dc1:
+            detail_flight = st.selectbox("Cell detail — flight", page_flights)
+        with dc2:
+            detail_day = st.selectbox("Day", page_days, format_func=lambda d: d.strftime("%a %d %b"))
+        with dc3:
+            cell = crew_df[(crew_df['flight_number'] == detail_flight) & (crew_df['duty_date'] == detail_day)]
+            if not cell.empty:
+                st.markdown(f'<div class="cell-detail"><div class="pop-flight">{flight_routes[detail_flight]} · '
+                            f'{detail_day.strftime("%d %b")}</div>{cell["detail"].str.cat()}</div>',
+                            unsafe_allow_html=True)
+            else:
+                st.caption("No crew rostered on this flight and day.")
+
+    # ── CSV Download (same cells as the grid, whole range, built on click) ────
+    def range_csv():
+        csv_df = grid_frames(crew_columns(roster_df), flights_list, days)[1]
+        csv_df = csv_df.set_axis([d.strftime("%d-%b") for d in days], axis=1)
+        csv_df.index.name = "Flight"
+        return csv_df.to_csv()
+
+    exports = csv_placeholder.container()
+    exports.download_button(
         label="⬇️ Download CSV",
-        data=csv_buf.getvalue(),
+        data=range_csv,
         file_name=f"network_roster_{start_date}_{end_date}.csv",
-        mime="text/csv"
+        mime="text/csv", on_click="ignore"
     )
+    # One row per crew assignment over the whole range, streamed on click
+    download_buttons(exports, f"roster_rows_{start_date}_{end_date}", DATASETS['roster'],
+                     (start_date, end_date), label="Roster rows")
 
 except Exception as e:
     st.error(f"Database error: {e}")
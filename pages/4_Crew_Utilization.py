@@ -1,22 +1,19 @@
 import streamlit as st
-import psycopg2
 import pandas as pd
-from datetime import date, timedelta
+from datetime import date
 from dotenv import load_dotenv
 import io
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.engine.utilization import (DEFAULT_WINDOWS, classify_zones,
+                                    utilization_columns, utilization_sql)
+from app.utils.query_cache import cached_query
 
 load_dotenv()
 
 st.set_page_config(page_title="Crew Utilization Analytics", page_icon="📈", layout="wide")
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
 st.markdown("""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@700&family=Exo+2:wght@300;400;600&family=Share+Tech+Mono&display=swap');
@@ -31,7 +28,7 @@ st.markdown("""
   .zone-ok    { background:#f0fff4 !important; color:#155724; }
   .bar-bg   { background:#e9ecef; border-radius:3px; height:10px; }
   .bar-fill { height:10px; border-radius:3px; }
-  .summary-cards { display:grid; grid-template-columns:repeat(4,1fr); gap:0.8rem; margin-bottom:1.2rem; }
+  .summary-cards { display:grid; grid-template-columns:repeat(8,1fr); gap:0.8rem; margin-bottom:1.2rem; }
   .sum-card { background:#f7f8fc; border:1px solid #e0e6f0; border-radius:8px; padding:0.8rem 1rem; border-top:3px solid #1a1a2e; text-align:center; }
   .sum-val  { font-family:'Orbitron',monospace; font-size:1.1rem; font-weight:700; color:#1a1a2e; }
   .sum-lbl  { font-family:'Exo 2',sans-serif; font-size:0.65rem; color:#888; text-transform:uppercase; margin-top:2px; }
@@ -41,123 +38,88 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 st.markdown('<div class="page-title">📈 Crew Utilization Analytics</div>', unsafe_allow_html=True)
-st.markdown('<div class="page-sub">GOVERNANCE DASHBOARD — FAIRNESS & EFFICIENCY MONITORING — 28-DAY ROLLING WINDOW</div>', unsafe_allow_html=True)
+st.markdown('<div class="page-sub">GOVERNANCE DASHBOARD — FAIRNESS & EFFICIENCY MONITORING — TRAILING 7 / 28 / 365-DAY WINDOWS</div>', unsafe_allow_html=True)
 
-col1, col2 = st.columns([3, 1])
+col1, col2, col3 = st.columns([2, 1, 1])
+with col1:
+    as_of = st.date_input("As of", value=date.today())
 with col2:
+    window = int(st.number_input("Window (days)", min_value=1, max_value=730, value=28, step=1))
+with col3:
     role_filter = st.selectbox("Filter by Role", ["All", "LCC", "CC"])
 csv_placeholder = st.empty()
 
-try:
-    conn = get_connection()
-    cur  = conn.cursor()
-    today    = date.today()
-    since_28 = today - timedelta(days=28)
-
-    role_sql = "" if role_filter == "All" else f"AND cm.role = '{role_filter}'"
-
-    # ── Get all active crew ───────────────────────────────────────────────────
-    cur.execute(f"""
-        SELECT id, full_name, role, employee_id
-        FROM crew_master
-        WHERE is_active = TRUE {role_sql}
-        ORDER BY role, full_name
-    """)
-    crew_rows = cur.fetchall()
-
-    # ── Get ALL roster sectors for current month (treat as completed) ──────────
-    month_start = today.replace(day=1)
-    month_end   = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+ZONE_STYLES = {
+    '🔴 Over':     'background-color:#fff0f0;color:#721c24;font-weight:bold',
+    '🟡 Under':    'background-color:#fff8e1;color:#856404',
+    '✅ Balanced': 'background-color:#f0fff4;color:#155724',
+    '⚪ Idle':     'background-color:#f3f4f6;color:#6b7280',
+}
 
-    cur.execute("""
-        SELECT r.crew_id, COUNT(r.id) AS sectors,
-               COUNT(CASE WHEN EXTRACT(HOUR FROM fs.departure_time) < 6  THEN 1 END) AS early,
-               COUNT(CASE WHEN EXTRACT(HOUR FROM fs.departure_time) >= 20 THEN 1 END) AS night,
-               COUNT(CASE WHEN r.is_manual_override THEN 1 END) AS overrides
-        FROM roster r
-        JOIN flight_schedule fs ON fs.id = r.flight_id
-        WHERE fs.departure_time::date BETWEEN %s AND %s
-        GROUP BY r.crew_id
-    """, (month_start, month_end))
-    sector_map = {r[0]: r[1:] for r in cur.fetchall()}
-
-    # ── Get duty hours from roster (all scheduled this month as planned) ───────
-    cur.execute("""
-        SELECT r.crew_id,
-               COALESCE(SUM(EXTRACT(EPOCH FROM (fs.arrival_time - fs.departure_time))/3600), 0) AS hours
-        FROM roster r
-        JOIN flight_schedule fs ON fs.id = r.flight_id
-        WHERE fs.departure_time::date BETWEEN %s AND %s
-        GROUP BY r.crew_id
-    """, (month_start, month_end))
-    hours_map = {r[0]: float(r[1]) for r in cur.fetchall()}
-
-    cur.close()
-    conn.close()
-
-    # ── Build dataframe ───────────────────────────────────────────────────────
-    records = []
-    for crew_id, full_name, role, emp_id in crew_rows:
-        sectors, early, night, overrides = sector_map.get(crew_id, (0, 0, 0, 0))
-        hours = hours_map.get(crew_id, 0.0)
-        records.append({
-            'id': crew_id, 'full_name': full_name, 'role': role,
-            'employee_id': emp_id, 'sectors': int(sectors),
-            'hours': hours, 'early': int(early),
-            'night': int(night), 'overrides': int(overrides)
-        })
-
-    df = pd.DataFrame(records)
+try:
+    # ── One pass: every window's totals and fleet statistics per crew ─────────
+    windows = sorted({*DEFAULT_WINDOWS, window})
+    sql, params = utilization_sql(as_of, windows, None if role_filter == "All" else role_filter)
+    df = pd.DataFrame(cached_query(sql, params, scopes=('roster', 'schedule', 'crew')),
+                      columns=utilization_columns(windows))
 
     if df.empty:
         st.warning("No utilization data found.")
     else:
-        # Filter to crew with any activity for meaningful stats
-        active_df = df[df['sectors'] > 0]
-        avg_hrs = active_df['hours'].mean() if not active_df.empty else 0
-        max_hrs = df['hours'].max()
-        over    = len(active_df[active_df['hours'] > avg_hrs * 1.2]) if avg_hrs > 0 else 0
-        under   = len(active_df[active_df['hours'] < avg_hrs * 0.8]) if avg_hrs > 0 else 0
+        num_cols = [c for c in df.columns if c not in ('full_name', 'role', 'employee_id')]
+        df[num_cols] = df[num_cols].apply(pd.to_numeric).fillna(0)
+
+        hours   = df[f'hours_{window}']
+        first   = df.iloc[0]
+        avg_hrs = float(first[f'mean_{window}'])
+        df['zone'] = classify_zones(hours, avg_hrs)
+        over  = int((df['zone'] == '🔴 Over').sum())
+        under = int((df['zone'] == '🟡 Under').sum())
+        idle  = int((df['zone'] == '⚪ Idle').sum())
 
         st.markdown(f"""
         <div class="summary-cards">
-          <div class="sum-card"><div class="sum-val">{avg_hrs:.1f}h</div><div class="sum-lbl">Avg Hours / Active Crew</div></div>
-          <div class="sum-card"><div class="sum-val">{max_hrs:.1f}h</div><div class="sum-lbl">Max Hours (any crew)</div></div>
+          <div class="sum-card"><div class="sum-val">{avg_hrs:.1f}h</div><div class="sum-lbl">Avg Hours / Active Crew ({window}d)</div></div>
+          <div class="sum-card"><div class="sum-val">{hours.max():.1f}h</div><div class="sum-lbl">Max Hours (any crew)</div></div>
+          <div class="sum-card"><div class="sum-val">{first[f'std_{window}']:.1f}h</div><div class="sum-lbl">Std Deviation</div></div>
+          <div class="sum-card"><div class="sum-val">{first[f'gini_{window}']:.3f}</div><div class="sum-lbl">Gini (0 = equal)</div></div>
+          <div class="sum-card"><div class="sum-val">{first[f'spread_{window}']:.1f}h</div><div class="sum-lbl">Max − Min Spread</div></div>
           <div class="sum-card" style="border-top-color:#dc3545"><div class="sum-val" style="color:#dc3545">{over}</div><div class="sum-lbl">Over-Utilized</div></div>
           <div class="sum-card" style="border-top-color:#f59e0b"><div class="sum-val" style="color:#856404">{under}</div><div class="sum-lbl">Under-Utilized</div></div>
+          <div class="sum-card" style="border-top-color:#9ca3af"><div class="sum-val" style="color:#6b7280">{idle}</div><div class="sum-lbl">Idle (no hours)</div></div>
         </div>
         """, unsafe_allow_html=True)
 
         # Build display dataframe
-        display_df = df.sort_values('hours', ascending=False).copy()
-        display_df['Role']      = display_df['role'].apply(lambda x: '🟡 LCC' if x == 'LCC' else '🔵 CC')
-        display_df['Hours']     = display_df['hours'].apply(lambda x: f'{x:.1f}h')
-        display_df['Zone']      = display_df['hours'].apply(
-            lambda h: '🔴 Over' if (avg_hrs > 0 and h > avg_hrs * 1.2)
-                      else ('🟡 Under' if (avg_hrs > 0 and h < avg_hrs * 0.8) else '✅ Balanced')
-        )
-        display_df['Overrides'] = display_df['overrides'].apply(lambda x: f'⚠️ {x}' if x > 0 else '—')
-
-        out = display_df.rename(columns={
-            'full_name': 'Name', 'employee_id': 'ID',
-            'sectors': 'Sectors', 'early': 'Early Dep',
-            'night': 'Night Dep'
-        })[['Name','Role','ID','Sectors','Hours','Zone','Early Dep','Night Dep','Overrides']]
-
-        def color_zone(val):
-            if '🔴' in str(val): return 'background-color:#fff0f0;color:#721c24;font-weight:bold'
-            if '🟡' in str(val): return 'background-color:#fff8e1;color:#856404'
-            if '✅' in str(val): return 'background-color:#f0fff4;color:#155724'
-            return ''
+        display_df = df.sort_values(f'hours_{window}', ascending=False)
+        overrides  = display_df[f'overrides_{window}']
+        out = pd.DataFrame({
+            'Name':      display_df['full_name'],
+            'Role':      display_df['role'].map({'LCC': '🟡 LCC'}).fillna('🔵 CC'),
+            'ID':        display_df['employee_id'],
+            'Sectors':   display_df[f'sectors_{window}'].astype(int),
+            'Hours':     display_df[f'hours_{window}'].map('{:.1f}h'.format),
+            'Zone':      display_df['zone'],
+            **{f'{w}d Hours': display_df[f'hours_{w}'].map('{:.1f}h'.format)
+               for w in DEFAULT_WINDOWS if w != window},
+            'Early Dep': display_df[f'early_{window}'].astype(int),
+            'Night Dep': display_df[f'night_{window}'].astype(int),
+            'Overrides': ('⚠️ ' + overrides.astype(int).astype(str)).where(overrides > 0, '—'),
+        })
 
-        styled = out.style.applymap(color_zone, subset=['Zone'])
+        styled = out.style.apply(lambda z: z.map(ZONE_STYLES).fillna(''), subset=['Zone'])
         st.dataframe(styled, use_container_width=True, hide_index=True)
 
-        csv_buf = io.StringIO()
-        df.drop(columns=['id']).to_csv(csv_buf, index=False)
-        csv_placeholder.download_button(
-            "⬇️ Download CSV", csv_buf.getvalue(),
-            file_name=f"utilization_{today}.csv", mime="text/csv"
+        export_df = df.drop(columns=['crew_id'])
+        c1, c2 = csv_placeholder.container().columns(2)
+        c1.download_button(
+            "⬇️ Download CSV", lambda: export_df.to_csv(index=False),
+            file_name=f"utilization_{as_of}_{window}d.csv", mime="text/csv", on_click="ignore"
+        )
+        c2.download_button(
+            "⬇️ Download Parquet", lambda: io.BytesIO(export_df.to_parquet(index=False)),
+            file_name=f"utilization_{as_of}_{window}d.parquet", mime="application/vnd.apache.parquet",
+            on_click="ignore"
         )
 
 except Exception as e:
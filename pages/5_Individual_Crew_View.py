@@ -1,11 +1,13 @@
 import streamlit as st
-import psycopg2
 import pandas as pd
 from datetime import date, timedelta
 from dotenv import load_dotenv
 import os
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.utils.crew_import import remove_duties_on_leave
+from app.utils.db import get_connection
+from app.utils.query_cache import cached_query
 try:
     from reopt_helper import reoptimize_from
     REOPT_AVAILABLE = True
@@ -16,13 +18,6 @@ load_dotenv()
 
 st.set_page_config(page_title="Individual Crew View", page_icon="👤", layout="wide")
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
 st.markdown("""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@700&family=Exo+2:wght@300;400;600&family=Share+Tech+Mono&display=swap');
@@ -66,22 +61,9 @@ st.markdown('<div class="page-title">👤 Individual Crew View</div>', unsafe_al
 st.markdown('<div class="page-sub">COMPLIANCE & HR INTERFACE — MONTHLY DUTY CALENDAR — FDTL MONITORING</div>', unsafe_allow_html=True)
 
 try:
-    conn = get_connection()
-    cur  = conn.cursor()
-
-    # Ensure crew_leave table exists
-    cur.execute(
-        "CREATE TABLE IF NOT EXISTS crew_leave ("
-        "id SERIAL PRIMARY KEY, crew_id INTEGER NOT NULL, "
-        "leave_date DATE NOT NULL, leave_type VARCHAR(50) NOT NULL, "
-        "notes TEXT, created_at TIMESTAMP DEFAULT NOW(), "
-        "UNIQUE(crew_id, leave_date))"
-    )
-    conn.commit()
-
     # Crew selector
-    cur.execute("SELECT id, full_name, role, employee_id FROM crew_master WHERE is_active=TRUE ORDER BY role, full_name")
-    crew_list = cur.fetchall()
+    crew_list = cached_query("SELECT id, full_name, role, employee_id FROM crew_master WHERE is_active=TRUE ORDER BY role, full_name",
+                             scopes=('crew',))
     crew_options = {f"{name} ({emp_id}) — {role}": (cid, name, role, emp_id) for cid, name, role, emp_id in crew_list}
 
     selected = st.selectbox("Select Crew Member", list(crew_options.keys()))
@@ -92,60 +74,56 @@ try:
     month_end   = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
 
     # Get duties this month
-    cur.execute("""
-        SELECT fs.flight_number, fs.departure_time::date, fs.departure_time, fs.arrival_time,
+    duties = cached_query("""
+        SELECT fs.flight_number, fs.departure_date, fs.departure_time, fs.arrival_time,
                fs.origin, fs.destination, r.is_manual_override
         FROM roster r
         JOIN flight_schedule fs ON fs.id = r.flight_id
-        WHERE r.crew_id = %s AND fs.departure_time::date BETWEEN %s AND %s
+        WHERE r.crew_id = %s AND fs.departure_date BETWEEN %s AND %s
         ORDER BY fs.departure_time
-    """, (crew_id, month_start, month_end))
-    duties = cur.fetchall()
+    """, (crew_id, month_start, month_end), scopes=('roster', 'schedule'))
 
     # FDTL stats — past only for 7-day/28-day limits, full month for planning
     week_start   = today - timedelta(days=6)
     days28_start = today - timedelta(days=27)
-    cur.execute("SELECT COALESCE(SUM(total_duty_hours),0) FROM duty_log WHERE crew_id=%s AND duty_start::date BETWEEN %s AND %s", (crew_id, week_start, today))
-    weekly_hrs = float(cur.fetchone()[0])
-    cur.execute("SELECT COALESCE(SUM(total_duty_hours),0) FROM duty_log WHERE crew_id=%s AND duty_start::date BETWEEN %s AND %s", (crew_id, days28_start, today))
-    monthly_hrs = float(cur.fetchone()[0])
-    cur.execute("SELECT MAX(duty_end) FROM duty_log WHERE crew_id=%s AND duty_start::date <= %s", (crew_id, today))
-    last_end = cur.fetchone()[0]
+    weekly_hrs, monthly_hrs, last_end = cached_query("""
+        SELECT COALESCE(SUM(block_hours) FILTER (WHERE day >= %s), 0),
+               COALESCE(SUM(block_hours), 0),
+               (SELECT last_release FROM crew_daily_hours
+                WHERE crew_id = %s AND day <= %s ORDER BY day DESC LIMIT 1)
+        FROM crew_daily_hours
+        WHERE crew_id = %s AND day BETWEEN %s AND %s
+    """, (week_start, crew_id, today, crew_id, days28_start, today), scopes=('roster',))[0]
+    weekly_hrs, monthly_hrs = float(weekly_hrs), float(monthly_hrs)
 
     # Last month date range
     last_month_end   = month_start - timedelta(days=1)
     last_month_start = last_month_end.replace(day=1)
 
-    cur.execute(
+    last_month_duties = cached_query(
         "SELECT COALESCE(dl.flight_number, fs.flight_number) as fn, "
-        "dl.duty_start::date, dl.duty_start, dl.duty_end, "
+        "dl.duty_start_date, dl.duty_start, dl.duty_end, "
         "COALESCE(dl.origin, fs.origin, '—') as orig, "
         "COALESCE(dl.destination, fs.destination, '—') as dest "
         "FROM duty_log dl "
         "LEFT JOIN flight_schedule fs ON fs.id = dl.flight_id "
-        "WHERE dl.crew_id = %s AND dl.duty_start::date BETWEEN %s AND %s "
+        "WHERE dl.crew_id = %s AND dl.duty_start >= %s AND dl.duty_start < %s::date + 1 "
         "ORDER BY dl.duty_start",
-        (crew_id, last_month_start, last_month_end)
+        (crew_id, last_month_start, last_month_end), scopes=('roster', 'schedule')
     )
-    last_month_duties = cur.fetchall()
 
     # Qualifications
     try:
-        cur.execute("SELECT qualification_type, expiry_date FROM crew_qualifications WHERE crew_id=%s ORDER BY expiry_date", (crew_id,))
-        quals = cur.fetchall()
+        quals = cached_query("SELECT qualification_type, expiry_date FROM crew_qualifications WHERE crew_id=%s ORDER BY expiry_date", (crew_id,), scopes=('crew',))
     except:
         quals = []
 
     # Leave records
     try:
-        cur.execute("SELECT leave_date, leave_type, notes FROM crew_leave WHERE crew_id=%s AND leave_date BETWEEN %s AND %s ORDER BY leave_date", (crew_id, month_start, month_end))
-        leave_records = {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+        leave_records = {r[0]: (r[1], r[2]) for r in cached_query("SELECT leave_date, leave_type, notes FROM crew_leave WHERE crew_id=%s AND leave_date BETWEEN %s AND %s ORDER BY leave_date", (crew_id, month_start, month_end), scopes=('crew',))}
     except:
         leave_records = {}
 
-    cur.close()
-    conn.close()
-
     # ── Profile card ──────────────────────────────────────────────────────────
     role_badge = f'<span class="profile-role-{"lcc" if crew_role=="LCC" else "cc"}">{crew_role}</span>'
     total_flights = len(duties)
@@ -292,17 +270,16 @@ try:
                 else:
                     try:
                         conn_l = get_connection(); cur_l = conn_l.cursor()
-                        d = lv_from
-                        while d <= lv_to:
-                            cur_l.execute(
-                                "INSERT INTO crew_leave (crew_id,leave_date,leave_type) VALUES (%s,%s,%s) "
-                                "ON CONFLICT (crew_id,leave_date) DO UPDATE SET leave_type=EXCLUDED.leave_type",
-                                (crew_id, d, lv_type))
-                            cur_l.execute("DELETE FROM roster WHERE crew_id=%s AND duty_date=%s", (crew_id, d))
-                            d += timedelta(days=1)
+                        cur_l.execute(
+                            "INSERT INTO crew_leave (crew_id,leave_date,leave_type) "
+                            "SELECT %s, d::date, %s FROM generate_series(%s::date, %s::date, INTERVAL '1 day') d "
+                            "ON CONFLICT (crew_id,leave_date) DO UPDATE SET leave_type=EXCLUDED.leave_type",
+                            (crew_id, lv_type, lv_from, lv_to))
+                        remove_duties_on_leave(cur_l, lv_from, lv_to, [crew_id])
                         conn_l.commit(); cur_l.close(); conn_l.close()
+                        repaired = reoptimize_from(lv_from, get_connection, affected_crew=[crew_id]) if REOPT_AVAILABLE else 0
                         days = (lv_to - lv_from).days + 1
-                        st.success(f"✅ {lv_type} set: {lv_from.strftime('%d %b')} – {lv_to.strftime('%d %b')} ({days} days) — {crew_name} removed from all flights in this period")
+                        st.success(f"✅ {lv_type} set: {lv_from.strftime('%d %b')} – {lv_to.strftime('%d %b')} ({days} days) — {crew_name} removed from all flights in this period, {repaired} replacement(s) assigned")
                         st.rerun()
                     except Exception as e2:
                         st.error(f"Error: {e2}")
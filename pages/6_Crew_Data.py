@@ -1,21 +1,22 @@
 import streamlit as st
-import psycopg2
-import pandas as pd
 from datetime import date, timedelta
 from dotenv import load_dotenv
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.utils.crew_import import KINDS, QUAL_TYPES, import_rows, parse, read_table
+from app.utils.db import connection, get_connection
+from app.utils.export import download_buttons
+try:
+    from reopt_helper import reoptimize_from
+    REOPT_AVAILABLE = True
+except:
+    REOPT_AVAILABLE = False
 
 load_dotenv()
 
 st.set_page_config(page_title="Crew Data", page_icon="👥", layout="wide")
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
 st.markdown("""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@700&family=Exo+2:wght@300;400;600&family=Share+Tech+Mono&display=swap');
@@ -67,7 +68,7 @@ try:
         pass
 
     # ── Tabs ──────────────────────────────────────────────────────────────────
-    tab1, tab2, tab3 = st.tabs(["📋 Crew List & Qualifications", "✏️ Update Qualifications", "➕ Add / Deactivate Crew"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📋 Crew List & Qualifications", "✏️ Update Qualifications", "➕ Add / Deactivate Crew", "📥 Bulk Import"])
 
     # ── TAB 1: Crew List ──────────────────────────────────────────────────────
     with tab1:
@@ -86,25 +87,22 @@ try:
         except:
             qual_data = {}
 
-        qual_types = ['Medical', 'SEP', 'CRM', 'DG']
+        qual_types = QUAL_TYPES
 
         tbl = f"""<table class="crew-table"><thead><tr>
             <th>#</th><th>Employee ID</th><th>Name</th><th>Role</th><th>WhatsApp</th>
             {''.join(f'<th>{q}</th>' for q in qual_types)}<th>Status</th>
         </tr></thead><tbody>"""
 
-        csv_data = []
         for i, (cid, emp_id, name, role, wp, is_active) in enumerate(crew_rows, 1):
             row_class = "" if is_active else "inactive-row"
             status    = "✅ Active" if is_active else "❌ Inactive"
             qual_cells = ""
-            csv_row   = {"#": i, "ID": emp_id, "Name": name, "Role": role, "WhatsApp": wp or "", "Status": "Active" if is_active else "Inactive"}
 
             for qt in qual_types:
                 exp = qual_data.get(cid, {}).get(qt)
                 if exp is None:
                     qual_cells += '<td style="color:#ccc">—</td>'
-                    csv_row[qt] = "N/A"
                 else:
                     days_left = (exp - today).days
                     if days_left < 0:
@@ -114,19 +112,25 @@ try:
                     else:
                         cls, label = "qual-ok", exp.strftime('%d %b %y')
                     qual_cells += f'<td><span class="{cls}">{label}</span></td>'
-                    csv_row[qt] = str(exp)
 
             tbl += f'<tr class="{row_class}"><td>{i}</td><td style="font-family:\'Share Tech Mono\',monospace">{emp_id}</td><td><b>{name}</b></td><td>{"🟡 LCC" if role=="LCC" else "🔵 CC"}</td><td style="font-size:0.7rem">{wp or "—"}</td>{qual_cells}<td>{status}</td></tr>'
-            csv_data.append(csv_row)
 
         tbl += "</tbody></table>"
         st.markdown(tbl, unsafe_allow_html=True)
 
-        import io
-        csv_buf = io.StringIO()
-        pd.DataFrame(csv_data).to_csv(csv_buf, index=False)
-        st.download_button("⬇️ Download CSV", csv_buf.getvalue(),
-                           file_name=f"crew_data_{today}.csv", mime="text/csv")
+        # Export pivots qualifications in SQL; same rows and order as the table
+        quals_sql = ", ".join(
+            f"COALESCE((MAX(cq.expiry_date) FILTER (WHERE cq.qualification_type = '{qt}'))::text, 'N/A')"
+            for qt in qual_types)
+        download_buttons(st.container(), f"crew_data_{today}", f"""
+            SELECT ROW_NUMBER() OVER (ORDER BY cm.role, cm.full_name), cm.employee_id, cm.full_name, cm.role,
+                   COALESCE(cm.whatsapp_number, ''), {quals_sql},
+                   CASE WHEN cm.is_active THEN 'Active' ELSE 'Inactive' END
+            FROM crew_master cm
+            LEFT JOIN crew_qualifications cq ON cq.crew_id = cm.id
+            GROUP BY cm.id
+            ORDER BY cm.role, cm.full_name
+        """, header=["#", "ID", "Name", "Role", "WhatsApp", *qual_types, "Status"])
 
     # ── TAB 2: Update Qualifications ──────────────────────────────────────────
     with tab2:
@@ -138,7 +142,7 @@ try:
 
         with st.form("update_qual_form"):
             selected_crew = st.selectbox("Select Crew Member", list(crew_options.keys()))
-            qual_type     = st.selectbox("Qualification Type", ["Medical", "SEP", "CRM", "DG"])
+            qual_type     = st.selectbox("Qualification Type", QUAL_TYPES)
             new_expiry    = st.date_input("New Expiry Date", value=today + timedelta(days=365))
             notes         = st.text_input("Notes (optional)", placeholder="e.g. Renewed after training course")
             submitted     = st.form_submit_button("✅ Update Qualification")
@@ -205,6 +209,45 @@ try:
                     except Exception as e:
                         st.error(f"Failed: {e}")
 
+    # ── TAB 4: Bulk Import ────────────────────────────────────────────────────
+    with tab4:
+        st.markdown('<div class="section-hdr">Bulk Import — CSV or Excel</div>', unsafe_allow_html=True)
+        bi1, bi2 = st.columns([1, 3])
+        with bi1:
+            import_kind = st.selectbox("Import", list(KINDS), format_func=str.title, key="bulk_kind")
+        with bi2:
+            st.caption({
+                'crew':           "Columns: employee_id, full_name, role (LCC/CC), whatsapp_number, is_active — existing IDs are updated.",
+                'qualifications': f"Columns: employee_id, qualification_type, expiry_date, last_renewed, notes — or one expiry column per type ({', '.join(QUAL_TYPES)}), as in the crew CSV.",
+                'leave':          "Columns: employee_id, from_date, to_date, leave_type, notes — rostered duties on leave days are removed and refilled.",
+            }[import_kind])
+        upload = st.file_uploader("File", type=['csv', 'xlsx'], key="bulk_file")
+        bp1, bp2, _ = st.columns([1, 1, 3])
+        preview  = bp1.button("🔎 Preview", key="btn_bulk_preview", disabled=upload is None)
+        apply_it = bp2.button("📥 Import", key="btn_bulk_import", disabled=upload is None)
+        if upload is not None and (preview or apply_it):
+            try:
+                rows, rejected = parse(import_kind, read_table(upload, upload.name))
+                with connection() as conn_i:
+                    counts, unknown, repair = import_rows(conn_i, import_kind, rows, dry_run=preview, verbose=False)
+                rejected += unknown
+                counts['rejected'] = len(rejected)
+                repaired = 0
+                if apply_it and repair and REOPT_AVAILABLE:
+                    repaired = reoptimize_from(repair[0], get_connection, affected_crew=repair[1])
+                mc = st.columns(len(counts))
+                for col, (label, n) in zip(mc, counts.items()):
+                    col.metric(label.replace('_', ' ').title(), n)
+                if preview:
+                    st.info("Preview only — nothing was written. Fix any rejected rows, then Import.")
+                else:
+                    st.success(f"✅ {import_kind.title()} imported" + (f" — {repaired} replacement(s) assigned" if repair else ""))
+                if rejected:
+                    st.dataframe([{"Line": line, "Employee ID": emp, "Reason": reason} for line, emp, reason in sorted(rejected)],
+                                 hide_index=True, use_container_width=True)
+            except Exception as e:
+                st.error(f"Import failed: {e}")
+
     cur.close()
     conn.close()
 
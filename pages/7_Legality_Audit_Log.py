@@ -1,21 +1,18 @@
 import streamlit as st
-import psycopg2
-import pandas as pd
 from datetime import date, timedelta
 from dotenv import load_dotenv
 import os
+import re
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.utils.db import get_connection
+from app.utils.export import download_buttons
+from app.utils.query_cache import cached_query
 
 load_dotenv()
 
 st.set_page_config(page_title="Legality & Audit Log", page_icon="🛡️", layout="wide")
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
 st.markdown("""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@700&family=Exo+2:wght@300;400;600&family=Share+Tech+Mono&display=swap');
@@ -33,6 +30,7 @@ st.markdown("""
   .sum-val  { font-family:'Orbitron',monospace; font-size:1.1rem; font-weight:700; color:#1a1a2e; }
   .sum-lbl  { font-family:'Exo 2',sans-serif; font-size:0.65rem; color:#888; text-transform:uppercase; margin-top:2px; }
   .section-hdr { font-family:'Orbitron',monospace; font-size:0.7rem; color:#1a1a2e; letter-spacing:0.15em; border-bottom:2px solid #1a1a2e; padding-bottom:0.3rem; margin:1rem 0 0.6rem; text-transform:uppercase; }
+  .pager-info { font-family:'Share Tech Mono',monospace; font-size:0.68rem; color:#888; padding-top:0.5rem; }
   .print-btn { display:inline-block; background:#1a1a2e; color:#fff; border:none; border-radius:5px; padding:6px 16px; font-size:0.75rem; cursor:pointer; font-family:'Share Tech Mono',monospace; letter-spacing:0.08em; margin-bottom:1rem; }
   @media print { .stSidebar,.stButton,button,.print-btn { display:none !important; } }
 </style>
@@ -41,74 +39,160 @@ st.markdown("""
 st.markdown('<div class="page-title">🛡️ Legality & Audit Log</div>', unsafe_allow_html=True)
 st.markdown('<div class="page-sub">REGULATORY SHIELD — CAA AUDIT DEFENSE — COMPLETE OVERRIDE & VIOLATION HISTORY</div>', unsafe_allow_html=True)
 
-# Date filter
+PAGE_SIZES = [25, 50, 100]
+
+# Filters
 col1, col2, col3 = st.columns([2, 2, 3])
 with col1:
     from_date = st.date_input("From", value=date.today() - timedelta(days=30))
 with col2:
     to_date = st.date_input("To", value=date.today())
+with col3:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES)
+
+crew_names = {f"{name} ({emp})": cid for cid, name, emp in cached_query(
+    "SELECT id, full_name, employee_id FROM crew_master ORDER BY full_name", scopes=('crew',))}
+fcol1, fcol2, fcol3, fcol4 = st.columns([2, 1, 1, 2])
+with fcol1:
+    crew_pick = st.selectbox("Crew", ["All"] + list(crew_names))
+with fcol2:
+    flight_q = st.text_input("Flight", placeholder="e.g. XYZ301").strip()
+with fcol3:
+    user_q = st.text_input("OCC user", placeholder="exact name").strip()
+with fcol4:
+    search_q = st.text_input("Search details / override reason").strip()
 csv_placeholder = st.empty()
 
+
+def like(term):
+    """ILIKE pattern matching ``term`` anywhere, with wildcards escaped."""
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def prefix_query(term):
+    """tsquery text matching every word of ``term`` as a prefix, or None."""
+    words = re.findall(r'\w+', term.lower())
+    return ' & '.join(f'{w}:*' for w in words) or None
+
+
+def page_stack(name, signature):
+    """Keyset cursors of the pages before the current one; reset when filters change."""
+    if st.session_state.get(f'{name}_sig') != signature:
+        st.session_state[f'{name}_sig'] = signature
+        st.session_state[f'{name}_stack'] = []
+    return st.session_state[f'{name}_stack']
+
+
+def keyset_page(cur, select, conds, params, ts_col, id_col, stack, size):
+    """One page of ``select``, newest first. Rows carry their id first and
+    timestamp last; returns (rows, cursor for the next page or None)."""
+    if stack:
+        conds  = conds + [f"({ts_col}, {id_col}) < (%s, %s)"]
+        params = params + list(stack[-1])
+    cur.execute(f"{select} WHERE {' AND '.join(conds)} "
+                f"ORDER BY {ts_col} DESC, {id_col} DESC LIMIT %s", params + [size + 1])
+    rows = cur.fetchall()
+    if len(rows) > size:
+        rows = rows[:size]
+        return rows, (rows[-1][-1], rows[-1][0])
+    return rows, None
+
+
+def pager(name, stack, next_cursor, shown, total, size):
+    start = len(stack) * size
+    c1, c2, c3 = st.columns([1, 1, 6])
+    c1.button("◀ Prev", key=f'{name}_prev', disabled=not stack, on_click=stack.pop)
+    c2.button("Next ▶", key=f'{name}_next', disabled=next_cursor is None,
+              on_click=stack.append, args=(next_cursor,))
+    c3.markdown(f'<div class="pager-info">Rows {start + 1 if shown else 0}–{start + shown} of {total}</div>',
+                unsafe_allow_html=True)
+    return start
+
+
 try:
     conn = get_connection()
     cur  = conn.cursor()
+    crew_id = crew_names.get(crew_pick)
 
     # ── Manual Overrides ──────────────────────────────────────────────────────
-    cur.execute("""
-        SELECT
-            r.id, fs.flight_number, fs.departure_time::date,
-            cm.full_name, cm.role,
-            r.override_reason, r.override_by, r.created_at
+    ovr_from = """
         FROM roster r
         JOIN flight_schedule fs ON fs.id = r.flight_id
         JOIN crew_master     cm ON cm.id = r.crew_id
-        WHERE r.is_manual_override = TRUE
-          AND fs.departure_time::date BETWEEN %s AND %s
-        ORDER BY r.created_at DESC
-    """, (from_date, to_date))
-    overrides = cur.fetchall()
-
+    """
+    ovr_conds  = ["r.is_manual_override = TRUE", "fs.departure_date BETWEEN %s AND %s"]
+    ovr_params = [from_date, to_date]
     # ── FDTL Violations ───────────────────────────────────────────────────────
-    cur.execute("""
-        SELECT
-            lv.id, lv.violation_type, lv.details, lv.flagged_at,
-            cm.full_name, fs.flight_number
+    vio_from = """
         FROM legality_violations lv
         LEFT JOIN crew_master     cm ON cm.id = lv.crew_id
         LEFT JOIN flight_schedule fs ON fs.id = lv.flight_id
-        WHERE lv.flagged_at::date BETWEEN %s AND %s
-        ORDER BY lv.flagged_at DESC
-    """, (from_date, to_date))
-    violations = cur.fetchall()
-
+    """
+    vio_conds  = ["lv.flagged_at >= %s", "lv.flagged_at < %s::date + 1"]
+    vio_params = [from_date, to_date]
     # ── Audit Trail ───────────────────────────────────────────────────────────
-    try:
-        cur.execute("""
-            SELECT action, performed_by, target_table, old_value, new_value, timestamp
-            FROM audit_trail
-            WHERE timestamp::date BETWEEN %s AND %s
-            ORDER BY timestamp DESC LIMIT 100
-        """, (from_date, to_date))
-        audit = cur.fetchall()
-    except:
-        audit = []
+    aud_conds  = ["timestamp >= %s", "timestamp < %s::date + 1"]
+    aud_params = [from_date, to_date]
 
-    cur.close()
-    conn.close()
+    if crew_id is not None:
+        ovr_conds.append("r.crew_id = %s");  ovr_params.append(crew_id)
+        vio_conds.append("lv.crew_id = %s"); vio_params.append(crew_id)
+    if flight_q:
+        ovr_conds.append("fs.flight_number ILIKE %s"); ovr_params.append(like(flight_q))
+        vio_conds.append("fs.flight_number ILIKE %s"); vio_params.append(like(flight_q))
+    if user_q:
+        ovr_conds.append("r.override_by = %s"); ovr_params.append(user_q)
+        aud_conds.append("performed_by = %s");  aud_params.append(user_q)
+    search = prefix_query(search_q)
+    if search:
+        ovr_conds.append("to_tsvector('simple', COALESCE(r.override_reason, '')) @@ to_tsquery('simple', %s)")
+        vio_conds.append("to_tsvector('simple', COALESCE(lv.details, '')) @@ to_tsquery('simple', %s)")
+        ovr_params.append(search); vio_params.append(search)
+
+    # Counts — one aggregate each; violations per type feed the type filter
+    cur.execute(f"SELECT COUNT(*) {ovr_from} WHERE {' AND '.join(ovr_conds)}", ovr_params)
+    n_overrides = cur.fetchone()[0]
+    cur.execute(f"SELECT lv.violation_type, COUNT(*) {vio_from} WHERE {' AND '.join(vio_conds)} "
+                "GROUP BY lv.violation_type ORDER BY COUNT(*) DESC", vio_params)
+    type_counts = dict(cur.fetchall())
+    cur.execute(f"SELECT COUNT(*) FROM audit_trail WHERE {' AND '.join(aud_conds)}", aud_params)
+    n_audit = cur.fetchone()[0]
+
+    vio_types = st.multiselect("Violation types", list(type_counts),
+                               format_func=lambda t: f"{t} ({type_counts[t]})")
+    if vio_types:
+        vio_conds.append("lv.violation_type = ANY(%s)"); vio_params.append(vio_types)
+    n_violations = sum(type_counts[t] for t in (vio_types or type_counts))
+
+    signature = (from_date, to_date, page_size, crew_id, flight_q, user_q, search_q, tuple(vio_types))
+    ovr_stack = page_stack('ovr', signature)
+    vio_stack = page_stack('vio', signature)
+    aud_stack = page_stack('aud', signature)
+
+    overrides, ovr_next = keyset_page(cur, f"""
+        SELECT r.id, fs.flight_number, fs.departure_date, cm.full_name, cm.role,
+               r.override_reason, r.override_by, r.created_at {ovr_from}""",
+        ovr_conds, ovr_params, 'r.created_at', 'r.id', ovr_stack, page_size)
+    violations, vio_next = keyset_page(cur, f"""
+        SELECT lv.id, lv.violation_type, lv.details, cm.full_name, fs.flight_number, lv.flagged_at {vio_from}""",
+        vio_conds, vio_params, 'lv.flagged_at', 'lv.id', vio_stack, page_size)
+    audit, aud_next = keyset_page(cur, """
+        SELECT id, action, performed_by, target_table, old_value, new_value, timestamp FROM audit_trail""",
+        aud_conds, aud_params, 'timestamp', 'id', aud_stack, page_size)
 
     # Summary
     st.markdown(f"""
     <div class="summary-cards">
       <div class="sum-card" style="border-top-color:#dc3545">
-        <div class="sum-val" style="color:#dc3545">{len(overrides)}</div>
+        <div class="sum-val" style="color:#dc3545">{n_overrides}</div>
         <div class="sum-lbl">Manual Overrides</div>
       </div>
       <div class="sum-card" style="border-top-color:#f59e0b">
-        <div class="sum-val" style="color:#856404">{len(violations)}</div>
+        <div class="sum-val" style="color:#856404">{n_violations}</div>
         <div class="sum-lbl">FDTL Violations Prevented</div>
       </div>
       <div class="sum-card">
-        <div class="sum-val">{len(audit)}</div>
+        <div class="sum-val">{n_audit}</div>
         <div class="sum-lbl">Audit Trail Entries</div>
       </div>
       <div class="sum-card" style="border-top-color:#28a745">
@@ -121,8 +205,9 @@ try:
     # ── Overrides table ───────────────────────────────────────────────────────
     st.markdown('<div class="section-hdr">⚠️ Manual Overrides</div>', unsafe_allow_html=True)
     if overrides:
+        start = pager('ovr', ovr_stack, ovr_next, len(overrides), n_overrides, page_size)
         tbl = '<table class="audit-table"><thead><tr><th>#</th><th>Flight</th><th>Date</th><th>Crew</th><th>Role</th><th>Reason</th><th>Performed By</th><th>Timestamp</th></tr></thead><tbody>'
-        for i, (rid, fn, dt, name, role, reason, by, ts) in enumerate(overrides, 1):
+        for i, (rid, fn, dt, name, role, reason, by, ts) in enumerate(overrides, start + 1):
             tbl += f"""<tr>
               <td>{i}</td>
               <td style="font-family:'Share Tech Mono',monospace">{fn}</td>
@@ -141,8 +226,9 @@ try:
     # ── Violations table ──────────────────────────────────────────────────────
     st.markdown('<div class="section-hdr">🚫 FDTL Violations Prevented by System</div>', unsafe_allow_html=True)
     if violations:
+        start = pager('vio', vio_stack, vio_next, len(violations), n_violations, page_size)
         tbl = '<table class="audit-table"><thead><tr><th>#</th><th>Crew</th><th>Flight</th><th>Violation Type</th><th>Details</th><th>Flagged At</th></tr></thead><tbody>'
-        for i, (vid, vtype, detail, ts, name, fn) in enumerate(violations, 1):
+        for i, (vid, vtype, detail, name, fn, ts) in enumerate(violations, start + 1):
             tbl += f"""<tr>
               <td>{i}</td>
               <td><b>{name or '—'}</b></td>
@@ -159,8 +245,9 @@ try:
     # ── Audit trail ──────────────────────────────────────────────────────────
     if audit:
         st.markdown('<div class="section-hdr">📋 System Audit Trail</div>', unsafe_allow_html=True)
+        start = pager('aud', aud_stack, aud_next, len(audit), n_audit, page_size)
         tbl = '<table class="audit-table"><thead><tr><th>#</th><th>Action</th><th>Performed By</th><th>Table</th><th>Old Value</th><th>New Value</th><th>Timestamp</th></tr></thead><tbody>'
-        for i, (action, by, table, old, new, ts) in enumerate(audit, 1):
+        for i, (aid, action, by, table, old, new, ts) in enumerate(audit, start + 1):
             tbl += f"""<tr>
               <td>{i}</td><td><span class="type-system">{action}</span></td>
               <td>{by or 'SYSTEM'}</td><td>{table or '—'}</td>
@@ -171,21 +258,29 @@ try:
         tbl += '</tbody></table>'
         st.markdown(tbl, unsafe_allow_html=True)
 
-    # CSV
-    import io
-    all_rows = [{"Type":"Override","Flight":fn,"Date":str(dt),"Crew":name,
-                 "Role":role,"Details":reason or "","By":by or "OCC","Time":str(ts)[:16]}
-                for _, fn, dt, name, role, reason, by, ts in overrides]
-    all_rows += [{"Type":"Violation","Flight":fn or "","Date":str(ts)[:10],"Crew":name or "",
-                  "Role":"","Details":detail,"By":"SYSTEM","Time":str(ts)[:16]}
-                 for _, vtype, detail, ts, name, fn in violations]
-    if all_rows:
-        csv_buf = io.StringIO()
-        pd.DataFrame(all_rows).to_csv(csv_buf, index=False)
-        csv_placeholder.download_button(
-            "⬇️ Download CSV", csv_buf.getvalue(),
-            file_name=f"audit_log_{from_date}_{to_date}.csv", mime="text/csv"
-        )
+    # Export — every filtered override and violation, streamed on click
+    if n_overrides or n_violations:
+        download_buttons(csv_placeholder.container(), f"audit_log_{from_date}_{to_date}", f"""
+            SELECT type, flight, date, crew, role, details, by_user, time FROM (
+                SELECT 1 AS part, r.created_at AS ts, r.id,
+                       'Override' AS type, fs.flight_number AS flight, fs.departure_date::text AS date,
+                       cm.full_name AS crew, cm.role, COALESCE(r.override_reason, '') AS details,
+                       COALESCE(r.override_by, 'OCC') AS by_user,
+                       to_char(r.created_at, 'YYYY-MM-DD HH24:MI') AS time
+                {ovr_from} WHERE {' AND '.join(ovr_conds)}
+                UNION ALL
+                SELECT 2, lv.flagged_at, lv.id,
+                       'Violation', COALESCE(fs.flight_number, ''), lv.flagged_at::date::text,
+                       COALESCE(cm.full_name, ''), '', lv.details, 'SYSTEM',
+                       to_char(lv.flagged_at, 'YYYY-MM-DD HH24:MI')
+                {vio_from} WHERE {' AND '.join(vio_conds)}
+            ) x
+            ORDER BY part, ts DESC, id DESC
+        """, ovr_params + vio_params,
+            header=["Type", "Flight", "Date", "Crew", "Role", "Details", "By", "Time"])
+
+    cur.close()
+    conn.close()
 
 except Exception as e:
     st.error(f"Database error: {e}")
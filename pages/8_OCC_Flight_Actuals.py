@@ -1,36 +1,17 @@
 import streamlit as st
-import psycopg2
-import pandas as pd
 from datetime import date, timedelta, datetime
 from dotenv import load_dotenv
-import io
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.utils.actuals_import import UTC_OFFSET, import_actuals, read_csv, read_mvt
+from app.utils.db import connection, get_connection
+from app.utils.export import DATASETS, download_buttons
 
 load_dotenv()
 
 st.set_page_config(page_title="OCC Flight Actuals", page_icon="🛬", layout="wide")
 
-def get_connection():
-    try:
-        url = st.secrets["DATABASE_URL"]
-    except:
-        url = os.getenv("DATABASE_URL")
-    return psycopg2.connect(url)
-
-def ensure_actuals_table(cur):
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS flight_actuals (
-            id               SERIAL PRIMARY KEY,
-            flight_id        INTEGER NOT NULL,
-            actual_block_off TIMESTAMP NOT NULL,
-            actual_block_on  TIMESTAMP NOT NULL,
-            entered_by       VARCHAR(100) DEFAULT 'OCC',
-            entered_at       TIMESTAMP DEFAULT NOW(),
-            notes            TEXT,
-            UNIQUE(flight_id)
-        )
-    """)
-
 st.markdown("""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@700&family=Exo+2:wght@300;400;600&family=Share+Tech+Mono&display=swap');
@@ -60,28 +41,53 @@ with col1:
     view_date = st.date_input("Date", value=date.today() - timedelta(days=1), label_visibility="collapsed")
     st.caption("Select date")
 csv_placeholder = st.empty()
+with st.expander("📤 Export a date range"):
+    r1, r2 = st.columns(2)
+    range_from = r1.date_input("From", value=view_date - timedelta(days=30), key="export_from")
+    range_to   = r2.date_input("To", value=view_date, key="export_to")
+    download_buttons(st.container(), f"actuals_{range_from}_{range_to}",
+                     DATASETS['actuals'], (range_from, range_to))
+with st.expander("📥 Import movement messages (MVT / CSV)"):
+    uploads = st.file_uploader("MVT or CSV files", type=['mvt', 'txt', 'csv'], accept_multiple_files=True, key="mvt_files")
+    u1, u2 = st.columns(2)
+    utc_offset = u1.text_input("MVT UTC offset", value=UTC_OFFSET, key="mvt_offset", help="Local time minus UTC, e.g. +0500")
+    dry_run    = u2.checkbox("Dry run — preview only", key="mvt_dry_run")
+    if uploads and st.button("📥 Import Block Times", key="btn_mvt"):
+        try:
+            messages = []
+            for f in uploads:
+                lines = f.getvalue().decode('utf-8').splitlines()
+                messages += read_csv(lines, f.name) if f.name.lower().endswith('.csv') else read_mvt(lines, f.name, utc_offset=utc_offset)
+            with connection() as conn:
+                counts, rejected = import_actuals(conn, messages, dry_run=dry_run, verbose=False)
+            st.success(f"{'🔎 Dry run' if dry_run else '✅ Imported'} — {counts['messages']} message(s), "
+                       f"{counts['flights']} flight(s) updated, {counts['rejected']} rejected")
+            if rejected:
+                st.dataframe([{"Source": s, "Flight": fn, "Reason": reason} for s, fn, reason in rejected],
+                             hide_index=True, use_container_width=True)
+        except Exception as e:
+            st.error(f"Import error: {e}")
 
 try:
     conn = get_connection()
     cur  = conn.cursor()
-    ensure_actuals_table(cur)
-    conn.commit()
 
     # Load all flights for selected date
     cur.execute("""
         SELECT fs.id, fs.flight_number, fs.origin, fs.destination,
                fs.departure_time, fs.arrival_time
         FROM flight_schedule fs
-        WHERE fs.departure_time::date = %s
+        WHERE fs.departure_date = %s
         ORDER BY fs.departure_time
     """, (view_date,))
     flights = cur.fetchall()
 
     # Load existing actuals
     cur.execute("""
-        SELECT flight_id, actual_block_off, actual_block_on, entered_by, notes
-        FROM flight_actuals
-        WHERE actual_block_off::date = %s
+        SELECT fa.flight_id, fa.actual_block_off, fa.actual_block_on, fa.entered_by, fa.notes
+        FROM flight_actuals fa
+        JOIN flight_schedule fs ON fs.id = fa.flight_id
+        WHERE fs.departure_date = %s
     """, (view_date,))
     actuals_map = {r[0]: r for r in cur.fetchall()}
 
@@ -102,7 +108,6 @@ try:
 
         st.markdown("---")
 
-        csv_rows = []
         for fid, fn, orig, dest, sched_dep, sched_arr in flights:
             has_actual = fid in actuals_map
             card_class = "has-actual" if has_actual else "no-actual"
@@ -121,8 +126,6 @@ try:
                 time_display = f'<span class="time-actual">Actual: {act_dep_str} → {act_arr_str} ({block_time:.1f}h) · {delay_str}</span>'
                 notes_display = f" · {act[4]}" if act[4] else ""
             else:
-                act_dep_str = sched_dep_str
-                act_arr_str = sched_arr_str
                 time_display = ""
                 notes_display = ""
 
@@ -159,9 +162,10 @@ try:
                         try:
                             block_off_dt = datetime.combine(view_date, datetime.strptime(dep_str_in, '%H:%M').time())
                             block_on_dt  = datetime.combine(view_date, datetime.strptime(arr_str_in, '%H:%M').time())
+                            if block_on_dt <= block_off_dt:     # block on after midnight
+                                block_on_dt += timedelta(days=1)
                             conn2 = get_connection()
                             cur2  = conn2.cursor()
-                            ensure_actuals_table(cur2)
                             cur2.execute("""
                                 INSERT INTO flight_actuals (flight_id, actual_block_off, actual_block_on, notes)
                                 VALUES (%s, %s, %s, %s)
@@ -198,18 +202,19 @@ try:
                         except Exception as e:
                             st.error(f"Error: {e}")
 
-            csv_rows.append({
-                'Flight': fn, 'Route': f"{orig}-{dest}",
-                'Sched Dep': sched_dep_str, 'Sched Arr': sched_arr_str,
-                'Actual Dep': act_dep_str, 'Actual Arr': act_arr_str,
-                'Status': 'ACTUAL' if has_actual else 'SCHEDULED'
-            })
-
-        # CSV
-        csv_buf = io.StringIO()
-        pd.DataFrame(csv_rows).to_csv(csv_buf, index=False)
-        csv_placeholder.download_button("⬇️ Download CSV", csv_buf.getvalue(),
-            file_name=f"actuals_{view_date}.csv", mime="text/csv")
+        # Day export — actuals fall back to scheduled times, as on the cards
+        download_buttons(csv_placeholder.container(), f"actuals_{view_date}", """
+            SELECT fs.flight_number, fs.origin || '-' || fs.destination,
+                   to_char(fs.departure_time, 'HH24:MI'), to_char(fs.arrival_time, 'HH24:MI'),
+                   to_char(COALESCE(fa.actual_block_off, fs.departure_time), 'HH24:MI'),
+                   to_char(COALESCE(fa.actual_block_on,  fs.arrival_time),   'HH24:MI'),
+                   CASE WHEN fa.flight_id IS NULL THEN 'SCHEDULED' ELSE 'ACTUAL' END
+            FROM flight_schedule fs
+            LEFT JOIN flight_actuals fa ON fa.flight_id = fs.id
+            WHERE fs.departure_date = %s
+            ORDER BY fs.departure_time
+        """, (view_date,),
+            header=["Flight", "Route", "Sched Dep", "Sched Arr", "Actual Dep", "Actual Arr", "Status"])
 
 except Exception as e:
     st.error(f"Database error: {e}")
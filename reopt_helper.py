@@ -1,9 +1,19 @@
 """
-Embedded re-optimizer — no external imports needed.
-Call: reoptimize_from(from_date, get_connection_func)
+Embedded re-optimizer — only needs the shared FDTL helpers in app/engine.
+Call: reoptimize_from(from_date[, get_connection_func][, selection='vector'|'heap'|'sort'])
+      (get_connection_func defaults to the shared pool in app/utils/db.py)
+      reoptimize_from(from_date, get_connection_func, affected_flights=[...], affected_crew=[...])
+      for a local repair around a disruption instead of a full re-solve.
 Returns: number of roster assignments created
 """
 from datetime import datetime, timedelta
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app.engine.compliance import RollingHours, FdtlKernel, WINDOW_LOOKBACK_DAYS
+from app.engine.candidates import crew_pool
+from app.utils.bulk_writer import BulkWriter
+from app.utils.db import get_connection
 
 MAX_MONTHLY = 100.0
 MIN_REST    = 12.0
@@ -16,13 +26,19 @@ class _State:
         self.crew_id     = cid
         self.name        = name
         self.log         = []
+        self.hours       = RollingHours()
         self.total_hours = 0.0
         self.last_date   = None
         self.last_end    = None
         self.consec      = 0
 
     def flying_hours_since(self, since):
-        return sum(h for s, e, h in self.log if s >= since)
+        return self.hours.since(since)
+
+    def record(self, dep, arr, fh):
+        self.log.append((dep, arr, fh))
+        self.hours.add(dep, fh)
+        self.total_hours += fh
 
     def is_legal(self, dep, arr):
         fh = (arr - dep).total_seconds() / 3600
@@ -36,7 +52,7 @@ class _State:
         month_start = datetime(dep.year, dep.month, 1)
         if self.flying_hours_since(month_start) + fh > MAX_MONTHLY:
             return False
-        daily = sum(h for s, e, h in self.log if s.date() == dd)
+        daily = self.hours.on_date(dd)
         if daily + fh > MAX_DAILY:
             return False
         return True
@@ -44,8 +60,7 @@ class _State:
     def assign(self, dep, arr):
         fh = (arr - dep).total_seconds() / 3600
         dd = dep.date()
-        self.log.append((dep, arr, fh))
-        self.total_hours += fh
+        self.record(dep, arr, fh)
         if self.last_date is None:
             self.consec = 1
         elif dd != self.last_date:
@@ -54,34 +69,151 @@ class _State:
         self.last_end  = arr
 
 
-def reoptimize_from(from_date, conn_func):
+def _kernel(states, from_date, end_date, leave_map):
+    origin = from_date - timedelta(days=WINDOW_LOOKBACK_DAYS)
+    kernel = FdtlKernel(len(states), origin, (end_date - origin).days + 1)
+    for i, s in enumerate(states):
+        kernel.load(i, s.total_hours, s.last_date, s.last_end, s.consec, s.log)
+        kernel.set_leave(i, leave_map.get(s.crew_id, ()))
+    return kernel
+
+
+def _pick(kernel, rows, n, dep, arr, locked_ids):
+    """Kernel counterpart of the _State.is_legal scan: first n legal rows."""
+    mask, _ = kernel.check(
+        [(dep, arr)],
+        windows=[(datetime(dep.year, dep.month, 1), MAX_MONTHLY)],
+        max_daily=MAX_DAILY, min_rest=MIN_REST, max_consec=MAX_CONSEC,
+        excluded=[rows[cid] for cid in locked_ids if cid in rows])
+    idx = kernel.pick(n, mask)
+    kernel.assign(idx, [(dep, arr)])
+    return idx
+
+
+def _repair(conn, cur, flights, states, lcc_states, cc_states, leave_map,
+            from_date, end_date, affected_flights, affected_crew):
+    """Local repair: keep the published roster and only fix what broke.
+
+    Replays the roster from from_date in departure order. Assignments of
+    dirty crew (the affected crew, plus anyone added during the repair) or on
+    affected flights are re-checked against FDTL and leave, and dropped if no
+    longer legal. Every flight short of 1 LCC + 3 CC (cancelled ones aside) is
+    topped up cheapest-first. Manual overrides are always kept. Only the
+    dropped and added rows are written.
+    """
+    cur.execute("""
+        SELECT r.flight_id, r.crew_id, r.is_manual_override FROM roster r
+        JOIN flight_schedule fs ON fs.id = r.flight_id
+        WHERE fs.departure_time >= %s AND fs.departure_time < %s
+        ORDER BY r.flight_id, r.crew_id
+    """, (from_date, end_date + timedelta(days=1)))
+    times     = {fid: (dep, arr) for fid, _, dep, arr in flights}
+    on_flight = {}
+    planned   = {}
+    for fid, cid, override in cur.fetchall():
+        on_flight.setdefault(fid, []).append((cid, override))
+        if fid in times:
+            planned.setdefault(cid, []).append(times[fid])
+    cur.execute("""
+        SELECT DISTINCT lv.flight_id FROM legality_violations lv
+        JOIN flight_schedule fs ON fs.id = lv.flight_id
+        WHERE lv.violation_type = 'FLIGHT_CANCELLED'
+          AND fs.departure_time >= %s AND fs.departure_time < %s
+    """, (from_date, end_date + timedelta(days=1)))
+    cancelled = {r[0] for r in cur.fetchall()}
+
+    # Holes are rare, so re-sorting on demand beats keeping a heap in step
+    # with every replayed assignment.
+    lcc_pool = crew_pool(lcc_states, 'sort')
+    cc_pool  = crew_pool(cc_states,  'sort')
+    lcc_ids  = {s.crew_id for s in lcc_states}
+    dirty_flights = set(affected_flights or ())
+    dirty_crew    = set(affected_crew or ())
+    dropped, roster_rows, duty_rows = [], [], []
+
+    for fid, fn, dep, arr in flights:
+        dd   = dep.date()
+        here = on_flight.get(fid, [])
+        kept = []
+        for cid, override in here:
+            s = states.get(cid)
+            if not override and (fid in dirty_flights or cid in dirty_crew):
+                if s is None or dd in leave_map.get(cid, set()) or not s.is_legal(dep, arr):
+                    dropped.append((fid, cid))
+                    continue
+            kept.append(cid)
+            if s is not None:
+                s.assign(dep, arr)
+        if fid in cancelled:
+            continue
+
+        n_lcc    = sum(1 for cid in kept if cid in lcc_ids)
+        need_lcc = max(0, 1 - n_lcc)
+        need_cc  = max(0, 3 - (len(kept) - n_lcc))
+        if not (need_lcc or need_cc):
+            continue
+        on_board = {cid for cid, _ in here}
+
+        def fits_ahead(s):
+            # Don't fill the hole with someone whose later duties it would break.
+            fh = (arr-dep).total_seconds()/3600
+            day_hours = month_hours = 0.0
+            for pdep, parr in planned.get(s.crew_id, ()):
+                if pdep <= dep: continue
+                ph = (parr-pdep).total_seconds()/3600
+                if pdep.date() == dd: day_hours += ph
+                elif (pdep - arr).total_seconds()/3600 < MIN_REST: return False
+                if (pdep.year, pdep.month) == (dep.year, dep.month): month_hours += ph
+            month_start = datetime(dep.year, dep.month, 1)
+            return (s.hours.on_date(dd) + day_hours + fh <= MAX_DAILY and
+                    s.flying_hours_since(month_start) + month_hours + fh <= MAX_MONTHLY)
+
+        def can_work(s):
+            if s.crew_id in on_board: return False
+            if dd in leave_map.get(s.crew_id, set()): return False
+            return s.is_legal(dep, arr) and fits_ahead(s)
+
+        for s in lcc_pool.take(need_lcc, can_work) + cc_pool.take(need_cc, can_work):
+            s.assign(dep, arr)
+            planned.setdefault(s.crew_id, []).append((dep, arr))
+            dirty_crew.add(s.crew_id)
+            roster_rows.append((fid, s.crew_id, dd))
+            duty_rows.append((s.crew_id, fid, dep, arr, (arr-dep).total_seconds()/3600))
+
+    cur.close()
+    with BulkWriter(conn, verbose=False) as w:
+        w.lock()
+        w.delete('duty_log', ('flight_id', 'crew_id'), dropped)
+        w.delete('roster', ('flight_id', 'crew_id'), dropped, where='NOT t.is_manual_override')
+        w.insert('roster', ('flight_id', 'crew_id', 'duty_date', 'is_manual_override'),
+                 roster_rows, on_conflict='ON CONFLICT DO NOTHING', template='(%s,%s,%s,FALSE)')
+        w.copy('duty_log', ('crew_id', 'flight_id', 'duty_start', 'duty_end', 'total_duty_hours'),
+               duty_rows)
+
+    conn.close()
+    return len(roster_rows)
+
+
+def reoptimize_from(from_date, conn_func=get_connection, selection='vector',
+                    affected_flights=None, affected_crew=None):
     end_date = from_date + timedelta(days=30)
     conn = conn_func()
     cur  = conn.cursor()
 
-    # Locked overrides
+    # Locked overrides (also hydrate crew state below)
     cur.execute("""
-        SELECT r.flight_id, r.crew_id FROM roster r
+        SELECT r.flight_id, r.crew_id, fs.departure_time, fs.arrival_time FROM roster r
         JOIN flight_schedule fs ON fs.id = r.flight_id
-        WHERE r.is_manual_override = TRUE AND fs.departure_time::date >= %s
+        WHERE r.is_manual_override = TRUE AND fs.departure_time >= %s
+        ORDER BY r.crew_id, fs.departure_time
     """, (from_date,))
-    locked = set(cur.fetchall())
-
-    # Delete non-override entries from from_date
-    cur.execute("""
-        DELETE FROM duty_log WHERE crew_id IN (
-            SELECT crew_id FROM roster WHERE is_manual_override=FALSE AND duty_date >= %s
-        ) AND flight_id IN (
-            SELECT flight_id FROM roster WHERE is_manual_override=FALSE AND duty_date >= %s
-        ) AND duty_start::date >= %s
-    """, (from_date, from_date, from_date))
-    cur.execute("DELETE FROM roster WHERE is_manual_override=FALSE AND duty_date >= %s", (from_date,))
-    conn.commit()
+    override_rows = cur.fetchall()
+    locked = {(fid, cid) for fid, cid, _, _ in override_rows}
 
     # Flights to assign
     cur.execute("""
         SELECT id, flight_number, departure_time, arrival_time
-        FROM flight_schedule WHERE departure_time::date BETWEEN %s AND %s
+        FROM flight_schedule WHERE departure_date BETWEEN %s AND %s
         ORDER BY departure_time
     """, (from_date, end_date))
     flights = cur.fetchall()
@@ -101,69 +233,108 @@ def reoptimize_from(from_date, conn_func):
     except:
         leave_map = {}
 
-    def build(cid, name):
-        s = _State(cid, name)
-        cur.execute("""
-            SELECT duty_start, duty_end, total_duty_hours FROM duty_log
-            WHERE crew_id=%s AND duty_start::date < %s ORDER BY duty_start
-        """, (cid, from_date))
-        for dep, arr, hrs in cur.fetchall():
-            s.log.append((dep, arr, float(hrs)))
-            s.total_hours += float(hrs)
-            s.last_date = dep.date(); s.last_end = arr
-        cur.execute("""
-            SELECT fs.departure_time, fs.arrival_time FROM roster r
-            JOIN flight_schedule fs ON fs.id=r.flight_id
-            WHERE r.crew_id=%s AND r.is_manual_override=TRUE
-            AND fs.departure_time::date >= %s ORDER BY fs.departure_time
-        """, (cid, from_date))
-        for dep, arr in cur.fetchall():
-            fh = (arr-dep).total_seconds()/3600
-            s.log.append((dep, arr, fh)); s.total_hours += fh
-            s.last_date = dep.date(); s.last_end = arr
-        return s
+    # Hydrate every crew state from the crew_daily_hours rollup: one row per
+    # duty day since the start of the window the FDTL checks look at (all of
+    # them start at midnight, so day totals are exact), plus each crew
+    # member's lifetime hours and last release before from_date (for ranking
+    # and rest).
+    lcc_states = [_State(r[0], r[1]) for r in lcc_list]
+    cc_states  = [_State(r[0], r[1]) for r in cc_list]
+    states     = {s.crew_id: s for s in lcc_states + cc_states}
+    window_start = min(from_date - timedelta(days=28), from_date.replace(day=1))
+    cur.execute("""
+        SELECT crew_id, first_report, last_release, block_hours, lifetime_hours, in_window
+        FROM (
+            SELECT crew_id, first_report, last_release, block_hours,
+                   SUM(block_hours) OVER (PARTITION BY crew_id) AS lifetime_hours,
+                   day >= %s AS in_window,
+                   ROW_NUMBER() OVER (PARTITION BY crew_id ORDER BY day DESC) AS rn
+            FROM crew_daily_hours
+            WHERE day < %s
+        ) h
+        WHERE in_window OR rn = 1
+        ORDER BY crew_id, first_report
+    """, (window_start, from_date))
+    lifetime = {}
+    for cid, report, release, hrs, life, in_window in cur.fetchall():
+        s = states.get(cid)
+        if s is None:
+            continue
+        if in_window:
+            s.record(report, release, float(hrs))
+        s.last_date = report.date(); s.last_end = release
+        lifetime[cid] = float(life)
+    for cid, hours in lifetime.items():
+        states[cid].total_hours = hours
 
-    lcc_states = [build(r[0], r[1]) for r in lcc_list]
-    cc_states  = [build(r[0], r[1]) for r in cc_list]
+    if affected_flights is not None or affected_crew is not None:
+        return _repair(conn, cur, flights, states, lcc_states, cc_states, leave_map,
+                       from_date, end_date, affected_flights, affected_crew)
+
+    for fid, cid, dep, arr in override_rows:
+        s = states.get(cid)
+        if s is None:
+            continue
+        s.record(dep, arr, (arr-dep).total_seconds()/3600)
+        s.last_date = dep.date(); s.last_end = arr
 
     roster_rows, duty_rows = [], []
+    if selection == 'vector':
+        lcc_kernel = _kernel(lcc_states, from_date, end_date, leave_map)
+        cc_kernel  = _kernel(cc_states,  from_date, end_date, leave_map)
+        lcc_rows   = {s.crew_id: i for i, s in enumerate(lcc_states)}
+        cc_rows    = {s.crew_id: i for i, s in enumerate(cc_states)}
+        locked_by_flight = {}
+        for lfid, lcid in locked:
+            locked_by_flight.setdefault(lfid, []).append(lcid)
+    else:
+        lcc_pool = crew_pool(lcc_states, selection)
+        cc_pool  = crew_pool(cc_states,  selection)
 
     for fid, fn, dep, arr in flights:
         dd = dep.date()
-        lcc_s = sorted(lcc_states, key=lambda s: s.total_hours)
-        cc_s  = sorted(cc_states,  key=lambda s: s.total_hours)
-        assigned_lcc, assigned_ccs = None, []
 
-        for s in lcc_s:
-            if (fid, s.crew_id) in locked: continue
-            if dd in leave_map.get(s.crew_id, set()): continue
-            if s.is_legal(dep, arr): assigned_lcc = s; break
+        def can_work(s):
+            if (fid, s.crew_id) in locked: return False
+            if dd in leave_map.get(s.crew_id, set()): return False
+            return s.is_legal(dep, arr)
 
-        for s in cc_s:
-            if len(assigned_ccs) >= 3: break
-            if (fid, s.crew_id) in locked: continue
-            if dd in leave_map.get(s.crew_id, set()): continue
-            if s.is_legal(dep, arr): assigned_ccs.append(s)
+        if selection == 'vector':
+            lids = locked_by_flight.get(fid, ())
+            lcc_idx = _pick(lcc_kernel, lcc_rows, 1, dep, arr, lids)
+            cc_idx  = _pick(cc_kernel,  cc_rows,  3, dep, arr, lids)
+            assigned_lcc = lcc_states[lcc_idx[0]] if lcc_idx else None
+            assigned_ccs = [cc_states[i] for i in cc_idx]
+        else:
+            assigned_lcc = next(iter(lcc_pool.take(1, can_work)), None)
+            assigned_ccs = cc_pool.take(3, can_work)
 
         for s in ([assigned_lcc] if assigned_lcc else []) + assigned_ccs:
             s.assign(dep, arr)
             fh = (arr-dep).total_seconds()/3600
             roster_rows.append((fid, s.crew_id, dd))
             duty_rows.append((s.crew_id, fid, dep, arr, fh))
+        if selection != 'vector':
+            lcc_pool.restore()
+            cc_pool.restore()
+
+    # Delete non-override entries from from_date and write the new ones in a
+    # single transaction, so readers never see the gap in between.
+    cur.close()
+    with BulkWriter(conn, verbose=False) as w:
+        w.lock()
+        w.execute("""
+            DELETE FROM duty_log WHERE crew_id IN (
+                SELECT crew_id FROM roster WHERE is_manual_override=FALSE AND duty_date >= %s
+            ) AND flight_id IN (
+                SELECT flight_id FROM roster WHERE is_manual_override=FALSE AND duty_date >= %s
+            ) AND duty_start >= %s
+        """, (from_date, from_date, from_date))
+        w.execute("DELETE FROM roster WHERE is_manual_override=FALSE AND duty_date >= %s", (from_date,))
+        w.insert('roster', ('flight_id', 'crew_id', 'duty_date', 'is_manual_override'),
+                 roster_rows, on_conflict='ON CONFLICT DO NOTHING', template='(%s,%s,%s,FALSE)')
+        w.copy('duty_log', ('crew_id', 'flight_id', 'duty_start', 'duty_end', 'total_duty_hours'),
+               duty_rows)
 
-    for i in range(0, len(roster_rows), 20):
-        cur.executemany(
-            "INSERT INTO roster (flight_id, crew_id, duty_date, is_manual_override) "
-            "VALUES (%s,%s,%s,FALSE) ON CONFLICT DO NOTHING",
-            roster_rows[i:i+20])
-        conn.commit()
-
-    for i in range(0, len(duty_rows), 20):
-        cur.executemany(
-            "INSERT INTO duty_log (crew_id, flight_id, duty_start, duty_end, total_duty_hours) "
-            "VALUES (%s,%s,%s,%s,%s)",
-            duty_rows[i:i+20])
-        conn.commit()
-
-    cur.close(); conn.close()
+    conn.close()
     return len(roster_rows)
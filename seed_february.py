@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 from datetime import datetime, timedelta, date
 import os
 import random
+from app.utils.bulk_writer import BulkWriter
+from app.utils.partitions import ensure_partitions
 
 load_dotenv()
 
@@ -116,28 +118,14 @@ def build_feb_roster():
     print(f"Inserting {len(duty_rows)} February duty records...")
 
     # Delete any existing Feb duty_log entries first
-    cur.execute("DELETE FROM duty_log WHERE duty_start::date BETWEEN %s AND %s", (FEB_START, FEB_END))
+    cur.execute("DELETE FROM duty_log WHERE duty_start >= %s AND duty_start < %s::date + 1", (FEB_START, FEB_END))
     conn.commit()
-
-    # Add flight_number column to duty_log if not exists
-    try:
-        cur.execute("ALTER TABLE duty_log ADD COLUMN IF NOT EXISTS flight_number VARCHAR(20)")
-        conn.commit()
-    except:
-        conn.rollback()
-
-    chunk = 50
-    for j in range(0, len(duty_rows), chunk):
-        batch = duty_rows[j:j+chunk]
-        for cid, fn, dep, arr, hrs in batch:
-            cur.execute(
-                "INSERT INTO duty_log (crew_id, flight_id, flight_number, duty_start, duty_end, total_duty_hours) "
-                "VALUES (%s, NULL, %s, %s, %s, %s)",
-                (cid, fn, dep, arr, hrs)
-            )
-        conn.commit()
+    ensure_partitions(conn, since=FEB_START)
 
     cur.close()
+    with BulkWriter(conn) as w:
+        w.copy('duty_log', ('crew_id', 'flight_number', 'duty_start', 'duty_end', 'total_duty_hours'),
+               duty_rows)
     conn.close()
 
     # Summary
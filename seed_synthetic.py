@@ -0,0 +1,312 @@
+"""
+Synthetic large-airline dataset for scale testing.
+
+Everything is derived from a seed, so the same arguments always build the same
+airline. The generator produces:
+- a network: bases, outstations, aircraft lines flying out-and-back rotations
+  from their base, and the crew pairings that cover them. Every pairing starts
+  and ends at its base, within MAX_FDP_HOURS and MAX_DAILY_FLY_HOURS;
+- a crew pool with qualifications and leave;
+- months of duty_log history plus the roster for the coming days. Both are
+  assigned with the optimizer's own FDTL kernel, so every generated duty is
+  legal and the history carries real 7/28-day loads.
+
+It replaces all crew, schedule, roster and actuals data (like seed_data.py)
+and COPYs everything in one transaction.
+
+    python seed_synthetic.py --scale 10 --months 3 --seed 7
+    python seed_synthetic.py --scale 100 --months 6 --lcc 1800
+
+--scale 1 is today's demo size (3 aircraft, 12 flights a day, 16 LCC + 32 CC).
+The other options override single parameters of the scaled defaults. To
+re-roster the generated network, pass its pairings to the optimizer:
+
+    legs, pairings = build_network(**network_params(scaled(10)), seed=7)
+    build_roster(start, end, pairings=pairings)
+"""
+import math
+import random
+from datetime import date, datetime, time, timedelta
+
+from app.engine.compliance import FdtlKernel
+from app.engine.optimizer import MAX_DAILY_FLY_HOURS, MAX_FDP_HOURS, check_pairing
+from app.utils.bulk_writer import BulkWriter
+from app.utils.crew_import import QUAL_TYPES
+from app.utils.partitions import ensure_partitions
+
+# Today's demo airline; --scale multiplies the fleet, flights and crew, and
+# grows bases and outstations with its square root.
+DEFAULTS = {
+    'aircraft':        3,
+    'bases':           1,
+    'outstations':     4,
+    'flights_per_day': 12,
+    'lcc':             16,
+    'cc':              32,
+    'months':          1,       # duty_log history before today
+    'days':            30,      # schedule and roster from today
+    'leave_rate':      0.03,    # share of crew-days on leave
+    'qual_rate':       0.95,    # share of crew x qualification type on record
+}
+NETWORK_PARAMS = ('aircraft', 'bases', 'outstations', 'flights_per_day')
+
+AIRPORTS = [
+    'KHI', 'LHE', 'ISB', 'PEW', 'MUX', 'SKT', 'UET', 'LYP', 'GWD', 'SKZ',
+    'RYK', 'BHV', 'DEA', 'TUK', 'PJG', 'GIL', 'KDU', 'CJL', 'DXB', 'AUH',
+    'SHJ', 'DOH', 'MCT', 'BAH', 'KWI', 'JED', 'RUH', 'DMM', 'MED', 'IST',
+    'KBL', 'TAS', 'DEL', 'BOM', 'CMB', 'DAC', 'KTM', 'MLE', 'BKK', 'KUL',
+    'SIN', 'CGK', 'PEK', 'PVG', 'CAN', 'URC', 'ALA', 'BAK', 'IKA', 'MHD',
+    'SLL', 'DWC', 'RKT', 'AAN', 'TIF', 'ELQ', 'HOF', 'GZP', 'SAW', 'ADB',
+]
+AIRCRAFT_TYPES = ['A320', 'A320', 'A321']
+FIRST_NAMES = ['Ahmed', 'Sara', 'Bilal', 'Nadia', 'Imran', 'Zara', 'Hassan', 'Mariam', 'Kamran',
+               'Sana', 'Usman', 'Hina', 'Faisal', 'Rabia', 'Omar', 'Ayesha', 'Raza', 'Amna',
+               'Junaid', 'Iqra', 'Salman', 'Kiran', 'Hamza', 'Saba', 'Fawad', 'Mehwish']
+LAST_NAMES  = ['Khan', 'Malik', 'Hussain', 'Farooq', 'Butt', 'Qureshi', 'Ali', 'Javed', 'Akhtar',
+               'Rehman', 'Tariq', 'Baig', 'Mahmood', 'Siddiqui', 'Sheikh', 'Nawaz', 'Mirza',
+               'Haider', 'Iqbal', 'Ahmed', 'Rashid', 'Anwar', 'Kazmi', 'Chaudhry', 'Zaman']
+LEAVE_TYPES = ['Annual Leave'] * 6 + ['Sick Leave'] * 2 + ['Training', 'Standby']
+QUAL_VALID_DAYS = {'Medical': 365, 'SEP': 365, 'CRM': 730, 'DG': 730}
+
+FIRST_DEPARTURE = (6 * 60, 9 * 60)   # minutes after midnight, per aircraft
+LAST_ARRIVAL    = 23 * 60 + 30
+TURN_MINUTES    = 40
+BLOCK_MINUTES   = (55, 200)          # per route, each way
+MAX_SECTORS     = 4                  # legs per pairing
+CREW_PER_PAIRING = {'LCC': 1, 'CC': 3}
+
+
+def network_params(params):
+    return {k: params[k] for k in NETWORK_PARAMS}
+
+
+def scaled(scale=1, **overrides):
+    """DEFAULTS at ``scale`` times today's size, with ``overrides`` applied."""
+    root = math.sqrt(scale)
+    params = dict(DEFAULTS,
+                  aircraft=max(1, round(DEFAULTS['aircraft'] * scale)),
+                  bases=max(1, round(DEFAULTS['bases'] * root)),
+                  outstations=max(1, round(DEFAULTS['outstations'] * root)),
+                  flights_per_day=max(2, round(DEFAULTS['flights_per_day'] * scale)),
+                  lcc=max(1, round(DEFAULTS['lcc'] * scale)),
+                  cc=max(3, round(DEFAULTS['cc'] * scale)))
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    return params
+
+
+def build_network(aircraft, bases, outstations, flights_per_day, seed=1, prefix='XYZ'):
+    """The daily schedule and its crew pairings.
+
+    Returns (legs, pairings): legs are (flight_number, origin, destination,
+    departure minute, arrival minute, aircraft_type) for one day; pairings are
+    lists of flight numbers flown together by one crew, as in PAIRINGS.
+    """
+    rng = random.Random(seed)
+    airports = AIRPORTS + [f'X{i:02d}' for i in range(max(0, bases + outstations - len(AIRPORTS)))]
+    base_codes = airports[:bases]
+    out_codes  = airports[bases:bases + outstations]
+
+    # Each base serves a share of the outstations plus the other bases.
+    routes = {}
+    for i, base in enumerate(base_codes):
+        served = out_codes[i::bases] or out_codes
+        served = served + [b for b in base_codes if b != base]
+        routes[base] = [(dest, 5 * rng.randint(BLOCK_MINUTES[0] // 5, BLOCK_MINUTES[1] // 5))
+                        for dest in served]
+
+    per_aircraft = [flights_per_day // aircraft + (1 if i < flights_per_day % aircraft else 0)
+                    for i in range(aircraft)]
+    legs, pairings = [], []
+    number = 101
+    for tail, quota in enumerate(per_aircraft):
+        base    = base_codes[tail % bases]
+        ac_type = rng.choice(AIRCRAFT_TYPES)
+        t       = 5 * rng.randint(FIRST_DEPARTURE[0] // 5, FIRST_DEPARTURE[1] // 5)
+        duty    = []
+        flown   = 0
+        while flown < quota:
+            dest, block = rng.choice(routes[base])
+            back_arr = t + 2 * block + TURN_MINUTES
+            if back_arr > LAST_ARRIVAL:
+                break
+            trip = [(f'{prefix}{number}', base, dest, t, t + block, ac_type),
+                    (f'{prefix}{number + 1}', dest, base, t + block + TURN_MINUTES, back_arr, ac_type)]
+            number += 2
+            if duty:
+                fly  = sum(arr - dep for _, _, _, dep, arr, _ in duty + trip) / 60
+                span = (back_arr - duty[0][3]) / 60
+                if (len(duty) + 2 > MAX_SECTORS or fly > MAX_DAILY_FLY_HOURS
+                        or span > MAX_FDP_HOURS):
+                    pairings.append([leg[0] for leg in duty])
+                    duty = []
+            duty += trip
+            legs += trip
+            flown += 2
+            t = back_arr + TURN_MINUTES
+        if duty:
+            pairings.append([leg[0] for leg in duty])
+    return legs, pairings
+
+
+def build_crew(lcc, cc, qual_rate, leave_rate, first_day, last_day, seed=1):
+    """Returns (crew, qualifications, leave) rows; crew ids are 1..lcc+cc."""
+    rng   = random.Random(seed)
+    today = date.today()
+    span  = (last_day - first_day).days + 1
+    crew, quals, leave = [], [], []
+    for cid in range(1, lcc + cc + 1):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        crew.append((cid, f'EMP{cid:05d}', name, 'LCC' if cid <= lcc else 'CC', f'+92300{cid:07d}'))
+
+        for qual in QUAL_TYPES:
+            if rng.random() < qual_rate:
+                valid  = QUAL_VALID_DAYS[qual]
+                expiry = today + timedelta(days=rng.randint(-30, valid))
+                quals.append((cid, qual, expiry, expiry - timedelta(days=valid)))
+
+        taken  = set()
+        target = round(min(leave_rate, 1) * span)
+        while len(taken) < target:
+            start = first_day + timedelta(days=rng.randrange(span))
+            kind  = rng.choice(LEAVE_TYPES)
+            for k in range(min(rng.randint(1, 7), target - len(taken))):
+                d = start + timedelta(days=k)
+                if d <= last_day and d not in taken:
+                    taken.add(d)
+                    leave.append((cid, d, kind))
+    return crew, quals, leave
+
+
+def assign(flights, pairings, crew, leave, first_day, last_day, roster_from):
+    """Roster every pairing, day by day, with the optimizer's FDTL kernel.
+
+    ``flights`` maps (flight_number, date) to (id, departure, arrival).
+    Returns (duties, roster, violations): duties are (crew_id, flight_id)
+    for every day; roster rows only from ``roster_from``.
+    """
+    kernels = {}
+    for role in CREW_PER_PAIRING:
+        ids    = [c[0] for c in crew if c[3] == role]
+        kernel = FdtlKernel(len(ids), first_day, (last_day - first_day).days + 1)
+        rows   = {cid: i for i, cid in enumerate(ids)}
+        by_crew = {}
+        for cid, d, _ in leave:
+            if cid in rows:
+                by_crew.setdefault(cid, []).append(d)
+        for cid, dates in by_crew.items():
+            kernel.set_leave(rows[cid], dates)
+        kernels[role] = (kernel, ids)
+
+    duties, roster, violations = [], [], []
+    d = first_day
+    while d <= last_day:
+        day = sorted(((p, [flights[(fn, d)] for fn in p]) for p in pairings),
+                     key=lambda pairing: pairing[1][0][1])
+        for fns, legs in day:
+            times = [(dep, arr) for _, dep, arr in legs]
+            for role, (kernel, ids) in kernels.items():
+                need = CREW_PER_PAIRING[role]
+                idx  = kernel.pick(need, check_pairing(kernel, legs)[0])
+                kernel.assign(idx, times)
+                if role == 'LCC' and not idx:
+                    violations.append((legs[0][0], None, 'NO_LEGAL_LCC',
+                                       f'No legal LCC for {fns} on {d}'))
+                elif len(idx) < need:
+                    violations.append((legs[0][0], None, 'INSUFFICIENT_CC',
+                                       f'Only {len(idx)}/{need} CC for {fns} on {d}'))
+                for i in idx:
+                    for fid, _, _ in legs:
+                        duties.append((ids[i], fid))
+                        if d >= roster_from:
+                            roster.append((fid, ids[i], d))
+        d += timedelta(days=1)
+    return duties, roster, violations
+
+
+def generate(conn, params, seed=1, verbose=True):
+    """Replace the database contents with the synthetic airline described by
+    ``params`` (see scaled()). Returns the row count per table."""
+    today     = date.today()
+    first_day = today - timedelta(days=30 * params['months'])
+    last_day  = today + timedelta(days=params['days'] - 1)
+
+    legs, pairings = build_network(**network_params(params), seed=seed)
+    crew, quals, leave = build_crew(params['lcc'], params['cc'], params['qual_rate'],
+                                    params['leave_rate'], first_day, last_day, seed)
+
+    flight_rows, flights = [], {}
+    d = first_day
+    while d <= last_day:
+        midnight = datetime.combine(d, time())
+        for fn, orig, dest, dep_min, arr_min, ac_type in legs:
+            fid = len(flight_rows) + 1
+            dep = midnight + timedelta(minutes=dep_min)
+            arr = midnight + timedelta(minutes=arr_min)
+            flight_rows.append((fid, fn, orig, dest, dep, arr, ac_type))
+            flights[(fn, d)] = (fid, dep, arr)
+        d += timedelta(days=1)
+
+    duties, roster, violations = assign(flights, pairings, crew, leave, first_day, last_day, today)
+
+    def duty_rows():
+        for cid, fid in duties:
+            _, _, _, _, dep, arr, _ = flight_rows[fid - 1]
+            yield cid, fid, dep, arr, (arr - dep).total_seconds() / 3600
+
+    ensure_partitions(conn, since=first_day)
+    with BulkWriter(conn, verbose=verbose) as w:
+        w.execute("""
+            TRUNCATE duty_log, roster, legality_violations, flight_actuals, notification_log,
+                     crew_leave, crew_qualifications, flight_schedule, crew_master
+            RESTART IDENTITY
+        """)
+        counts = {
+            'crew_master': w.copy('crew_master', ('id', 'employee_id', 'full_name', 'role', 'whatsapp_number'),
+                                  crew),
+            'crew_qualifications': w.copy('crew_qualifications',
+                                          ('crew_id', 'qualification_type', 'expiry_date', 'last_renewed'),
+                                          quals),
+            'crew_leave': w.copy('crew_leave', ('crew_id', 'leave_date', 'leave_type'), leave),
+            'flight_schedule': w.copy('flight_schedule', ('id', 'flight_number', 'origin', 'destination',
+                                                          'departure_time', 'arrival_time', 'aircraft_type'),
+                                      flight_rows),
+            'roster': w.copy('roster', ('flight_id', 'crew_id', 'duty_date'), roster),
+            'duty_log': w.copy('duty_log', ('crew_id', 'flight_id', 'duty_start', 'duty_end', 'total_duty_hours'),
+                               duty_rows()),
+            'legality_violations': w.copy('legality_violations',
+                                          ('flight_id', 'crew_id', 'violation_type', 'details'), violations),
+        }
+        for table in ('crew_master', 'flight_schedule'):
+            w.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+    counts['pairings'] = len(pairings)
+    counts['flights_per_day'] = len(legs)
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Replace the database with a synthetic airline.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1, help="multiple of today's size")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default),
+                            help=f"scale 1: {default}")
+    args = parser.parse_args()
+    params = scaled(args.scale, **{k: getattr(args, k) for k in DEFAULTS})
+
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    print(f"Generating: {', '.join(f'{k}={v}' for k, v in params.items())} (seed {args.seed})")
+    counts = generate(conn, params, args.seed)
+    conn.close()
+
+    print("✅ Synthetic airline seeded!")
+    print(f"   → {counts['crew_master']} crew ({params['lcc']} LCC + {params['cc']} CC), "
+          f"{counts['crew_qualifications']} qualifications, {counts['crew_leave']} leave days")
+    print(f"   → {counts['flight_schedule']} flights ({counts['flights_per_day']} daily, "
+          f"{counts['pairings']} pairings)")
+    print(f"   → {counts['duty_log']} duty_log rows, {counts['roster']} roster rows, "
+          f"{counts['legality_violations']} uncovered pairings flagged")
@@ -4,4 +4,20 @@ import os
 if hasattr(st, 'secrets') and 'DATABASE_URL' in st.secrets:
     os.environ['DATABASE_URL'] = st.secrets['DATABASE_URL']
 
+@st.cache_resource
+def schema_ready():
+    # Once per server process — pages no longer run DDL on render.
+    from app.utils.db import connection
+    from app.utils.migrations import migrate
+    from app.utils.partitions import ensure_partitions
+    with connection() as conn:
+        migrate(conn, verbose=False)
+        ensure_partitions(conn)
+    return True
+
+try:
+    schema_ready()
+except Exception as e:
+    print(f"Schema migration failed: {e}")
+
 st.switch_page("pages/1_Dashboard.py")
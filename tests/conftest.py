@@ -0,0 +1,74 @@
+"""
+Tests run against throwaway databases on a local Postgres server, from
+TEST_DATABASE_URL or DATABASE_URL (only the throwaway databases are written
+to); without one they are skipped.
+"""
+import itertools
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.engine.benchmark import throwaway_database
+from app.utils.migrations import migrate
+
+_databases = itertools.count()
+
+
+@pytest.fixture
+def dsn():
+    """DSN of a freshly migrated, empty database."""
+    server = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not server:
+        pytest.skip("no TEST_DATABASE_URL or DATABASE_URL")
+    try:
+        psycopg2.connect(server).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"no database server: {e}")
+    with throwaway_database(server, f'_test_{next(_databases)}') as url:
+        conn = psycopg2.connect(url)
+        migrate(conn, verbose=False)
+        conn.close()
+        yield url
+
+
+@pytest.fixture
+def conn(dsn):
+    conn = psycopg2.connect(dsn)
+    yield conn
+    conn.close()
+
+
+def add_crew(conn, lcc=1, cc=3):
+    """Active crew EMP001.. (LCCs first); returns their ids."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO crew_master (employee_id, full_name, role)
+            SELECT 'EMP' || lpad(n::text, 3, '0'), 'Crew ' || n, CASE WHEN n <= %s THEN 'LCC' ELSE 'CC' END
+            FROM generate_series(1, %s) n
+            RETURNING id
+        """, (lcc, lcc + cc))
+        ids = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def add_flight(conn, flight_number, origin, destination, dep, arr, crew_ids=()):
+    """Schedule a flight and roster ``crew_ids`` on it (roster and duty_log)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO flight_schedule (flight_number, origin, destination, departure_time, arrival_time, aircraft_type)
+            VALUES (%s, %s, %s, %s, %s, 'A320') RETURNING id
+        """, (flight_number, origin, destination, dep, arr))
+        fid = cur.fetchone()[0]
+        for cid in crew_ids:
+            cur.execute("INSERT INTO roster (flight_id, crew_id, duty_date) VALUES (%s, %s, %s)",
+                        (fid, cid, dep.date()))
+            cur.execute("""
+                INSERT INTO duty_log (crew_id, flight_id, duty_start, duty_end, total_duty_hours)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (cid, fid, dep, arr, (arr - dep).total_seconds() / 3600))
+    conn.commit()
+    return fid
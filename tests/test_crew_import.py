@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from datetime import date, datetime, time, timedelta
+
+from tests.conftest import add_crew, add_flight
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def snapshot(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT (SELECT array_agg(row(flight_id, crew_id) ORDER BY flight_id, crew_id) FROM roster),
+                   (SELECT array_agg(row(flight_id, crew_id) ORDER BY flight_id, crew_id) FROM duty_log),
+                   (SELECT COUNT(*) FROM crew_leave),
+                   (SELECT COUNT(*) FROM legality_violations),
+                   (SELECT array_agg(row(scope, version) ORDER BY scope) FROM data_versions)
+        """)
+        row = cur.fetchone()
+    conn.rollback()
+    return row
+
+
+def run_cli(dsn, *args):
+    return subprocess.run([sys.executable, '-m', 'app.utils.crew_import', *args],
+                          cwd=ROOT, env=dict(os.environ, DATABASE_URL=dsn),
+                          capture_output=True, text=True, check=True).stdout
+
+
+def test_dry_run_with_reoptimize_writes_nothing(dsn, conn, tmp_path):
+    day  = date.today() + timedelta(days=1)
+    crew = add_crew(conn, lcc=2, cc=4)
+    add_flight(conn, 'XYZ301', 'KHI', 'ISB', datetime.combine(day, time(8)),
+               datetime.combine(day, time(11)), crew[:4])
+    leave = tmp_path / 'leave.csv'
+    leave.write_text(f"employee_id,from_date,leave_type\nEMP002,{day},Sick Leave\n")
+
+    before = snapshot(conn)
+    out = run_cli(dsn, 'leave', str(leave), '--dry-run', '--reoptimize')
+    assert 'would be removed' in out
+    assert snapshot(conn) == before
+
+    # The same import for real does remove the duty and repair the flight
+    out = run_cli(dsn, 'leave', str(leave), '--reoptimize')
+    assert 'repaired' in out
+    assert snapshot(conn) != before
@@ -0,0 +1,35 @@
+import os
+from datetime import date, datetime, time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from tests.conftest import add_crew, add_flight
+
+DASHBOARD = os.path.join(os.path.dirname(__file__), '..', 'app', 'main.py')
+
+
+def test_crewless_and_cancelled_flights_are_listed(dsn, conn):
+    at_  = lambda hh: datetime.combine(date.today(), time(hh))
+    crew = add_crew(conn)
+    add_flight(conn, 'XYZ401', 'KHI', 'ISB', at_(8), at_(11), crew)
+    add_flight(conn, 'XYZ402', 'ISB', 'KHI', at_(12), at_(15))
+    cancelled = add_flight(conn, 'XYZ403', 'KHI', 'LHE', at_(16), at_(18))
+    with conn.cursor() as cur:   # as the OCC cancel panel records it
+        cur.execute("""
+            INSERT INTO legality_violations (flight_id, crew_id, violation_type, details)
+            VALUES (%s, NULL, 'FLIGHT_CANCELLED', 'test')
+        """, (cancelled,))
+    conn.commit()
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    dashboard = AppTest.from_file(DASHBOARD, default_timeout=60)
+    dashboard.secrets['DATABASE_URL'] = dsn
+    dashboard.run()
+    assert not dashboard.exception
+    labels = {e.label.split()[1]: e.label for e in dashboard.expander}
+    assert set(labels) == {'XYZ401', 'XYZ402', 'XYZ403'}
+    assert not labels['XYZ401'].endswith(('CANCELLED', 'NO CREW'))
+    assert labels['XYZ402'].endswith('NO CREW')
+    assert labels['XYZ403'].endswith('CANCELLED')
@@ -0,0 +1,58 @@
+import io
+import os
+from datetime import date, datetime, time, timedelta
+
+import psycopg2
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from app.utils.schedule_import import import_schedule, read_csv
+from reopt_helper import reoptimize_from
+from tests.conftest import add_crew, add_flight
+
+BOARD = os.path.join(os.path.dirname(__file__), '..', 'pages', '3_Daily_Operations.py')
+
+
+def test_imported_cancellation_matches_occ_cancel(dsn, conn):
+    day  = date.today() + timedelta(days=1)
+    at_  = lambda hh: datetime.combine(day, time(hh))
+    crew = add_crew(conn)
+    cancelled = add_flight(conn, 'XYZ301', 'KHI', 'ISB', at_(8), at_(11), crew)
+    kept      = add_flight(conn, 'XYZ302', 'ISB', 'KHI', at_(12), at_(15))
+
+    season = io.StringIO(
+        "flight_number,origin,destination,from_date,departure,arrival\n"
+        f"XYZ302,ISB,KHI,{day},12:00,15:00\n")
+    legs = list(read_csv(season))
+    counts = import_schedule(conn, legs, verbose=False)
+    assert counts['cancelled'] == 1
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM flight_schedule ORDER BY id")
+        assert [r[0] for r in cur.fetchall()] == [cancelled, kept]
+        cur.execute("SELECT COUNT(*) FROM roster WHERE flight_id = %s", (cancelled,))
+        assert cur.fetchone()[0] == 0
+        cur.execute("SELECT COUNT(*) FROM duty_log WHERE flight_id = %s", (cancelled,))
+        assert cur.fetchone()[0] == 0
+        cur.execute("SELECT flight_id, crew_id FROM legality_violations WHERE violation_type = 'FLIGHT_CANCELLED'")
+        assert cur.fetchall() == [(cancelled, None)]
+
+    # Importing the same season again does not cancel it a second time
+    assert import_schedule(conn, legs, verbose=False)['cancelled'] == 0
+
+    # Daily Operations board shows it as cancelled
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    board = AppTest.from_file(BOARD, default_timeout=60)
+    board.secrets['DATABASE_URL'] = dsn
+    board.run()
+    assert not board.exception
+    cards = [m.value for m in board.markdown if 'flight-card' in m.value]
+    assert any('XYZ301' in c and 'CANCELLED' in c for c in cards)
+    assert not any('XYZ302' in c and 'CANCELLED' in c for c in cards)
+
+    # Local repair tops up the live flight and leaves the cancelled one empty
+    reoptimize_from(day, lambda: psycopg2.connect(dsn), affected_flights=[cancelled, kept])
+    with conn.cursor() as cur:
+        cur.execute("SELECT flight_id, COUNT(*) FROM roster GROUP BY flight_id")
+        assert dict(cur.fetchall()) == {kept: 4}
@@ -0,0 +1,10 @@
+from app.engine.utilization import classify_zones
+
+
+def test_zero_hour_crew_are_idle_not_under():
+    zones = classify_zones([0, 5, 10, 15], 10)
+    assert list(zones) == ['⚪ Idle', '🟡 Under', '✅ Balanced', '🔴 Over']
+
+
+def test_no_mean_leaves_flown_crew_balanced():
+    assert list(classify_zones([0, 3], 0)) == ['⚪ Idle', '✅ Balanced']